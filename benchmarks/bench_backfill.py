@@ -0,0 +1,76 @@
+"""
+Compare backfilling a version table in one statement, in chunks, and in
+chunks with several workers.
+
+    python -m benchmarks.bench_backfill [--objects 1000000] [--workers 4]
+"""
+
+import argparse
+import time
+
+from .utils import report, setup, test_database
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--objects", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.apps import apps
+    from django.db import connection
+
+    from demo.models import MyModel
+    from tracked_model.backfill import backfill_versions
+    from tracked_model.operations.backfill import BACKFILL_QUERY_SQL
+
+    with test_database():
+        version_table = apps.get_model("demo", "MyModelVersion")._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO demo_mymodel (number, tenant) "
+                "SELECT i, 0 FROM generate_series(1, %s) AS i",
+                [args.objects],
+            )
+
+        def one_statement() -> None:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    BACKFILL_QUERY_SQL.format(
+                        tracked_table="demo_mymodel",
+                        version_table=version_table,
+                        copy_columns=", tenant",
+                    )
+                )
+
+        def chunked(workers: int) -> None:
+            status = backfill_versions(
+                MyModel,
+                chunk_size=args.chunk_size,
+                workers=workers,
+                restart=True,
+            )
+            assert status.rows == args.objects
+
+        for name, func in (
+            ("one statement", one_statement),
+            ("chunked", lambda: chunked(1)),
+            (f"chunked, {args.workers} workers", lambda: chunked(args.workers)),
+        ):
+            timings = []
+            for _ in range(args.iterations):
+                with connection.cursor() as cursor:
+                    cursor.execute(f"TRUNCATE {version_table}")
+                    cursor.execute(f"VACUUM ANALYZE {version_table}")
+                start = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - start)
+            report(name, timings, objects=args.objects)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Compare starting a consumer by replaying the version table from the start
+against bootstrap_changed_objects with a few workers.
+
+    python -m benchmarks.bench_bootstrap [--objects 200000] [--workers 4]
+"""
+
+import argparse
+import time
+from typing import Any
+
+from .utils import report, setup, test_database, timeit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--objects", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--sink-ms",
+        type=float,
+        default=20.0,
+        help="Simulated time to send each chunk somewhere",
+    )
+    args = parser.parse_args()
+
+    setup()
+
+    from demo.models import MyModel
+    from tracked_model import Cursor, get_changed_objects
+    from tracked_model.bootstrap import bootstrap_changed_objects
+
+    with test_database():
+        batch = 1000
+        for start in range(0, args.objects, batch):
+            MyModel.objects.bulk_create(
+                MyModel(number=i) for i in range(start, start + batch)
+            )
+
+        qs = MyModel.objects.values_list("id", "number", "tenant")
+
+        def send(objects: list[Any]) -> None:
+            time.sleep(args.sink_ms / 1000)
+
+        def replay() -> None:
+            cursor: Cursor | None = None
+            while True:
+                changes, cursor = get_changed_objects(
+                    cursor=cursor, limit=args.limit, queryset=qs
+                )
+                if not changes:
+                    break
+                send(changes)
+
+        def bootstrap(workers: int) -> None:
+            bootstrap_changed_objects(
+                queryset=qs,
+                handle=send,
+                workers=workers,
+                chunk_size=args.limit,
+            )
+
+        report("replay", timeit(replay, iterations=args.iterations))
+        for workers in sorted({1, args.workers}):
+            timings = timeit(
+                lambda: bootstrap(workers), iterations=args.iterations  # noqa: B023
+            )
+            report(f"bootstrap, {workers} workers", timings)
+
+
+if __name__ == "__main__":
+    main()
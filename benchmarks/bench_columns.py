@@ -0,0 +1,55 @@
+"""
+Compare catching up with get_changed_objects against get_changed_columns,
+for model instances and for values().
+
+    python -m benchmarks.bench_columns [--objects 200000] [--limit 50000]
+"""
+
+import argparse
+from typing import Any, Callable
+
+from .utils import report, setup, test_database, timeit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--objects", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=50_000)
+    args = parser.parse_args()
+
+    setup()
+
+    from demo.models import MyModel
+    from tracked_model import get_changed_objects
+    from tracked_model.columns import get_changed_columns
+
+    with test_database():
+        MyModel.objects.bulk_create(MyModel(number=i) for i in range(args.objects))
+
+        def catch_up(get_changes: Callable[..., Any], qs: Any) -> None:
+            cursor = None
+            while True:
+                changes, cursor = get_changes(
+                    cursor=cursor, limit=args.limit, queryset=qs
+                )
+                if not changes:
+                    break
+
+        for name, qs in (
+            ("models", MyModel.objects.all()),
+            ("values", MyModel.objects.values("id", "number")),
+        ):
+            for fetch, get_changes in (
+                ("objects", get_changed_objects),
+                ("columns", get_changed_columns),
+            ):
+                timings = timeit(
+                    lambda: catch_up(get_changes, qs),  # noqa: B023
+                    iterations=args.iterations,
+                )
+                report(f"{name} as {fetch}", timings, objects=args.objects)
+
+
+if __name__ == "__main__":
+    main()
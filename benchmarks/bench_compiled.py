@@ -0,0 +1,78 @@
+"""
+Compare polls that compile the changes query every time against polls that
+reuse the compiled SQL, and against running it as a prepared statement.
+
+    python -m benchmarks.bench_compiled [--latency-ms 1]
+"""
+
+import argparse
+
+from .utils import count_queries, report, setup, test_database, timeit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--objects", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=0.0,
+        help="Simulated network latency added to each statement",
+    )
+    args = parser.parse_args()
+
+    setup()
+
+    from django.test import override_settings
+
+    from demo.models import MyModel
+    from tracked_model import get_changed_objects
+    from tracked_model.utils import _compiled_changes
+
+    with test_database():
+        MyModel.objects.bulk_create(MyModel(number=i) for i in range(args.objects))
+
+        qs = MyModel.objects.filter(number__gte=0).values("id", "number")
+        cursor = None
+        while True:
+            changes, cursor = get_changed_objects(
+                cursor=cursor, limit=10_000, queryset=qs
+            )
+            if not changes:
+                break
+
+        # Each poll reads the same batch of small transactions
+        for i in range(args.limit):
+            MyModel.objects.create(number=i)
+
+        def poll() -> None:
+            get_changed_objects(cursor=cursor, limit=args.limit, queryset=qs)
+
+        def uncached() -> None:
+            _compiled_changes.clear()
+            poll()
+
+        @override_settings(TRACKED_MODEL_PREPARED_STATEMENTS=True)
+        def prepared() -> None:
+            poll()
+
+        for name, func in (
+            ("uncached", uncached),
+            ("cached", poll),
+            ("prepared", prepared),
+        ):
+            # Warm up, so the cache is filled and the statement prepared
+            func()
+            with count_queries() as queries:
+                func()
+
+            with count_queries(latency=args.latency_ms / 1000):
+                timings = timeit(func, iterations=args.iterations)
+
+            report(name, timings, statements=len(queries))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Compare the size and encode/decode time of the binary cursor format against
+the older base64 encoded JSON, for growing xip lists.
+
+    python -m benchmarks.bench_cursor
+"""
+
+import argparse
+import json
+import random
+from base64 import urlsafe_b64encode
+from dataclasses import asdict
+from functools import partial
+
+from tracked_model.cursor import Cursor
+
+from .utils import report, timeit
+
+
+def legacy_json(cursor: Cursor) -> str:
+    data = json.dumps(asdict(cursor)).encode()
+    return urlsafe_b64encode(data).decode("ascii")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    xid_next = 50_000_000
+
+    for xips in (0, 10, 100, 1000):
+        # In progress transactions cluster a bit below xid_next
+        xip_list = rng.sample(range(xid_next - 20 * xips - 1, xid_next), xips)
+        cursor = Cursor(
+            xid_next=xid_next, xid_at=xid_next - 1, xid_at_id=1234, xip_list=xip_list
+        )
+
+        legacy = legacy_json(cursor)
+        binary = cursor.serialize()
+
+        report(
+            f"legacy encode ({xips} xips)",
+            timeit(partial(legacy_json, cursor), iterations=args.iterations),
+            size=len(legacy),
+        )
+        report(
+            f"legacy decode ({xips} xips)",
+            timeit(partial(Cursor.deserialize, legacy), iterations=args.iterations),
+        )
+        report(
+            f"binary encode ({xips} xips)",
+            timeit(cursor.serialize, iterations=args.iterations),
+            size=len(binary),
+        )
+        report(
+            f"binary decode ({xips} xips)",
+            timeit(partial(Cursor.deserialize, binary), iterations=args.iterations),
+        )
+
+
+if __name__ == "__main__":
+    main()
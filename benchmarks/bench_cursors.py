@@ -0,0 +1,82 @@
+"""
+Compare answering many subscribers one poll at a time against answering them
+all with get_changed_objects_for_cursors. Most subscribers are caught up, and
+the rest are spread over a few positions in the stream.
+
+    python -m benchmarks.bench_cursors [--subscribers 200] [--latency-ms 1]
+"""
+
+import argparse
+import random
+
+from .utils import count_queries, report, setup, test_database, timeit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--objects", type=int, default=10_000)
+    parser.add_argument("--subscribers", type=int, default=200)
+    parser.add_argument("--positions", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=0.0,
+        help="Simulated network latency added to each statement",
+    )
+    args = parser.parse_args()
+
+    setup()
+
+    from demo.models import MyModel
+    from tracked_model import (
+        Cursor,
+        get_changed_objects,
+        get_changed_objects_for_cursors,
+    )
+
+    with test_database():
+        qs = MyModel.objects.values("id", "number")
+
+        # Create the objects in separate transactions, remembering a cursor
+        # now and then to spread subscribers over
+        positions: list[Cursor | None] = [None]
+        per_position = args.objects // args.positions
+        for i in range(args.positions):
+            MyModel.objects.bulk_create(
+                MyModel(number=n)
+                for n in range(i * per_position, (i + 1) * per_position)
+            )
+            _, cursor = get_changed_objects(
+                cursor=positions[-1], limit=per_position + 1, queryset=qs
+            )
+            positions.append(cursor)
+
+        rng = random.Random(0)
+        cursors = {
+            i: positions[-1] if rng.random() < 0.8 else rng.choice(positions)
+            for i in range(args.subscribers)
+        }
+
+        def poll_each() -> None:
+            for cursor in cursors.values():
+                get_changed_objects(cursor=cursor, limit=args.limit, queryset=qs)
+
+        def poll_all() -> None:
+            get_changed_objects_for_cursors(
+                cursors=cursors, limit=args.limit, queryset=qs
+            )
+
+        for name, poll in (("one at a time", poll_each), ("all at once", poll_all)):
+            with count_queries() as queries:
+                poll()
+
+            with count_queries(latency=args.latency_ms / 1000):
+                timings = timeit(poll, iterations=args.iterations)
+
+            report(name, timings, statements=len(queries))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Compare the per statement update trigger against the deferred one, which
+bumps versions once per transaction, for transactions running many updates.
+
+    python -m benchmarks.bench_deferred [--statements 50] [--batch 1000]
+
+In "same rows" every statement of a transaction updates the same batch of
+objects, and in "spread" each statement updates a different batch.
+"""
+
+import argparse
+
+from .utils import report, setup, test_database, timeit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--statements", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.apps import apps
+    from django.db import connection, transaction
+    from django.db.models import F
+
+    from demo.models import MyModel
+    from tracked_model.operations.tiggers import _add_trigger_sql, _copied_columns
+
+    MyModelVersion = apps.get_model("demo", "MyModelVersion")
+
+    def replace_triggers(deferred: bool) -> None:
+        queries = _add_trigger_sql(
+            MyModel._meta.db_table,
+            MyModelVersion._meta.db_table,
+            copy_columns=_copied_columns(MyModelVersion),
+            deferred=deferred,
+        )
+        with connection.cursor() as cursor:
+            for query in queries:
+                cursor.execute(query)
+
+    with test_database():
+        objects = args.statements * args.batch
+        MyModel.objects.bulk_create(MyModel(number=i) for i in range(objects))
+        low = MyModel.objects.order_by("pk").values_list("pk", flat=True)[0]
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        def run(spread: bool) -> None:
+            with transaction.atomic():
+                for i in range(args.statements):
+                    start = low + (i * args.batch if spread else 0)
+                    MyModel.objects.filter(
+                        pk__gte=start, pk__lt=start + args.batch
+                    ).update(number=F("number") + 1)
+
+        for workload, spread in (("same rows", False), ("spread", True)):
+            for mode, deferred in (("per statement", False), ("deferred", True)):
+                replace_triggers(deferred)
+                # Start each from a clean table, not the dead rows of the last
+                with connection.cursor() as cursor:
+                    cursor.execute("VACUUM demo_mymodel, demo_mymodelversion")
+                timings = timeit(
+                    lambda: run(spread),  # noqa: B023
+                    iterations=args.iterations,
+                )
+                report(
+                    f"{workload}, {mode}",
+                    timings,
+                    statements=args.statements,
+                    batch=args.batch,
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Compare catching up into a CSV file with get_changed_objects and the csv
+module against export_changes.
+
+    python -m benchmarks.bench_export [--objects 200000] [--limit 50000]
+"""
+
+import argparse
+import csv
+import io
+
+from .utils import report, setup, test_database, timeit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--objects", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=50_000)
+    args = parser.parse_args()
+
+    setup()
+
+    from demo.models import MyModel
+    from tracked_model import Cursor, get_changed_objects
+    from tracked_model.export import export_changes
+
+    with test_database():
+        # Separate transactions, as when catching up on a busy table
+        batch = 1000
+        for start in range(0, args.objects, batch):
+            MyModel.objects.bulk_create(
+                MyModel(number=i) for i in range(start, start + batch)
+            )
+
+        qs = MyModel.objects.values_list("id", "number", "tenant")
+
+        def objects() -> None:
+            sink = io.StringIO()
+            writer = csv.writer(sink)
+            cursor: Cursor | None = None
+            while True:
+                changes, cursor = get_changed_objects(
+                    cursor=cursor, limit=args.limit, queryset=qs
+                )
+                if not changes:
+                    break
+                writer.writerows(changes)
+
+        def copy() -> None:
+            sink = io.BytesIO()
+            cursor: Cursor | None = None
+            while True:
+                count, cursor = export_changes(
+                    cursor=cursor, limit=args.limit, queryset=qs, sink=sink
+                )
+                if not count:
+                    break
+
+        for name, func in (("get_changed_objects", objects), ("export_changes", copy)):
+            timings = timeit(func, iterations=args.iterations)
+            report(name, timings, objects=args.objects)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Stream the changes of a selective queryset over a large table, and show the
+plan of the changes query. The filter is pushed into each of the priority
+subqueries, so each poll walks the version index in order and stops once it
+has a full batch.
+
+    python -m benchmarks.bench_filtered [--objects 200000] [--every 100]
+
+With --tenant the objects are spread over tenants instead, and the stream of
+a single tenant is read. The tenant is copied to the version table, so the
+changes are read from its (tenant, last_modified_txid, object_id) index
+without touching the tracked table.
+"""
+
+import argparse
+from functools import partial
+
+from .utils import report, setup, test_database, timeit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--objects", type=int, default=200_000)
+    parser.add_argument("--every", type=int, default=100, help="Selectivity")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--tenant", action="store_true", help="Filter by tenant")
+    args = parser.parse_args()
+
+    setup()
+
+    from django.db import connection
+    from django.db.models.functions import Mod
+
+    from demo.models import MyModel
+    from tracked_model import Cursor, get_changed_objects
+    from tracked_model.utils import _changes_queryset
+
+    with test_database():
+        MyModel.objects.bulk_create(
+            (MyModel(number=i, tenant=i % args.every) for i in range(args.objects)),
+            batch_size=10_000,
+        )
+        with connection.cursor() as conn:
+            conn.execute("ANALYZE")
+
+        if args.tenant:
+            qs = MyModel.objects.filter(tenant=0).values("id", "number")
+        else:
+            qs = (
+                MyModel.objects.alias(_mod=Mod("number", args.every))
+                .filter(_mod=0)
+                .values("id", "number")
+            )
+
+        plan = _changes_queryset(
+            qs, cursor=Cursor(xid_next=1, xip_list=[]), limit=args.limit
+        ).explain()
+        print(plan, end="\n\n")
+
+        batches = []
+        cursor = None
+        while True:
+            changes, cursor = get_changed_objects(
+                cursor=cursor, limit=args.limit, queryset=qs
+            )
+            if not changes:
+                break
+            batches.append(len(changes))
+
+        print(
+            f"{len(batches)} batches, {sum(batches)} objects, "
+            f"expected {len(range(0, args.objects, args.every))}",
+            end="\n\n",
+        )
+
+        poll = partial(get_changed_objects, cursor=None, limit=args.limit, queryset=qs)
+        report("catch-up", timeit(poll, iterations=args.iterations))
+
+        poll = partial(
+            get_changed_objects, cursor=cursor, limit=args.limit, queryset=qs
+        )
+        report("idle", timeit(poll, iterations=args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Compare an empty poll with get_changed_objects against checking
+may_have_changes first, for a consumer that is caught up.
+
+    python -m benchmarks.bench_idle [--latency-ms 1]
+"""
+
+import argparse
+
+from .utils import count_queries, report, setup, test_database, timeit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--objects", type=int, default=100_000)
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=0.0,
+        help="Simulated network latency added to each statement",
+    )
+    args = parser.parse_args()
+
+    setup()
+
+    from demo.models import MyModel
+    from tracked_model import get_changed_objects, may_have_changes
+
+    with test_database():
+        MyModel.objects.bulk_create(MyModel(number=i) for i in range(args.objects))
+
+        qs = MyModel.objects.values("id", "number")
+        cursor = None
+        while True:
+            changes, cursor = get_changed_objects(
+                cursor=cursor, limit=10_000, queryset=qs
+            )
+            if not changes:
+                break
+
+        def poll() -> None:
+            get_changed_objects(cursor=cursor, queryset=qs)
+
+        def probe() -> None:
+            if may_have_changes(cursor=cursor):
+                get_changed_objects(cursor=cursor, queryset=qs)
+
+        for name, func in (("get_changed_objects", poll), ("may_have_changes", probe)):
+            with count_queries() as queries:
+                func()
+
+            with count_queries(latency=args.latency_ms / 1000):
+                timings = timeit(func, iterations=args.iterations)
+
+            report(name, timings, statements=len(queries))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Time Cursor.next_cursor, and creating the snapshot it is given, for growing
+xip lists.
+
+    python -m benchmarks.bench_next_cursor
+"""
+
+import argparse
+import random
+from functools import partial
+
+from tracked_model.cursor import Cursor, Snapshot
+
+from .utils import report, timeit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    xmax = 50_000_000
+
+    for xips in (0, 10, 100, 1000, 10_000):
+        # Most of the cursor's xips are still in progress in the next snapshot
+        xip_list = sorted(rng.sample(range(xmax - 20 * xips - 1, xmax - 1), xips))
+        cursor = Cursor(
+            xid_next=xmax - 1, xid_at=xmax - 2, xid_at_id=1, xip_list=xip_list
+        )
+        snapshot_xips = xip_list[len(xip_list) // 10 :] + [xmax - 1]
+
+        report(
+            f"snapshot ({xips} xips)",
+            timeit(
+                partial(
+                    Snapshot,
+                    xmin=xmax - 20 * xips - 1,
+                    xmax=xmax,
+                    xip_list=snapshot_xips,
+                ),
+                iterations=args.iterations,
+            ),
+        )
+
+        snapshot = Snapshot(
+            xmin=xmax - 20 * xips - 1, xmax=xmax, xip_list=snapshot_xips
+        )
+        for has_more in (True, False):
+            report(
+                f"next_cursor ({xips} xips, has_more={has_more})",
+                timeit(
+                    partial(
+                        cursor.next_cursor,
+                        snapshot=snapshot,
+                        last_modified_txid=xmax - 2,
+                        last_object_id=5,
+                        has_more=has_more,
+                    ),
+                    iterations=args.iterations,
+                ),
+            )
+
+
+if __name__ == "__main__":
+    main()
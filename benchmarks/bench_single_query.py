@@ -0,0 +1,62 @@
+"""
+Compare fetching changes in a repeatable read transaction with separate
+queries against fetching the snapshot and changes in a single statement.
+
+    python -m benchmarks.bench_single_query [--latency-ms 1]
+"""
+
+import argparse
+from functools import partial
+
+from .utils import count_queries, report, setup, test_database, timeit
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--objects", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=0.0,
+        help="Simulated network latency added to each statement",
+    )
+    args = parser.parse_args()
+
+    setup()
+
+    from demo.models import MyModel
+    from tracked_model import get_changed_objects
+
+    with test_database():
+        MyModel.objects.bulk_create(MyModel(number=i) for i in range(args.objects))
+        qs = MyModel.objects.values("id", "number")
+
+        # Poll from the end of the stream, which is the common case
+        _, end_cursor = get_changed_objects(
+            cursor=None, limit=args.objects + 1, queryset=qs
+        )
+
+        for single_query in (False, True):
+            mode = "single query" if single_query else "transaction"
+            for name, cursor in (("catch-up", None), ("idle", end_cursor)):
+                poll = partial(
+                    get_changed_objects,
+                    cursor=cursor,
+                    limit=args.limit,
+                    queryset=qs,
+                    single_query=single_query,
+                )
+
+                with count_queries() as queries:
+                    poll()
+
+                with count_queries(latency=args.latency_ms / 1000):
+                    timings = timeit(poll, iterations=args.iterations)
+
+                report(f"{mode} ({name})", timings, statements=len(queries))
+
+
+if __name__ == "__main__":
+    main()
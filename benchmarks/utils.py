@@ -0,0 +1,82 @@
+import os
+import statistics
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+import django
+
+
+def setup() -> None:
+    """
+    Configure Django using the demo project
+    """
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "demo.settings")
+    os.environ.setdefault("LOG_TO_CONSOLE", "false")
+    django.setup()
+
+
+@contextmanager
+def test_database() -> Iterator[None]:
+    """
+    Create a fresh, migrated test database for the duration of the benchmark
+    """
+
+    from django.db import connection
+
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+@contextmanager
+def count_queries(latency: float = 0.0) -> Iterator[list[str]]:
+    """
+    Record every statement sent to the database. An artificial latency (in
+    seconds) can be added to each statement to simulate a remote database.
+    """
+
+    from django.db import connection
+
+    queries: list[str] = []
+
+    def wrapper(execute: Callable[..., Any], sql: str, *args: Any) -> Any:
+        queries.append(sql)
+        if latency:
+            time.sleep(latency)
+        return execute(sql, *args)
+
+    with connection.execute_wrapper(wrapper):
+        yield queries
+
+
+def timeit(func: Callable[[], Any], *, iterations: int) -> list[float]:
+    """
+    Run func the given number of times, returning the duration of each run
+    """
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(name: str, timings: list[float], **extra: Any) -> None:
+    """
+    Print the p50 and p99 of the timings, in milliseconds
+    """
+
+    quantiles = statistics.quantiles(timings, n=100)
+    columns = [
+        f"{name:<32}",
+        f"p50={quantiles[49] * 1000:8.3f}ms",
+        f"p99={quantiles[98] * 1000:8.3f}ms",
+        *(f"{key}={value}" for key, value in extra.items()),
+    ]
+    print("  ".join(columns))
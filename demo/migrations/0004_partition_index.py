@@ -0,0 +1,24 @@
+# Generated by Django 5.0.14 on 2026-10-17 02:10
+
+from django.db import migrations, models
+
+import tracked_model.expressions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("demo", "0003_backfill_version_info"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="mymodelversion",
+            index=models.Index(
+                tracked_model.expressions.PartitionKey("object_id", partitions=4),
+                models.F("last_modified_txid"),
+                models.F("object_id"),
+                name="mymodelversion_0a5232_part",
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.14 on 2026-10-17 02:20
+
+from django.db import migrations, models
+
+from tracked_model.operations import AddCopiedField
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("demo", "0004_partition_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mymodel",
+            name="tenant",
+            field=models.IntegerField(default=0),
+        ),
+        AddCopiedField(
+            tracked_model="MyModel",
+            model_name="mymodelversion",
+            name="tenant",
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name="mymodelversion",
+            index=models.Index(
+                fields=["tenant", "last_modified_txid", "object_id"],
+                name="mymodelversion_bd8876_copy",
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.14 on 2026-10-17 03:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from tracked_model.operations import AddVersionTracking
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("demo", "0005_copy_tenant"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mymodelversion",
+            name="deleted",
+            field=models.BooleanField(db_default=False),
+        ),
+        migrations.AlterField(
+            model_name="mymodelversion",
+            name="object",
+            field=models.OneToOneField(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                primary_key=True,
+                related_name="version_info",
+                serialize=False,
+                to="demo.mymodel",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mymodelversion",
+            index=models.Index(
+                condition=models.Q(("deleted", True)),
+                fields=["last_modified_at"],
+                name="mymodelversion_7918f7_tomb",
+            ),
+        ),
+        AddVersionTracking(
+            tracked_model="MyModel",
+            version_model="MyModelVersion",
+            track_deletes=True,
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.14 on 2026-10-17 09:12
+
+from django.db import migrations
+
+from tracked_model.operations import AddVersionTracking
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("demo", "0006_track_deletes"),
+    ]
+
+    operations = [
+        AddVersionTracking(
+            tracked_model="MyModel",
+            version_model="MyModelVersion",
+            notify=True,
+            track_deletes=True,
+        ),
+    ]
@@ -3,7 +3,8 @@ from django.db import models
 from tracked_model import tracked
 
 
-@tracked()
+@tracked(partitions=4, copy_fields=["tenant"], track_deletes=True)
 class MyModel(models.Model):
 
     number = models.IntegerField()
+    tenant = models.IntegerField(default=0)
@@ -1,23 +1,30 @@
+import functools
+from typing import Any
+
 from django.db.models import F
-from django.http import HttpRequest, JsonResponse
 
-from tracked_model import Cursor, get_changed_objects
+from tracked_model.hub import ChangeHub
+from tracked_model.views import ChangesView
 
 from .models import MyModel
 
 
-def get_changes(request: HttpRequest) -> JsonResponse:
+@functools.cache
+def _changes_hub() -> ChangeHub[Any]:
+    """
+    All requests share one hub, so clients polling at the same position are
+    served from memory with a single query per interval between them.
+    """
+
+    qs = MyModel.objects.values("number", version=F("version_info__version"))
+    hub = ChangeHub(queryset=qs, limit=100)
+    hub.start()
+    return hub
 
-    cursor = None
-    if serialized_cursor := request.GET.get("cursor"):
-        cursor = Cursor.model_validate_json(serialized_cursor)
 
-    try:
-        limit = int(request.GET.get("limit", "1"))
-    except Exception:
-        limit = 1
+class GetChangesView(ChangesView):
+    def get_hub(self) -> ChangeHub[Any]:
+        return _changes_hub()
 
-    qs = MyModel.objects.values("number", version=F("version_info__version"))
-    changes, cursor = get_changed_objects(cursor=cursor, limit=limit, queryset=qs)
 
-    return JsonResponse({"changes": changes, "cursor": cursor})
+get_changes = GetChangesView.as_view()
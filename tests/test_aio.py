@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from demo.models import MyModel
+from tracked_model import get_changed_objects
+
+pytest.importorskip("psycopg")
+
+from tracked_model.aio import (  # noqa: E402
+    aconnect,
+    aget_changed_objects,
+    aiter_changed_objects,
+)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_aget_changes() -> None:
+    """
+    Test that fetching changes over an async connection gives the same
+    objects and cursors as the sync version.
+    """
+
+    m1 = MyModel.objects.create(number=10)
+    m2 = MyModel.objects.create(number=11)
+    qs = MyModel.objects.order_by("id").values("id", "number")
+
+    async def main() -> None:
+        changes, cursor = await aget_changed_objects(cursor=None, limit=1, queryset=qs)
+        assert changes == [{"id": m1.id, "number": 10}]
+
+        connection = await aconnect()
+        async with connection:
+            changes, cursor = await aget_changed_objects(
+                cursor=cursor, limit=1, queryset=qs, connection=connection
+            )
+            assert changes == [{"id": m2.id, "number": 11}]
+
+            changes, cursor = await aget_changed_objects(
+                cursor=cursor, limit=1, queryset=qs, connection=connection
+            )
+            assert changes == []
+
+    asyncio.run(main())
+
+
+@pytest.mark.django_db(transaction=True)
+def test_aiter_changes() -> None:
+    objects = MyModel.objects.bulk_create(MyModel(number=i) for i in range(5))
+    qs = MyModel.objects.order_by("id")
+    _, cursor = get_changed_objects(cursor=None, limit=3, queryset=qs)
+
+    async def main() -> None:
+        changes = aiter_changed_objects(cursor=None, limit=3, queryset=qs, chunk_size=2)
+        with pytest.raises(RuntimeError):
+            changes.next_cursor
+
+        assert [obj async for obj in changes] == objects[:3]
+        assert changes.next_cursor == cursor
+
+    asyncio.run(main())
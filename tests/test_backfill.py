@@ -0,0 +1,142 @@
+import copy
+import io
+import time
+
+import pytest
+from django.apps import apps as global_apps
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+from demo.models import MyModel
+from tracked_model.backfill import BackfillStatus, backfill_versions
+from tracked_model.models import BackfillProgress
+from tracked_model.operations import BackfillModelVersion
+
+from .types import MigrateToFixture
+
+
+@pytest.mark.django_db(transaction=True)
+def test_backfill_in_chunks(migrate_to: MigrateToFixture) -> None:
+    apps = migrate_to("demo", "0001")
+    ids = [
+        apps.get_model("demo", "MyModel").objects.create(number=i).id for i in range(25)
+    ]
+
+    apps = migrate_to("demo", "0002")
+    HistoricalModel = apps.get_model("demo", "MyModel")
+    HistoricalVersion = apps.get_model("demo", "MyModelVersion")
+    new = HistoricalModel.objects.create(number=25)
+
+    # Pretend an earlier run got through the first chunk
+    BackfillProgress.objects.create(
+        version_table=HistoricalVersion._meta.db_table, last_object_id=ids[9]
+    )
+    start = time.monotonic()
+    status = backfill_versions(HistoricalModel, chunk_size=10, max_rows_per_second=200)
+    assert time.monotonic() - start >= 0.08
+    assert status.rows == 15
+    assert status.scanned == 16
+    assert status.completed_slices == status.slices == 1
+    progress = BackfillProgress.objects.get()
+    assert progress.last_object_id == new.id
+    assert progress.completed_at is not None
+    assert sorted(HistoricalVersion.objects.values_list("pk", flat=True)) == [
+        *ids[10:],
+        new.id,
+    ]
+
+    # A completed backfill isn't run again, unless restarted
+    assert backfill_versions(HistoricalModel).rows == 15
+    status = backfill_versions(HistoricalModel, chunk_size=7, restart=True)
+    assert status.rows == 10
+    assert HistoricalVersion.objects.count() == 26
+
+    migrate_to("demo", "__latest__")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_backfill_in_parallel(migrate_to: MigrateToFixture) -> None:
+    apps = migrate_to("demo", "0001")
+    for i in range(40):
+        apps.get_model("demo", "MyModel").objects.create(number=i)
+
+    apps = migrate_to("demo", "0002")
+    HistoricalModel = apps.get_model("demo", "MyModel")
+    statuses: list[BackfillStatus] = []
+
+    status = backfill_versions(
+        HistoricalModel,
+        chunk_size=3,
+        workers=4,
+        verify=True,
+        progress=lambda status: statuses.append(copy.copy(status)),
+    )
+    assert status.rows == 40
+    assert status.missing == 0
+    assert status.completed_slices == status.slices == 4
+    assert [s.completed_slices for s in statuses] == sorted(
+        s.completed_slices for s in statuses
+    )
+    assert BackfillProgress.objects.filter(completed_at__isnull=False).count() == 4
+    assert apps.get_model("demo", "MyModelVersion").objects.count() == 40
+
+    # A new run keeps the slices of the first
+    assert backfill_versions(HistoricalModel, workers=2).slices == 4
+
+    migrate_to("demo", "__latest__")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_backfill_operation(migrate_to: MigrateToFixture) -> None:
+    apps = migrate_to("demo", "0001")
+    for i in range(5):
+        apps.get_model("demo", "MyModel").objects.create(number=i)
+    apps = migrate_to("demo", "0002")
+
+    state = MigrationExecutor(connection).loader.project_state(
+        ("demo", "0002_add_tracking")
+    )
+    assert BackfillModelVersion("MyModel").reduces_to_sql
+    operation = BackfillModelVersion("MyModel", workers=2, verify=True)
+    assert not operation.reduces_to_sql
+
+    with pytest.raises(RuntimeError):
+        with connection.schema_editor() as editor:
+            operation.database_forwards("demo", editor, state, state)
+
+    with connection.schema_editor(atomic=False) as editor:
+        operation.database_forwards("demo", editor, state, state)
+    assert apps.get_model("demo", "MyModelVersion").objects.count() == 5
+
+    migrate_to("demo", "__latest__")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_backfill_command() -> None:
+    MyModelVersion = global_apps.get_model("demo", "MyModelVersion")
+    for i in range(5):
+        MyModel.objects.create(number=i, tenant=i)
+    MyModelVersion.objects.filter(tenant__gte=2).delete()
+
+    stdout = io.StringIO()
+    call_command(
+        "backfill_versions",
+        "demo.MyModel",
+        "--chunk-size=2",
+        "--workers=2",
+        "--verify",
+        "--report-interval=0",
+        stdout=stdout,
+    )
+    output = stdout.getvalue()
+    assert "Scanned 2 of about" in output
+    assert "Backfilled 3 objects" in output
+    assert "Every object has version info" in output
+    assert sorted(MyModelVersion.objects.values_list("tenant", flat=True)) == [
+        0,
+        1,
+        2,
+        3,
+        4,
+    ]
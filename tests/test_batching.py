@@ -0,0 +1,51 @@
+import pytest
+
+from demo.models import MyModel
+from tracked_model import AdaptiveLimit, get_changed_objects
+
+
+def test_adaptive_limit_grows_when_full() -> None:
+    limit = AdaptiveLimit(initial=10, max_limit=30, target_seconds=1)
+    limit.observe([None] * 10, limit=10, seconds=0.01)
+    assert limit.limit == 20
+    limit.observe([None] * 20, limit=20, seconds=0.02)
+    assert limit.limit == 30
+
+    # Not full, so there's no point in growing
+    limit.observe([None] * 5, limit=30, seconds=0.005)
+    assert limit.limit == 30
+
+
+def test_adaptive_limit_shrinks_when_slow() -> None:
+    limit = AdaptiveLimit(initial=100, min_limit=5, target_seconds=0.1, smoothing=1)
+    limit.observe([None] * 100, limit=100, seconds=0.5)
+    assert limit.limit == 20
+
+    limit.observe([None] * 20, limit=20, seconds=100)
+    assert limit.limit == 5
+
+
+def test_adaptive_limit_byte_budget() -> None:
+    limit = AdaptiveLimit(initial=100, max_bytes=1000, sizeof=len, smoothing=1)
+    limit.observe(["x" * 100] * 100, limit=100, seconds=0)
+    assert limit.limit == 10
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_changes_adaptive_limit() -> None:
+    for i in range(30):
+        MyModel.objects.create(number=i)
+
+    limit = AdaptiveLimit(initial=10, min_limit=1, target_seconds=60)
+    sizes = []
+    cursor = None
+    while True:
+        changes, cursor = get_changed_objects(
+            cursor=cursor, limit=limit, queryset=MyModel.objects.all()
+        )
+        if not changes:
+            break
+        sizes.append(len(changes))
+
+    assert sizes == [10, 20]
+    assert limit.limit == 40
@@ -0,0 +1,87 @@
+import threading
+from typing import Any
+
+import pytest
+
+from demo.models import MyModel
+from tracked_model import get_changed_objects
+from tracked_model.bootstrap import _split_range, bootstrap_changed_objects
+
+from .utils import handle_exception
+
+
+def test_split_range() -> None:
+    assert _split_range(1, 10, 3) == [(1, 4), (5, 8), (9, 10)]
+    assert _split_range(5, 5, 4) == [(5, 5)]
+    assert _split_range(1, 3, 8) == [(1, 1), (2, 2), (3, 3)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bootstrap() -> None:
+    for i in range(50):
+        MyModel.objects.create(number=i)
+    qs = MyModel.objects.values_list("number")
+
+    lock = threading.Lock()
+    dumped: list[Any] = []
+    chunk_sizes = []
+
+    @handle_exception()
+    def change() -> None:
+        MyModel.objects.filter(number=0).update(number=100)
+        MyModel.objects.create(number=50)
+
+    def handle(objects: list[Any]) -> None:
+        with lock:
+            first = not dumped
+            dumped.extend(objects)
+            chunk_sizes.append(len(objects))
+        # Changes committed while the workers are reading aren't in the copy
+        if first:
+            thread = threading.Thread(target=change)
+            thread.start()
+            thread.join()
+
+    cursor = bootstrap_changed_objects(
+        queryset=qs, handle=handle, workers=3, chunk_size=4
+    )
+    assert sorted(dumped) == [(i,) for i in range(50)]
+    assert max(chunk_sizes) == 4
+
+    # ... but come after the cursor
+    changes, cursor = get_changed_objects(cursor=cursor, queryset=qs)
+    assert sorted(changes) == [(50,), (100,)]
+    assert get_changed_objects(cursor=cursor, queryset=qs)[0] == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bootstrap_empty() -> None:
+    cursor = bootstrap_changed_objects(
+        queryset=MyModel.objects.all(), handle=lambda objects: None
+    )
+    obj = MyModel.objects.create(number=1)
+    assert get_changed_objects(cursor=cursor, queryset=MyModel.objects.all())[0] == [
+        obj
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bootstrap_error() -> None:
+    for i in range(20):
+        MyModel.objects.create(number=i)
+
+    handled = []
+
+    def handle(objects: list[Any]) -> None:
+        if (19,) in objects:
+            raise ValueError("Can't handle it")
+        handled.extend(objects)
+
+    with pytest.raises(ValueError):
+        bootstrap_changed_objects(
+            queryset=MyModel.objects.values_list("number"),
+            handle=handle,
+            workers=2,
+            chunk_size=1,
+        )
+    assert (19,) not in handled
@@ -0,0 +1,60 @@
+import pytest
+from django.db.models import F
+
+from demo.models import MyModel
+from tracked_model import get_changed_objects
+from tracked_model.columns import get_changed_columns
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_changed_columns() -> None:
+    objects = [MyModel.objects.create(number=i, tenant=i % 2) for i in range(5)]
+    ids = [obj.id for obj in objects]
+
+    qs = MyModel.objects.order_by("id")
+    changes, cursor = get_changed_columns(cursor=None, queryset=qs)
+    assert changes.columns == {
+        "id": ids,
+        "number": [0, 1, 2, 3, 4],
+        "tenant": [0, 1, 0, 1, 0],
+    }
+    assert changes.object_ids == ids
+    assert len(set(changes.last_modified_txids)) == 5
+    assert cursor == get_changed_objects(cursor=None, queryset=qs)[1]
+
+    # Nothing changed since
+    changes, next_cursor = get_changed_columns(cursor=cursor, queryset=qs)
+    assert len(changes) == 0
+    assert changes.columns == {"id": [], "number": [], "tenant": []}
+    assert next_cursor == cursor
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_changed_columns_values() -> None:
+    for i in range(5):
+        MyModel.objects.create(number=i, tenant=i % 2)
+
+    qs = (
+        MyModel.objects.filter(tenant=0)
+        .order_by("number")
+        .annotate(double=F("number") * 2)
+        .values_list("number", "double")
+    )
+    cursor = None
+    batches = []
+    while True:
+        changes, cursor = get_changed_columns(cursor=cursor, limit=2, queryset=qs)
+        if not changes:
+            break
+        batches.append(changes.columns)
+
+    assert batches == [
+        {"number": [0, 2], "double": [0, 4]},
+        {"number": [4], "double": [8]},
+    ]
+
+    changes, _ = get_changed_columns(cursor=None, queryset=MyModel.objects.values())
+    assert list(changes.columns) == ["id", "number", "tenant"]
+
+    with pytest.raises(ValueError):
+        get_changed_columns(cursor=None, queryset=MyModel.objects.select_related())
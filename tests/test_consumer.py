@@ -0,0 +1,78 @@
+import pytest
+
+from demo.models import MyModel
+from tracked_model import get_changed_objects
+from tracked_model.consumer import prefetch_changed_objects
+
+
+@pytest.mark.django_db(transaction=True)
+def test_prefetch_changes() -> None:
+    objs = [MyModel.objects.create(number=i) for i in range(5)]
+
+    batches = []
+    cursor = None
+    with prefetch_changed_objects(
+        cursor=None,
+        limit=2,
+        queryset=MyModel.objects.order_by("pk").values_list("number"),
+        depth=2,
+        stop_when_empty=True,
+    ) as prefetcher:
+        for batch in prefetcher:
+            batches.append(batch.objects)
+            cursor = batch.cursor
+
+        # Iterating again would wait for a thread that's done
+        with pytest.raises(RuntimeError):
+            next(iter(prefetcher))
+
+    assert batches == [[(0,), (1,)], [(2,), (3,)], [(4,)]]
+
+    objs[0].save()
+    assert get_changed_objects(cursor=cursor, queryset=MyModel.objects.all())[0] == [
+        objs[0]
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_prefetch_changes_error() -> None:
+    """
+    Test that errors in the background thread are raised to the consumer
+    """
+
+    with prefetch_changed_objects(
+        cursor=None,
+        queryset=MyModel.objects.all(),
+        stop_when_empty=True,
+        partition=(4, 4),
+    ) as prefetcher:
+        with pytest.raises(ValueError):
+            list(prefetcher)
+        with pytest.raises(RuntimeError):
+            list(prefetcher)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_prefetch_changes_close() -> None:
+    """
+    Test that we can stop while the thread is waiting for room in the queue
+    """
+
+    for i in range(5):
+        MyModel.objects.create(number=i)
+
+    with prefetch_changed_objects(
+        cursor=None, limit=1, queryset=MyModel.objects.all(), depth=1
+    ) as prefetcher:
+        changes, _ = next(iter(prefetcher))
+        assert len(changes) == 1
+
+    assert not prefetcher._thread.is_alive()
+
+
+def test_prefetch_changes_not_started() -> None:
+    prefetcher = prefetch_changed_objects(
+        cursor=None, queryset=MyModel.objects.all(), stop_when_empty=True
+    )
+    with pytest.raises(RuntimeError):
+        next(iter(prefetcher))
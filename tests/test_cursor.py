@@ -0,0 +1,135 @@
+import json
+import zlib
+from base64 import urlsafe_b64encode
+from dataclasses import asdict
+
+import pytest
+
+from tracked_model import Cursor
+from tracked_model.cursor import (
+    COMPRESSED,
+    CURSOR_VERSION,
+    MAX_CURSOR_SIZE,
+    Snapshot,
+    pack_cursor,
+)
+
+CURSORS = [
+    Cursor(xid_next=1, xip_list=[]),
+    Cursor(xid_next=2**40, xid_at=2**40 - 1, xid_at_id=0, xip_list=[2**32, 5]),
+    Cursor(xid_next=100_000, xid_at=99_990, xid_at_id=12, xip_list=[*range(0, 999)]),
+]
+
+
+@pytest.mark.parametrize("cursor", CURSORS)
+def test_cursor_roundtrip(cursor: Cursor) -> None:
+    serialized = cursor.serialize()
+    assert "=" not in serialized
+    assert Cursor.deserialize(serialized) == cursor
+    assert Cursor.model_validate_json(cursor.model_dump_json()) == cursor
+
+
+@pytest.mark.parametrize("cursor", CURSORS)
+def test_cursor_legacy_json(cursor: Cursor) -> None:
+    legacy = urlsafe_b64encode(json.dumps(asdict(cursor)).encode()).decode()
+    assert Cursor.deserialize(legacy) == cursor
+
+
+def test_cursor_compression() -> None:
+    packed = pack_cursor(CURSORS[2])
+    assert packed[0] & COMPRESSED
+    assert len(packed) < len(CURSORS[2].xip_list)
+
+
+def test_cursor_decompression_limit() -> None:
+    blob = bytes([CURSOR_VERSION | COMPRESSED]) + zlib.compress(
+        bytes(MAX_CURSOR_SIZE + 1)
+    )
+    with pytest.raises(ValueError, match="too large"):
+        Cursor.deserialize(urlsafe_b64encode(blob).decode())
+
+
+def test_cursor_long_varint() -> None:
+    """
+    Test that a varint longer than any transaction ID is rejected, rather
+    than read however long it is
+    """
+
+    blob = bytes([CURSOR_VERSION | COMPRESSED]) + zlib.compress(
+        b"\xff" * MAX_CURSOR_SIZE
+    )
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        Cursor.deserialize(urlsafe_b64encode(blob).decode())
+
+    # The largest transaction ID still fits
+    cursor = Cursor(xid_next=2**63 - 1, xip_list=[2**63 - 1])
+    assert Cursor.deserialize(cursor.serialize()) == cursor
+
+    blob = bytes([CURSOR_VERSION]) + b"\xff" * 9 + b"\x7f" + b"\x00" * 3
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        Cursor.deserialize(urlsafe_b64encode(blob).decode())
+
+
+def test_cursor_sorted() -> None:
+    cursor = Cursor(xid_next=10, xip_list=[7, 3, 5])
+    assert cursor.xip_list == [3, 5, 7]
+    assert cursor.in_progress(5)
+    assert not cursor.in_progress(4)
+    assert not cursor.in_progress(8)
+
+
+def test_cursor_may_have_changes() -> None:
+    cursor = Cursor(xid_next=10, xip_list=[5, 7])
+
+    assert not cursor.may_have_changes(Snapshot(xmin=5, xmax=10, xip_list=[5, 7]))
+    assert not cursor.may_have_changes(Snapshot(xmin=5, xmax=10, xip_list=[5, 7, 8]))
+    # Something after xid_next has finished
+    assert cursor.may_have_changes(Snapshot(xmin=5, xmax=11, xip_list=[5, 7, 10]))
+    # One of the in progress transactions has finished
+    assert cursor.may_have_changes(Snapshot(xmin=7, xmax=10, xip_list=[7]))
+
+    # Partway through a transaction there are always more to look for
+    cursor = Cursor(xid_next=10, xid_at=8, xid_at_id=1, xip_list=[])
+    assert cursor.may_have_changes(Snapshot(xmin=10, xmax=10, xip_list=[]))
+
+
+@pytest.mark.parametrize("value", ["AQ", "gQAA", "Ag", "AQEAAAAA", "e30", "A", 1])
+def test_cursor_invalid(value: str) -> None:
+    with pytest.raises(ValueError):
+        Cursor.deserialize(value)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"xid_next": "abc", "xip_list": []},
+        {"xid_next": "5", "xip_list": []},
+        {"xid_next": 5, "xip_list": ["a"]},
+        {"xid_next": 5, "xip_list": "123"},
+        {"xid_next": 5, "xip_list": [], "xid_at_id": "x"},
+        {"xid_next": 5, "xip_list": [], "xid_at": True},
+        {"xid_next": -1, "xip_list": []},
+        {"xid_next": 2**63, "xip_list": []},
+        {"xid_next": 5},
+    ],
+)
+def test_cursor_invalid_legacy_json(data: dict[str, object]) -> None:
+    legacy = urlsafe_b64encode(json.dumps(data).encode()).decode()
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        Cursor.deserialize(legacy)
+
+
+def test_cursor_pydantic_field() -> None:
+    pytest.importorskip("pydantic")
+    from pydantic import BaseModel, ValidationError
+
+    class Subscription(BaseModel):
+        cursor: Cursor
+
+    subscription = Subscription(cursor=CURSORS[1])
+    serialized = subscription.model_dump_json()
+    assert serialized == f'{{"cursor":"{CURSORS[1].serialize()}"}}'
+    assert Subscription.model_validate_json(serialized) == subscription
+
+    with pytest.raises(ValidationError):
+        Subscription.model_validate_json('{"cursor": "AQ"}')
@@ -0,0 +1,62 @@
+import csv
+import io
+
+import pytest
+from django.db import transaction
+
+from demo.models import MyModel
+from tracked_model import get_changed_objects
+from tracked_model.export import export_changes
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_changes() -> None:
+    for i in range(5):
+        MyModel.objects.create(number=i, tenant=i % 2)
+    qs = MyModel.objects.filter(tenant=0).order_by("number").values("number", "tenant")
+
+    sink = io.BytesIO()
+    count, cursor = export_changes(cursor=None, queryset=qs, sink=sink, header=True)
+    assert count == 3
+    assert list(csv.reader(io.StringIO(sink.getvalue().decode()))) == [
+        ["number", "tenant"],
+        ["0", "0"],
+        ["2", "0"],
+        ["4", "0"],
+    ]
+    assert cursor == get_changed_objects(cursor=None, queryset=qs)[1]
+
+    # Nothing changed since
+    sink = io.BytesIO()
+    assert export_changes(cursor=cursor, queryset=qs, sink=sink) == (0, cursor)
+    assert sink.getvalue() == b""
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_changes_in_batches() -> None:
+    with transaction.atomic():
+        for i in range(5):
+            MyModel.objects.create(number=i)
+    MyModel.objects.create(number=5)
+    qs = MyModel.objects.order_by("number").values_list("number")
+
+    cursor = None
+    batches = []
+    while True:
+        sink = io.BytesIO()
+        count, cursor = export_changes(
+            cursor=cursor, limit=2, queryset=qs, sink=sink, format="text"
+        )
+        if not count:
+            break
+        batches.append(sink.getvalue().decode().split())
+
+    assert batches == [["0", "1"], ["2", "3"], ["4", "5"]]
+
+    with pytest.raises(ValueError):
+        export_changes(
+            cursor=None,
+            queryset=qs,
+            sink=io.BytesIO(),
+            format="xml",  # type: ignore[arg-type]
+        )
@@ -1,12 +1,24 @@
 from threading import Event, Thread
+from typing import Any, Iterator
 
 import pytest
 import structlog
-from django.db import transaction
+from django.db import connection, transaction
 from django.db.models import F
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 
 from demo.models import MyModel
-from tracked_model import get_changed_objects
+from tracked_model import (
+    Cursor,
+    get_changed_objects,
+    get_changed_objects_for_cursors,
+    get_many_changed_objects,
+    iter_changed_objects,
+    may_have_changes,
+)
+from tracked_model.query import PrefixedQuery
+from tracked_model.utils import _compiled_changes
 
 from .utils import get_current_txid, handle_exception, run_threads
 
@@ -14,7 +26,8 @@ log = structlog.get_logger(__name__)
 
 
 @pytest.mark.django_db(transaction=True)
-def test_get_changes() -> None:
+@pytest.mark.parametrize("single_query", [False, True])
+def test_get_changes(single_query: bool) -> None:
 
     m1 = MyModel.objects.create(number=10)
     m2 = MyModel.objects.create(number=11)
@@ -23,22 +36,374 @@ def test_get_changes() -> None:
 
     qs = MyModel.objects.values("id", "number", version=F("version_info__version"))
 
-    changes, cursor = get_changed_objects(cursor=None, limit=1, queryset=qs)
+    def get_changes(cursor: Cursor | None) -> tuple[list[Any], Cursor]:
+        return get_changed_objects(
+            cursor=cursor, limit=1, queryset=qs, single_query=single_query
+        )
+
+    changes, cursor = get_changes(None)
     assert changes == [{"id": m2.id, "number": 11, "version": 1}]
 
-    changes, cursor = get_changed_objects(cursor=cursor, limit=1, queryset=qs)
+    changes, cursor = get_changes(cursor)
     assert changes == [{"id": m1.id, "number": 9, "version": 2}]
 
-    changes, cursor = get_changed_objects(cursor=cursor, limit=1, queryset=qs)
+    changes, cursor = get_changes(cursor)
     assert changes == []
 
     m1.number -= 1
     m1.save(update_fields=["number"])
 
-    changes, cursor = get_changed_objects(cursor=cursor, limit=1, queryset=qs)
+    changes, cursor = get_changes(cursor)
     assert changes == [{"id": m1.id, "number": 8, "version": 3}]
 
 
+@pytest.mark.django_db(transaction=True)
+def test_get_changes_single_query() -> None:
+    """
+    Test that the snapshot and changes are fetched in one query, for all kinds
+    of querysets.
+    """
+
+    m1 = MyModel.objects.create(number=10)
+    m2 = MyModel.objects.create(number=11)
+
+    with CaptureQueriesContext(connection) as queries:
+        changes, cursor = get_changed_objects(
+            cursor=None, queryset=MyModel.objects.order_by("-id"), single_query=True
+        )
+    assert len(queries) == 1
+    assert changes == [m2, m1]
+
+    rows, _ = get_changed_objects(
+        cursor=None,
+        queryset=MyModel.objects.values_list("number"),
+        single_query=True,
+    )
+    assert sorted(rows) == [(10,), (11,)]
+
+    with CaptureQueriesContext(connection) as queries:
+        changes, next_cursor = get_changed_objects(
+            cursor=cursor, queryset=MyModel.objects.all(), single_query=True
+        )
+    assert len(queries) == 1
+    assert changes == []
+    assert next_cursor == cursor
+
+
+@pytest.mark.django_db(transaction=True)
+def test_iter_changes() -> None:
+    """
+    Test that streaming changes gives the same objects and cursor as fetching
+    them in one go.
+    """
+
+    objects = MyModel.objects.bulk_create(MyModel(number=i) for i in range(5))
+    qs = MyModel.objects.order_by("id").values("id", "number")
+
+    changes = iter_changed_objects(cursor=None, limit=3, queryset=qs, chunk_size=2)
+    with pytest.raises(RuntimeError):
+        changes.next_cursor
+
+    assert list(changes) == [
+        {"id": obj.id, "number": obj.number} for obj in objects[:3]
+    ]
+    _, cursor = get_changed_objects(cursor=None, limit=3, queryset=qs)
+    assert changes.next_cursor == cursor
+
+    with pytest.raises(RuntimeError):
+        list(changes)
+
+    changes = iter_changed_objects(cursor=cursor, queryset=qs)
+    assert list(changes) == [
+        {"id": obj.id, "number": obj.number} for obj in objects[3:]
+    ]
+    assert changes.next_cursor.xid_at is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_many_changes() -> None:
+    """
+    Test fetching changes for several querysets in one transaction
+    """
+
+    m1 = MyModel.objects.create(number=1)
+    m2 = MyModel.objects.create(number=2)
+
+    querysets = {
+        "odd": MyModel.objects.filter(number=1),
+        "even": MyModel.objects.filter(number=2),
+    }
+
+    with CaptureQueriesContext(connection) as queries:
+        changes = get_many_changed_objects(querysets=querysets, cursors={})
+    # One query for the snapshot and one per queryset
+    selects = [q for q in queries if q["sql"].startswith("SELECT")]
+    assert len(selects) == 3
+
+    odd, odd_cursor = changes["odd"]
+    even, even_cursor = changes["even"]
+    assert odd == [m1]
+    assert even == [m2]
+    assert odd_cursor.xid_next == even_cursor.xid_next
+
+    m2.number = 1
+    m2.save(update_fields=["number"])
+
+    changes = get_many_changed_objects(
+        querysets=querysets, cursors={"odd": odd_cursor, "even": even_cursor}
+    )
+    assert changes["odd"][0] == [m2]
+    assert changes["even"][0] == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_changes_for_cursors() -> None:
+    """
+    Test fetching changes for many cursors with one snapshot and one query
+    """
+
+    objects = [MyModel.objects.create(number=i) for i in range(5)]
+    qs = MyModel.objects.order_by("-number").values_list("number")
+
+    _, middle = get_changed_objects(
+        cursor=None, limit=2, queryset=MyModel.objects.order_by("id")
+    )
+    _, end = get_changed_objects(cursor=None, queryset=qs)
+
+    cursors = {"new": None, "also_new": None, "middle": middle, "end": end}
+    with CaptureQueriesContext(connection) as queries:
+        changes = get_changed_objects_for_cursors(cursors=cursors, limit=2, queryset=qs)
+    # One query for the snapshot and one for the changes
+    selects = [q for q in queries if q["sql"].startswith(("SELECT", "WITH"))]
+    assert len(selects) == 2
+
+    for key, cursor in cursors.items():
+        assert changes[key] == get_changed_objects(cursor=cursor, limit=2, queryset=qs)
+
+    assert changes["new"][0] == [(1,), (0,)]
+    assert changes["middle"][0] == [(3,), (2,)]
+    assert changes["end"][0] == []
+
+    objects[0].save()
+    changes = get_changed_objects_for_cursors(
+        cursors={"end": changes["end"][1]}, queryset=qs
+    )
+    assert changes["end"][0] == [(0,)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_changes_for_cursors_ordering() -> None:
+    """
+    Test that the queryset's ordering is kept, also when it's on something
+    that isn't selected
+    """
+
+    for i in range(6):
+        MyModel.objects.create(number=i % 3)
+    qs = (
+        MyModel.objects.annotate(negated=-F("number"))
+        .order_by(F("negated").asc(nulls_first=True), "-pk")
+        .values("pk")
+    )
+
+    changes = get_changed_objects_for_cursors(cursors={"new": None}, queryset=qs)
+    assert changes["new"][0] == list(qs)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_partitioned_changes() -> None:
+    """
+    Test that each object is included in exactly one partition
+    """
+
+    objects = MyModel.objects.bulk_create(MyModel(number=i) for i in range(20))
+    qs = MyModel.objects.order_by("id")
+
+    partitions = []
+    for index in range(4):
+        changes, cursor = get_changed_objects(
+            cursor=None, queryset=qs, partition=(index, 4)
+        )
+        partitions.append(changes)
+        assert cursor.xid_at is None
+
+    assert sorted(sum(partitions, []), key=lambda obj: obj.id) == objects
+
+    with pytest.raises(ValueError):
+        get_changed_objects(cursor=None, queryset=qs, partition=(4, 4))
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("single_query", [False, True])
+def test_get_filtered_changes(single_query: bool) -> None:
+    """
+    Test that the limit applies after the queryset's filters, so batches of a
+    filtered queryset are full and no changes are skipped
+    """
+
+    MyModel.objects.bulk_create(MyModel(number=i) for i in range(10))
+    qs = MyModel.objects.filter(number__gte=5).values_list("number")
+
+    batches = []
+    cursor = None
+    while True:
+        changes, cursor = get_changed_objects(
+            cursor=cursor, limit=2, queryset=qs, single_query=single_query
+        )
+        if not changes:
+            break
+        batches.append(sorted(changes))
+
+    assert batches == [[(5,), (6,)], [(7,), (8,)], [(9,)]]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_changes_copied_fields() -> None:
+    """
+    Test that filters on fields copied to the version model are applied to
+    the version table directly
+    """
+
+    for i in range(6):
+        MyModel.objects.create(number=i, tenant=i % 2)
+
+    qs = MyModel.objects.filter(tenant=1).values_list("number")
+    with CaptureQueriesContext(connection) as queries:
+        changes, _ = get_changed_objects(cursor=None, queryset=qs)
+    assert sorted(changes) == [(1,), (3,), (5,)]
+    assert not any("EXISTS" in query["sql"] for query in queries)
+
+    # Other filters still need to be checked against the tracked table
+    changes, _ = get_changed_objects(
+        cursor=None, queryset=qs.filter(number__gt=1), limit=1
+    )
+    assert changes == [(3,)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_get_changes_compiled_once() -> None:
+    """
+    Test that the SQL for the changes is compiled once for each shape of
+    queryset, whatever the cursor
+    """
+
+    _compiled_changes.clear()
+    with transaction.atomic():
+        m1 = MyModel.objects.create(number=1)
+        txid = get_current_txid()
+
+    cursors = [
+        None,
+        Cursor(xid_next=txid, xip_list=[]),
+        Cursor(xid_next=txid + 1, xip_list=[txid - 1, txid]),
+        Cursor(xid_next=txid + 1, xip_list=[], xid_at=txid, xid_at_id=0),
+    ]
+    for cursor in cursors:
+        changes, _ = get_changed_objects(
+            cursor=cursor, queryset=MyModel.objects.filter(number=1)
+        )
+        assert changes == [m1]
+    assert len(_compiled_changes) == 1
+
+    # Other filters, limits and partitions are compiled separately
+    changes, _ = get_changed_objects(
+        cursor=None, queryset=MyModel.objects.filter(number=2)
+    )
+    assert changes == []
+    get_changed_objects(cursor=None, queryset=MyModel.objects.all(), limit=10)
+    get_changed_objects(
+        cursor=None, queryset=MyModel.objects.all(), limit=10, partition=(0, 2)
+    )
+    assert len(_compiled_changes) == 4
+
+
+@pytest.mark.django_db(transaction=True)
+@override_settings(TRACKED_MODEL_PREPARED_STATEMENTS=True)
+def test_get_changes_prepared() -> None:
+    m1 = MyModel.objects.create(number=1)
+    qs = MyModel.objects.filter(number__in=[1, 2])
+
+    with CaptureQueriesContext(connection) as queries:
+        changes, cursor = get_changed_objects(cursor=None, queryset=qs)
+    assert changes == [m1]
+    assert any(query["sql"].startswith("PREPARE") for query in queries)
+
+    m2 = MyModel.objects.create(number=2)
+    with CaptureQueriesContext(connection) as queries:
+        changes, cursor = get_changed_objects(cursor=cursor, queryset=qs)
+        changes_at, _ = get_changed_objects(
+            cursor=Cursor(
+                xid_next=cursor.xid_next,
+                xip_list=[cursor.xid_next - 1],
+                xid_at=cursor.xid_next - 1,
+                xid_at_id=0,
+            ),
+            queryset=qs,
+        )
+    assert changes == [m2]
+    assert changes_at == [m2]
+    assert not any(query["sql"].startswith("PREPARE") for query in queries)
+    assert sum(query["sql"].startswith("EXECUTE") for query in queries) == 2
+
+
+@pytest.fixture
+def server_side_binding() -> Iterator[None]:
+    """
+    Have psycopg 3 bind the parameters on the server, on a new connection
+    """
+
+    options = connection.settings_dict["OPTIONS"]
+    connection.close()
+    options["server_side_binding"] = True
+    try:
+        yield
+    finally:
+        del options["server_side_binding"]
+        connection.close()
+
+
+@pytest.mark.django_db(transaction=True)
+@override_settings(TRACKED_MODEL_PREPARED_STATEMENTS=True)
+@pytest.mark.usefixtures("server_side_binding")
+def test_get_changes_prepared_server_side_binding() -> None:
+    """
+    Test that prepared statements also work when psycopg sends the
+    parameters separately, which EXECUTE can't take
+    """
+
+    m1 = MyModel.objects.create(number=1)
+    qs = MyModel.objects.filter(number__in=[1, 2])
+
+    changes, cursor = get_changed_objects(cursor=None, queryset=qs)
+    assert changes == [m1]
+
+    m2 = MyModel.objects.create(number=2)
+    with CaptureQueriesContext(connection) as queries:
+        changes, cursor = get_changed_objects(cursor=cursor, queryset=qs)
+    assert changes == [m2]
+    assert any(query["sql"].startswith("EXECUTE") for query in queries)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_may_have_changes() -> None:
+    qs = MyModel.objects.values_list("number")
+    assert may_have_changes(cursor=None)
+
+    MyModel.objects.create(number=1)
+    changes, cursor = get_changed_objects(cursor=None, queryset=qs)
+    assert changes == [(1,)]
+
+    with CaptureQueriesContext(connection) as queries:
+        assert not may_have_changes(cursor=cursor)
+    assert len(queries) == 1
+
+    MyModel.objects.create(number=2)
+    assert may_have_changes(cursor=cursor)
+    changes, cursor = get_changed_objects(cursor=cursor, queryset=qs)
+    assert changes == [(2,)]
+    assert not may_have_changes(cursor=cursor)
+
+
 @pytest.mark.django_db(transaction=True)
 def test_get_changes_with_concurrent_changes() -> None:
     """
@@ -136,12 +501,14 @@ def test_get_changes_with_concurrent_changes() -> None:
         assert cursor.xid_at_id is None
         assert cursor.xip_list == [t2_txid]
         assert cursor.xid_next == t1_txid + 1
+        assert not may_have_changes(cursor=cursor)
 
         t2_event.set()
 
         # Wait for the next main step
         log.info("Main: Waiting for main event 2")
         assert main_event.wait(timeout=1)
+        assert may_have_changes(cursor=cursor)
 
         changes, cursor = get_changed_objects(cursor=cursor, limit=1, queryset=qs)
         assert changes == [
@@ -158,3 +525,11 @@ def test_get_changes_with_concurrent_changes() -> None:
         assert cursor.xid_at_id is None
         assert cursor.xip_list == []
         assert cursor.xid_next == t1_txid + 1
+
+
+def test_prefixed_query_incomplete() -> None:
+    with pytest.raises(TypeError, match="take_prefix"):
+
+        class IncompleteQuery(PrefixedQuery):
+            def wrap_sql(self, sql: str) -> str:
+                return sql
@@ -0,0 +1,143 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from demo.models import MyModel
+from tracked_model import get_changed_objects
+from tracked_model.hub import ChangeHub
+from tracked_model.models import BackfillProgress
+
+
+@pytest.mark.django_db(transaction=True)
+def test_hub_serves_from_memory() -> None:
+    for i in range(5):
+        MyModel.objects.create(number=i)
+
+    qs = MyModel.objects.order_by("number").values_list("number")
+    hub = ChangeHub(queryset=qs, limit=2)
+    assert hub.poll()
+    assert hub.poll()
+    assert not hub.poll()
+
+    expected, expected_cursor = get_changed_objects(cursor=None, limit=2, queryset=qs)
+
+    with CaptureQueriesContext(connection) as queries:
+        changes, cursor = hub.get_changed_objects(cursor=None)
+        assert (changes, cursor) == (expected, expected_cursor)
+
+        # Consecutive batches are joined up to the limit
+        changes, head = hub.get_changed_objects(cursor=None, limit=5)
+        assert changes == [(0,), (1,), (2,), (3,), (4,)]
+        changes, _ = hub.get_changed_objects(cursor=None, limit=3)
+        assert changes == [(0,), (1,)]
+
+        # Nothing new after the latest cursor
+        assert hub.get_changed_objects(cursor=head) == ([], head)
+
+    assert len(queries) == 0
+
+    assert hub.get_buffered_changes(cursor=None) == (expected, expected_cursor)
+    assert hub.get_buffered_changes(cursor=None, limit=1) is None
+
+    # Less than a batch has to come from the database
+    with CaptureQueriesContext(connection) as queries:
+        changes, cursor = hub.get_changed_objects(cursor=None, limit=1)
+    assert changes == [(0,)]
+    assert len(queries) > 0
+
+    # Once caught up, a subscriber continues from the hub's cursor
+    changes, cursor = hub.get_changed_objects(cursor=cursor, limit=10)
+    assert changes == [(1,), (2,), (3,), (4,)]
+    assert cursor == head
+
+    # New changes show up once the hub has polled again
+    MyModel.objects.filter(number=3).update(number=30)
+    assert hub.get_changed_objects(cursor=head) == ([], head)
+    hub.poll()
+    changes, _ = hub.get_changed_objects(cursor=head)
+    assert changes == [(30,)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_hub_idle_after_unrelated_commit() -> None:
+    """
+    Test that a commit to another table costs the hub one change query,
+    rather than one on every poll after it
+    """
+
+    MyModel.objects.create(number=1)
+    hub = ChangeHub(queryset=MyModel.objects.values_list("number"))
+    hub.poll()
+    _, head = hub.get_changed_objects(cursor=None)
+
+    BackfillProgress.objects.create(version_table="unrelated")
+    hub.poll()
+
+    # Only the snapshot probe
+    with CaptureQueriesContext(connection) as queries:
+        assert not hub.poll()
+        assert not hub.poll()
+    assert len(queries) == 2
+
+    # Subscribers at the earlier cursor move on without a query too
+    with CaptureQueriesContext(connection) as queries:
+        changes, cursor = hub.get_changed_objects(cursor=head)
+    assert changes == []
+    assert cursor != head
+    assert len(queries) == 0
+
+    MyModel.objects.create(number=2)
+    hub.poll()
+    with CaptureQueriesContext(connection) as queries:
+        assert hub.get_changed_objects(cursor=head)[0] == [(2,)]
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_hub_evicts_old_batches() -> None:
+    for i in range(4):
+        MyModel.objects.create(number=i)
+
+    qs = MyModel.objects.order_by("number").values_list("number")
+    hub = ChangeHub(queryset=qs, limit=1, max_bytes=2, sizeof=lambda obj: 1)
+    while hub.poll():
+        pass
+    assert hub.buffered_bytes == 2
+
+    # The first batches are gone, so this reads from the database
+    with CaptureQueriesContext(connection) as queries:
+        changes, _ = hub.get_changed_objects(cursor=None, limit=10)
+    assert changes == [(0,), (1,), (2,), (3,)]
+    assert len(queries) > 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_hub_stale() -> None:
+    MyModel.objects.create(number=1)
+
+    qs = MyModel.objects.values_list("number")
+    hub = ChangeHub(queryset=qs, max_age=0)
+    hub.poll()
+
+    MyModel.objects.create(number=2)
+    with CaptureQueriesContext(connection) as queries:
+        changes, _ = hub.get_changed_objects(cursor=None)
+    assert sorted(changes) == [(1,), (2,)]
+    assert len(queries) > 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_hub_thread() -> None:
+    MyModel.objects.create(number=1)
+
+    qs = MyModel.objects.values_list("number")
+    with ChangeHub(queryset=qs, poll_interval=0.01) as hub:
+        for _ in range(500):
+            if hub._polled_at is not None:
+                break
+            hub._stop.wait(0.01)
+        changes, _ = hub.get_changed_objects(cursor=None)
+
+    assert hub.last_error is None
+    assert changes == [(1,)]
+    assert not hub._thread.is_alive()
@@ -0,0 +1,78 @@
+import time
+from threading import Thread
+
+import pytest
+from django.apps import apps
+from django.db import connection
+
+from demo.models import MyModel
+from tracked_model import get_changed_objects
+from tracked_model.notify import wait_for_changed_objects
+
+from .types import MigrateToFixture
+from .utils import handle_exception, run_threads
+
+
+@pytest.mark.django_db(transaction=True)
+def test_wait_for_changes_timeout() -> None:
+    MyModel.objects.create(number=1)
+    _, cursor = get_changed_objects(cursor=None, queryset=MyModel.objects.all())
+
+    start = time.monotonic()
+    changes, next_cursor = wait_for_changed_objects(
+        cursor=cursor, queryset=MyModel.objects.all(), timeout=0.2
+    )
+    assert changes == []
+    assert next_cursor == cursor
+    assert time.monotonic() - start >= 0.2
+
+
+@pytest.mark.django_db(transaction=True)
+def test_wait_for_changes_notified() -> None:
+    """
+    Test that we're woken up as soon as a change is committed
+    """
+
+    _, cursor = get_changed_objects(cursor=None, queryset=MyModel.objects.all())
+
+    @handle_exception()
+    def create() -> None:
+        time.sleep(0.2)
+        MyModel.objects.create(number=2)
+
+    with run_threads([Thread(name="1", target=create, daemon=True)]):
+        start = time.monotonic()
+        changes, _ = wait_for_changed_objects(
+            cursor=cursor, queryset=MyModel.objects.values("number"), timeout=5
+        )
+
+    assert changes == [{"number": 2}]
+    assert time.monotonic() - start < 5
+
+
+def _has_notify_trigger() -> bool:
+    version_table = apps.get_model("demo", "MyModelVersion")._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_trigger "
+            "WHERE tgrelid = %s::regclass AND tgname = 'notify_version_info'",
+            [version_table],
+        )
+        return cursor.fetchone() is not None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_notify_migration(migrate_to: MigrateToFixture) -> None:
+    """
+    Test that reverting the migration adding notify drops the notify
+    trigger, but keeps the others
+    """
+
+    migrate_to("demo", "0006")
+    assert not _has_notify_trigger()
+    obj = MyModel.objects.create(number=1)
+    version_model = apps.get_model("demo", "MyModelVersion")
+    assert version_model.objects.get(pk=obj.pk).version == 1
+
+    migrate_to("demo", "__latest__")
+    assert _has_notify_trigger()
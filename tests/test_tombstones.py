@@ -0,0 +1,129 @@
+import io
+from datetime import timedelta
+
+import pytest
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+from demo.models import MyModel
+from tracked_model import DeletedObject, get_changed_objects
+from tracked_model.tombstones import purge_tombstones
+
+from .types import MigrateToFixture
+
+MyModelVersion = apps.get_model("demo", "MyModelVersion")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_deleted_objects() -> None:
+    m1 = MyModel.objects.create(number=1, tenant=1)
+    m2 = MyModel.objects.create(number=2, tenant=2)
+    qs = MyModel.objects.all()
+
+    changes, cursor = get_changed_objects(
+        cursor=None, queryset=qs, include_deleted=True
+    )
+    assert changes == [m1, m2]
+
+    deleted_pk = m1.pk
+    m1.delete()
+    m2.number = 3
+    m2.save()
+
+    version = MyModelVersion.objects.get(pk=deleted_pk)
+    assert version.deleted
+    assert version.version == 2
+
+    # Tombstones are left out unless asked for, and don't fill the batch
+    changes, _ = get_changed_objects(cursor=cursor, limit=1, queryset=qs)
+    assert changes == [m2]
+
+    changes, next_cursor = get_changed_objects(
+        cursor=cursor, queryset=qs, include_deleted=True
+    )
+    assert changes == [m2, DeletedObject(pk=deleted_pk)]
+
+    # There's no telling whether a deleted object matched a filter, unless
+    # it's on a copied field
+    changes, _ = get_changed_objects(
+        cursor=cursor, queryset=qs.filter(number=3), include_deleted=True
+    )
+    assert changes == [m2, DeletedObject(pk=deleted_pk)]
+    changes, _ = get_changed_objects(
+        cursor=cursor, queryset=qs.filter(tenant=2), include_deleted=True
+    )
+    assert changes == [m2]
+
+    # An object inserted with the id of a deleted one replaces the tombstone
+    MyModel.objects.create(pk=deleted_pk, number=4, tenant=4)
+    version.refresh_from_db()
+    assert not version.deleted
+    assert version.version == 3
+    assert version.tenant == 4
+
+    values, _ = get_changed_objects(
+        cursor=next_cursor, queryset=qs.values("pk", "number"), include_deleted=True
+    )
+    assert values == [{"pk": deleted_pk, "number": 4}]
+
+    with pytest.raises(ValueError):
+        get_changed_objects(
+            cursor=cursor, queryset=qs, include_deleted=True, single_query=True
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_purge_tombstones() -> None:
+    objects = [MyModel.objects.create(number=i) for i in range(5)]
+    MyModel.objects.filter(pk__in=[obj.pk for obj in objects[:3]]).delete()
+    MyModelVersion.objects.filter(pk=objects[0].pk).update(
+        last_modified_at=timezone.now() - timedelta(days=10)
+    )
+
+    assert purge_tombstones(MyModel, older_than=timedelta(days=7)) == 1
+
+    stdout = io.StringIO()
+    call_command(
+        "purge_tombstones",
+        "demo.MyModel",
+        "--older-than-days=0",
+        "--batch-size=1",
+        stdout=stdout,
+    )
+    assert stdout.getvalue() == "Purged 2 tombstones of demo.MyModel\n"
+    assert sorted(MyModelVersion.objects.values_list("pk", flat=True)) == [
+        obj.pk for obj in objects[3:]
+    ]
+
+
+def _triggers() -> set[str]:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT tgname FROM pg_trigger "
+            "WHERE tgrelid = %s::regclass AND NOT tgisinternal",
+            [MyModel._meta.db_table],
+        )
+        return {name for (name,) in cursor.fetchall()}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_track_deletes_migration(migrate_to: MigrateToFixture) -> None:
+    """
+    Test that reverting a migration adding tracking again puts back the
+    triggers from before it
+    """
+
+    historical_apps = migrate_to("demo", "0005")
+    assert _triggers() == {"insert_version_info", "update_version_info"}
+    obj = historical_apps.get_model("demo", "MyModel").objects.create(number=1)
+    HistoricalVersion = historical_apps.get_model("demo", "MyModelVersion")
+    assert HistoricalVersion.objects.get(pk=obj.pk).version == 1
+
+    migrate_to("demo", "__latest__")
+    assert _triggers() == {
+        "insert_version_info",
+        "update_version_info",
+        "delete_version_info",
+    }
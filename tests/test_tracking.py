@@ -1,12 +1,21 @@
-from typing import Callable
+from typing import Any, Callable, Iterator
 
 import pytest
-from django.db import transaction
+from django.apps import apps
+from django.db import connection, transaction
 
 from demo.models import MyModel
+from tracked_model.operations.tiggers import (
+    MAX_NAME_LENGTH,
+    _add_trigger_sql,
+    _copied_columns,
+    _deferred_names,
+)
 
 from .utils import get_current_txid
 
+MyModelVersion = apps.get_model("demo", "MyModelVersion")
+
 
 @pytest.mark.django_db(transaction=True)
 def test_insert_and_update_separate_transactions() -> None:
@@ -55,3 +64,165 @@ def test_insert_and_update_same_transaction(current_txid: int) -> None:
     version_info.refresh_from_db()
     assert version_info.version == 1
     assert version_info.last_modified_txid == current_txid
+
+
+@pytest.mark.django_db()
+def test_copied_fields(current_txid: int) -> None:
+    """
+    Test that copied fields follow the tracked object, also when they change
+    again in a transaction that has already bumped the version
+    """
+
+    model = MyModel.objects.create(number=1, tenant=1)
+    assert hasattr(model, "version_info")
+    version_info = model.version_info
+    assert version_info.tenant == 1
+
+    MyModel.objects.filter(pk=model.pk).update(tenant=2)
+    MyModel.objects.filter(pk=model.pk).update(tenant=3)
+
+    version_info.refresh_from_db()
+    assert version_info.tenant == 3
+    assert version_info.version == 1
+    assert version_info.last_modified_txid == current_txid
+
+
+@pytest.fixture
+def replace_triggers(transactional_db: None) -> Iterator[Callable[..., None]]:
+    """
+    Replace the triggers with ones with the given options, and put the usual
+    ones back afterwards
+    """
+
+    def replace(**options: Any) -> None:
+        queries = _add_trigger_sql(
+            MyModel._meta.db_table,
+            MyModelVersion._meta.db_table,
+            copy_columns=_copied_columns(MyModelVersion),
+            track_deletes=True,
+            **options,
+        )
+        with connection.cursor() as cursor:
+            for query in queries:
+                cursor.execute(query)
+
+    yield replace
+    replace()
+
+
+def test_watched_columns(replace_triggers: Callable[..., None]) -> None:
+    """
+    Test that only updates changing a watched column, or a copied one, bump
+    the version
+    """
+
+    replace_triggers(watched_columns=["number"])
+    model = MyModel.objects.create(number=1, tenant=1)
+    assert hasattr(model, "version_info")
+    version_info = model.version_info
+
+    model.save()
+    version_info.refresh_from_db()
+    assert version_info.version == 1
+
+    # Moving to another tenant must show up in that tenant's stream
+    with transaction.atomic():
+        MyModel.objects.filter(pk=model.pk).update(tenant=2)
+        txid = get_current_txid()
+    version_info.refresh_from_db()
+    assert version_info.version == 2
+    assert version_info.tenant == 2
+    assert version_info.last_modified_txid == txid
+
+    MyModel.objects.filter(pk=model.pk).update(number=2)
+    version_info.refresh_from_db()
+    assert version_info.version == 3
+
+
+def test_only_if_changed(replace_triggers: Callable[..., None]) -> None:
+    """
+    Test that updates leaving the row as it was don't bump the version
+    """
+
+    replace_triggers(watched_columns=[])
+    model = MyModel.objects.create(number=1, tenant=1)
+    other = MyModel.objects.create(number=1, tenant=1)
+    assert hasattr(model, "version_info")
+    version_info = model.version_info
+
+    model.save()
+    version_info.refresh_from_db()
+    assert version_info.version == 1
+
+    # Only the rows that changed are bumped
+    MyModel.objects.filter(pk__in=[model.pk, other.pk]).update(tenant=2)
+    MyModel.objects.filter(pk__in=[model.pk, other.pk]).update(number=2)
+    MyModel.objects.filter(pk=other.pk).update(number=3)
+
+    version_info.refresh_from_db()
+    assert version_info.version == 3
+    assert MyModelVersion.objects.get(pk=other.pk).version == 4
+
+
+def test_deferred(replace_triggers: Callable[..., None]) -> None:
+    """
+    Test that deferred triggers bump the version once per transaction, when
+    it commits
+    """
+
+    replace_triggers(deferred=True)
+    model = MyModel.objects.create(number=1, tenant=1)
+    assert hasattr(model, "version_info")
+    version_info = model.version_info
+    other = MyModel.objects.create(number=1)
+
+    with transaction.atomic():
+        txid = get_current_txid()
+        for number in range(2, 5):
+            MyModel.objects.filter(pk=model.pk).update(number=number)
+
+        version_info.refresh_from_db()
+        assert version_info.version == 1
+
+        # Changes rolled back to a savepoint are forgotten
+        with pytest.raises(ZeroDivisionError), transaction.atomic():
+            MyModel.objects.filter(pk=other.pk).update(number=2)
+            1 / 0
+
+    version_info.refresh_from_db()
+    assert version_info.version == 2
+    assert version_info.last_modified_txid == txid
+    assert MyModelVersion.objects.get(pk=other.pk).version == 1
+
+    # Also when the constraint is checked before the commit
+    with transaction.atomic():
+        MyModel.objects.filter(pk=model.pk).update(number=5)
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        version_info.refresh_from_db()
+        assert version_info.version == 3
+
+        MyModel.objects.filter(pk=other.pk).update(tenant=2)
+
+    version_info.refresh_from_db()
+    assert version_info.version == 3
+    other_version = MyModelVersion.objects.get(pk=other.pk)
+    assert other_version.version == 2
+    assert other_version.tenant == 2
+
+
+def test_deferred_names() -> None:
+    """
+    Test that the names of long version tables are shortened without
+    clashing
+    """
+
+    assert _deferred_names("demo_mymodelversion") == {
+        "changed_table": "demo_mymodelversion_changed",
+        "pending_table": "demo_mymodelversion_pending",
+        "apply_function": "apply_demo_mymodelversion",
+    }
+
+    names = _deferred_names("some_app_with_a_long_name_" + "x" * 40 + "version")
+    assert len(set(names.values())) == 3
+    assert all(len(name) <= MAX_NAME_LENGTH for name in names.values())
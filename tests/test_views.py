@@ -0,0 +1,206 @@
+import json
+import threading
+import time
+from base64 import urlsafe_b64encode
+from typing import Any
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from demo.models import MyModel
+from tracked_model import Cursor
+from tracked_model.hub import ChangeHub
+from tracked_model.views import ChangesView
+
+from .utils import handle_exception
+
+
+def get(view: Any, **kwargs: Any) -> Any:
+    headers = kwargs.pop("headers", {})
+    request = RequestFactory().get("/changes/", kwargs, headers=headers)
+    return async_to_sync(view)(request)
+
+
+def read_stream(response: Any) -> list[str]:
+    async def read() -> list[str]:
+        return [chunk.decode() async for chunk in response.streaming_content]
+
+    return async_to_sync(read)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_changes_view_long_poll() -> None:
+    MyModel.objects.create(number=1)
+    view = ChangesView.as_view(
+        queryset=MyModel.objects.values("number"), poll_interval=0.01
+    )
+
+    response = get(view)
+    data = json.loads(response.content)
+    assert data["changes"] == [{"number": 1}]
+
+    # Nothing changes while we wait
+    start = time.monotonic()
+    response = get(view, cursor=data["cursor"], wait=0.1)
+    assert 0.1 <= time.monotonic() - start < 1
+    data = json.loads(response.content)
+    assert data["changes"] == []
+
+    # The request returns as soon as there is a change
+    @handle_exception()
+    def change() -> None:
+        MyModel.objects.create(number=2)
+
+    timer = threading.Timer(0.1, change)
+    timer.start()
+    start = time.monotonic()
+    response = get(view, cursor=data["cursor"], wait=10)
+    timer.join()
+    assert time.monotonic() - start < 5
+    assert json.loads(response.content)["changes"] == [{"number": 2}]
+
+    # Without ?wait= there's no waiting at all
+    start = time.monotonic()
+    response = get(view, cursor=json.loads(response.content)["cursor"])
+    assert time.monotonic() - start < 0.1
+    assert json.loads(response.content)["changes"] == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_changes_view_long_poll_notify() -> None:
+    """
+    Test that with notify, waiting requests are woken up by a notification
+    rather than on the next poll
+    """
+
+    view = ChangesView.as_view(
+        queryset=MyModel.objects.values("number"), notify=True, poll_interval=60
+    )
+    cursor = json.loads(get(view).content)["cursor"]
+
+    @handle_exception()
+    def change() -> None:
+        MyModel.objects.create(number=1)
+
+    timer = threading.Timer(0.2, change)
+    timer.start()
+    start = time.monotonic()
+    response = get(view, cursor=cursor, wait=10)
+    timer.join()
+    assert time.monotonic() - start < 5
+    assert json.loads(response.content)["changes"] == [{"number": 1}]
+
+    # Nothing changes while we wait
+    cursor = json.loads(response.content)["cursor"]
+    start = time.monotonic()
+    response = get(view, cursor=cursor, wait=0.2)
+    assert time.monotonic() - start >= 0.2
+    assert json.loads(response.content) == {"changes": [], "cursor": cursor}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_changes_view_etag() -> None:
+    MyModel.objects.create(number=1)
+    hub = ChangeHub(queryset=MyModel.objects.values("number"))
+    hub.poll()
+    view = ChangesView.as_view(hub=hub)
+
+    response = get(view, wait=0)
+    cursor = json.loads(response.content)["cursor"]
+    assert "ETag" not in response.headers
+
+    response = get(view, cursor=cursor, wait=0)
+    assert json.loads(response.content) == {"changes": [], "cursor": cursor}
+    etag = response.headers["ETag"]
+
+    response = get(view, cursor=cursor, wait=0, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db(transaction=True)
+def test_changes_view_etag_without_hub() -> None:
+    """
+    Test that an empty conditional poll is answered from the snapshot probe
+    """
+
+    MyModel.objects.create(number=1)
+    view = ChangesView.as_view(queryset=MyModel.objects.values("number"))
+
+    cursor = json.loads(get(view, wait=0).content)["cursor"]
+    etag = get(view, cursor=cursor, wait=0).headers["ETag"]
+
+    with CaptureQueriesContext(connection) as queries:
+        response = get(view, cursor=cursor, wait=0, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert len(queries) == 1
+
+    MyModel.objects.create(number=2)
+    response = get(view, cursor=cursor, wait=0, headers={"If-None-Match": etag})
+    assert json.loads(response.content)["changes"] == [{"number": 2}]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_changes_view_ndjson() -> None:
+    for i in range(3):
+        MyModel.objects.create(number=i)
+    view = ChangesView.as_view(
+        queryset=MyModel.objects.order_by("number").values("number"),
+        stream_timeout=0.2,
+        keepalive_interval=0.05,
+        poll_interval=0.01,
+    )
+
+    response = get(view, stream="ndjson", limit=2)
+    assert response["Content-Type"] == "application/x-ndjson"
+    batches = [
+        json.loads(line) for line in "".join(read_stream(response)).split("\n") if line
+    ]
+
+    assert [batch["changes"] for batch in batches[:3]] == [
+        [{"number": 0}, {"number": 1}],
+        [{"number": 2}],
+        [],
+    ]
+    assert all(batch["changes"] == [] for batch in batches[2:])
+    Cursor.deserialize(batches[-1]["cursor"])
+
+
+@pytest.mark.django_db(transaction=True)
+def test_changes_view_sse() -> None:
+    MyModel.objects.create(number=1)
+    view = ChangesView.as_view(
+        queryset=MyModel.objects.values("number"),
+        stream_timeout=0.05,
+        keepalive_interval=1,
+        poll_interval=0.01,
+    )
+
+    events = read_stream(get(view, headers={"Accept": "text/event-stream"}))
+    event_id, event, data = events[0].strip().split("\n")
+    assert event == "event: changes"
+    assert json.loads(data.removeprefix("data: "))["changes"] == [{"number": 1}]
+
+    # EventSource reconnects with the id of the last event
+    MyModel.objects.create(number=2)
+    events = read_stream(
+        get(
+            view, stream="sse", headers={"Last-Event-ID": event_id.removeprefix("id: ")}
+        )
+    )
+    _, _, data = events[0].strip().split("\n")
+    assert json.loads(data.removeprefix("data: "))["changes"] == [{"number": 2}]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_changes_view_bad_request() -> None:
+    view = ChangesView.as_view(queryset=MyModel.objects.values("number"))
+
+    assert get(view, cursor="nope").status_code == 400
+    legacy = urlsafe_b64encode(b'{"xid_next": "abc", "xip_list": []}').decode()
+    assert get(view, cursor=legacy).status_code == 400
+    assert get(view, limit="ten").status_code == 400
+    assert get(view, limit=0).status_code == 400
+    assert get(view, stream="xml").status_code == 400
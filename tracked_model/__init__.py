@@ -1,9 +1,42 @@
 from django.db.models import options
 
+from .batching import AdaptiveLimit
 from .cursor import Cursor
-from .utils import get_changed_objects, tracked
+from .tombstones import DeletedObject
+from .utils import (
+    get_changed_objects,
+    get_changed_objects_for_cursors,
+    get_many_changed_objects,
+    iter_changed_objects,
+    may_have_changes,
+    tracked,
+)
 
-__all__ = ["get_changed_objects", "tracked", "Cursor"]
+__all__ = [
+    "AdaptiveLimit",
+    "DeletedObject",
+    "get_changed_objects",
+    "get_changed_objects_for_cursors",
+    "get_many_changed_objects",
+    "iter_changed_objects",
+    "may_have_changes",
+    "tracked",
+    "Cursor",
+]
 
-if "track_version" not in options.DEFAULT_NAMES:
-    options.DEFAULT_NAMES = tuple(options.DEFAULT_NAMES) + ("track_version",)
+TRACK_VERSION_OPTIONS = (
+    "track_version",
+    "track_version_notify",
+    "track_version_watched_fields",
+    "track_version_only_if_changed",
+    "track_version_deferred",
+    "track_version_deletes",
+)
+
+if not set(TRACK_VERSION_OPTIONS) <= set(options.DEFAULT_NAMES):
+    options.DEFAULT_NAMES = (
+        tuple(
+            name for name in options.DEFAULT_NAMES if name not in TRACK_VERSION_OPTIONS
+        )
+        + TRACK_VERSION_OPTIONS
+    )
@@ -0,0 +1,244 @@
+"""
+Async versions of get_changed_objects and iter_changed_objects.
+
+Django's async ORM still runs every query in a worker thread, so these build
+the queries with the ORM and then execute them on a psycopg 3 async
+connection, which means no thread is tied up while waiting for Postgres.
+"""
+
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Generic, Sequence, TypeVar, cast
+
+import psycopg
+import psycopg.sql
+from django.core.exceptions import EmptyResultSet
+from django.db import DEFAULT_DB_ALIAS, connections, models
+
+from .cursor import Cursor, Snapshot
+from .query import SNAPSHOT_SQL, SnapshotQuery
+from .utils import _ChangePosition, _pop_change_info, _snapshot_queryset
+
+if TYPE_CHECKING:
+    from django.db.models.query import _QuerySet
+
+T = TypeVar("T")
+M = TypeVar("M", bound=models.Model)
+
+AsyncConnection = psycopg.AsyncConnection[Any]
+
+
+async def aconnect(using: str = DEFAULT_DB_ALIAS) -> AsyncConnection:
+    """
+    Open an async connection with the settings of one of Django's databases
+    """
+
+    return await psycopg.AsyncConnection.connect(**_connection_params(using))
+
+
+def _connection_params(using: str) -> dict[str, Any]:
+    params = connections[using].get_connection_params()
+    # Django's cursor classes are for sync connections only
+    params.pop("cursor_factory", None)
+    return params
+
+
+@asynccontextmanager
+async def _repeatable_read(
+    connection: AsyncConnection | None, using: str
+) -> AsyncIterator[AsyncConnection]:
+    """
+    Run a durable, repeatable read transaction on the connection. If no
+    connection is given a new one is opened, and closed again afterwards.
+    """
+
+    conn = connection or await aconnect(using)
+    try:
+        if conn.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+            raise RuntimeError("Changes can not be fetched within a transaction.")
+
+        async with conn.transaction():
+            await conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            yield conn
+    finally:
+        if connection is None:
+            await conn.close()
+
+
+async def _aget_snapshot(conn: AsyncConnection) -> Snapshot:
+    cursor = await conn.execute(SNAPSHOT_SQL)
+    row = await cursor.fetchone()
+    assert row is not None
+    xip_list, xmin, xmax = row
+    return Snapshot(xip_list=xip_list, xmin=xmin, xmax=xmax)
+
+
+@asynccontextmanager
+async def alisten(
+    channel: str, using: str = DEFAULT_DB_ALIAS
+) -> AsyncIterator[AsyncConnection]:
+    """
+    Open a connection listening on a channel, see notify.get_channel, and
+    close it again afterwards. Wait on it with await_notify.
+    """
+
+    # Notifications are only delivered outside of transactions
+    conn = await psycopg.AsyncConnection.connect(
+        **_connection_params(using), autocommit=True
+    )
+    try:
+        await conn.execute(
+            psycopg.sql.SQL("LISTEN {}").format(psycopg.sql.Identifier(channel))
+        )
+        yield conn
+    finally:
+        await conn.close()
+
+
+async def await_notify(conn: AsyncConnection, timeout: float) -> bool:
+    """
+    Wait up to timeout seconds for a notification on a connection from
+    alisten, and return whether we got one. Any notifications already
+    received are consumed, so they won't wake us up again.
+    """
+
+    notified = False
+    async for _ in conn.notifies(timeout=timeout, stop_after=1):
+        notified = True
+    # stop_after only takes what arrived with the first one
+    async for _ in conn.notifies(timeout=0):
+        pass
+    return notified
+
+
+class AsyncChangedObjectsIterator(Generic[T]):
+    """
+    Iterate over changed objects over an async connection. If chunk_size is
+    set the objects are read in chunks from a server-side cursor. The next
+    cursor is available once all the objects have been consumed.
+    """
+
+    def __init__(
+        self,
+        *,
+        cursor: Cursor | None,
+        limit: int,
+        queryset: "_QuerySet[Any, T]",
+        chunk_size: int | None,
+        connection: AsyncConnection | None,
+        partition: tuple[int, int] | None = None,
+    ) -> None:
+        self.cursor = cursor or Cursor(xid_next=1, xip_list=[])
+        self.limit = limit
+        self.queryset = queryset
+        self.chunk_size = chunk_size
+        self.connection = connection
+        self.partition = partition
+        self._next_cursor: Cursor | None = None
+
+    @property
+    def next_cursor(self) -> Cursor:
+        if self._next_cursor is None:
+            raise RuntimeError("The changes must be consumed before the next cursor")
+        return self._next_cursor
+
+    async def _fetch_rows(
+        self, conn: AsyncConnection, sql: str, params: Sequence[Any]
+    ) -> AsyncIterator[list[Any]]:
+        if self.chunk_size is None:
+            async with conn.cursor() as cursor:
+                await cursor.execute(sql, params)
+                yield await cursor.fetchall()
+            return
+
+        async with conn.cursor(name="tracked_model_changes") as cursor:
+            await cursor.execute(sql, params)
+            while rows := await cursor.fetchmany(self.chunk_size):
+                yield rows
+
+    async def __aiter__(self) -> AsyncIterator[T]:
+        if self._next_cursor is not None:
+            raise RuntimeError("The changes can only be consumed once")
+
+        qs = _snapshot_queryset(
+            self.queryset,
+            cursor=self.cursor,
+            limit=self.limit,
+            partition=self.partition,
+        )
+        compiler = qs.query.get_compiler(using=qs.db)
+        position = _ChangePosition(self.cursor)
+        snapshot = None
+
+        async with _repeatable_read(self.connection, qs.db) as conn:
+            try:
+                sql, params = compiler.as_sql()
+            except EmptyResultSet:
+                snapshot = await _aget_snapshot(conn)
+            else:
+                async for rows in self._fetch_rows(conn, sql, params):
+                    # Let the queryset turn the rows into objects
+                    chunk = qs.all()
+                    query = cast(SnapshotQuery, chunk.query)
+                    query.rows = rows
+                    for obj in chunk:
+                        obj, last_modified_txid, last_object_id = _pop_change_info(obj)
+                        position.add(last_modified_txid, last_object_id)
+                        yield obj
+                    snapshot = snapshot or query.snapshot
+
+        assert snapshot is not None
+        self._next_cursor = position.next_cursor(snapshot=snapshot, limit=self.limit)
+
+
+async def aget_changed_objects(
+    *,
+    cursor: Cursor | None,
+    limit: int = 100,
+    queryset: "_QuerySet[M, T]",
+    connection: AsyncConnection | None = None,
+    partition: tuple[int, int] | None = None,
+) -> tuple[list[T], Cursor]:
+    """
+    Async version of get_changed_objects. If no connection is given, a new
+    one is opened for the call. Pass in a connection, e.g. from a pool, to
+    avoid that.
+    """
+
+    changes = AsyncChangedObjectsIterator(
+        cursor=cursor,
+        limit=limit,
+        queryset=queryset,
+        chunk_size=None,
+        connection=connection,
+        partition=partition,
+    )
+    objects = [obj async for obj in changes]
+    return objects, changes.next_cursor
+
+
+def aiter_changed_objects(
+    *,
+    cursor: Cursor | None,
+    limit: int = 100,
+    queryset: "_QuerySet[M, T]",
+    chunk_size: int = 2000,
+    connection: AsyncConnection | None = None,
+    partition: tuple[int, int] | None = None,
+) -> AsyncChangedObjectsIterator[T]:
+    """
+    Async version of iter_changed_objects:
+
+        changes = aiter_changed_objects(cursor=cursor, limit=50_000, queryset=qs)
+        async for obj in changes:
+            ...
+        cursor = changes.next_cursor
+    """
+
+    return AsyncChangedObjectsIterator(
+        cursor=cursor,
+        limit=limit,
+        queryset=queryset,
+        chunk_size=chunk_size,
+        connection=connection,
+        partition=partition,
+    )
@@ -0,0 +1,338 @@
+"""
+Backfill a version table in small transactions, for tables too large to
+backfill in one statement. The table can be split into slices of primary
+keys that are backfilled in parallel. Progress is stored after each chunk,
+so an interrupted backfill picks up where it stopped.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable
+
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .bootstrap import _split_range
+from .models import BackfillProgress
+from .operations.tiggers import _copied_columns
+
+BACKFILL_CHUNK_SQL = """\
+WITH _chunk AS (
+    SELECT {pk_column} AS object_id{copy_columns} FROM {tracked_table}
+    WHERE {pk_column} > %s AND {pk_column} <= %s
+    ORDER BY {pk_column}
+    LIMIT %s
+), _inserted AS (
+    INSERT INTO {version_table} (object_id{copy_columns})
+    SELECT object_id{copy_columns} FROM _chunk
+    ON CONFLICT (object_id) DO NOTHING
+    RETURNING 1
+)
+SELECT
+    (SELECT max(object_id) FROM _chunk),
+    (SELECT count(*) FROM _chunk),
+    (SELECT count(*) FROM _inserted)
+"""
+
+MISSING_VERSIONS_SQL = """\
+SELECT count(*) FROM {tracked_table}
+WHERE NOT EXISTS (
+    SELECT 1 FROM {version_table} WHERE object_id = {tracked_table}.{pk_column}
+)
+"""
+
+ESTIMATED_ROWS_SQL = "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass"
+
+REPLICATION_LAG_SQL = """\
+SELECT coalesce(max(extract(epoch FROM replay_lag)), 0) FROM pg_stat_replication
+"""
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+# Below and above any primary key, for the bounds of the first and last slice
+MIN_OBJECT_ID = -(2**63)
+MAX_OBJECT_ID = 2**63 - 1
+
+
+@dataclass(slots=True, kw_only=True)
+class BackfillStatus:
+    """
+    How a backfill is getting on, as passed to the progress callback of
+    backfill_versions
+    """
+
+    # Version rows inserted, including by earlier runs
+    rows: int
+    # Objects walked through by this run
+    scanned: int
+    # The number of objects in the tracked table, as estimated by Postgres
+    estimated_total: int
+    slices: int
+    completed_slices: int
+    # Objects without version info after the backfill, if verified
+    missing: int | None = None
+
+
+def _replication_lag(using: str) -> float:
+    """
+    The replay lag of the slowest standby in seconds, as seen by the primary
+    """
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(REPLICATION_LAG_SQL)
+        (lag,) = cursor.fetchone()
+    return float(lag)
+
+
+class _Backfill:
+    """
+    The state shared by the workers of a backfill
+    """
+
+    def __init__(
+        self,
+        *,
+        sql: str,
+        using: str,
+        chunk_size: int,
+        max_rows_per_second: float | None,
+        max_replication_lag: float | None,
+        status: BackfillStatus,
+        progress: Callable[[BackfillStatus], None] | None,
+    ) -> None:
+        self.sql = sql
+        self.using = using
+        self.chunk_size = chunk_size
+        self.max_rows_per_second = max_rows_per_second
+        self.max_replication_lag = max_replication_lag
+        self.status = status
+        self.progress = progress
+
+        self.start = time.monotonic()
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+
+    def _chunk(self, backfill_slice: BackfillProgress) -> None:
+        after = backfill_slice.last_object_id
+        end = backfill_slice.slice_end
+        with transaction.atomic(using=self.using):
+            with connections[self.using].cursor() as cursor:
+                cursor.execute(
+                    self.sql,
+                    [
+                        backfill_slice.slice_start if after is None else after,
+                        MAX_OBJECT_ID if end is None else end,
+                        self.chunk_size,
+                    ],
+                )
+                last_object_id, scanned, inserted = cursor.fetchone()
+
+            if last_object_id is None:
+                backfill_slice.completed_at = timezone.now()
+            else:
+                backfill_slice.last_object_id = last_object_id
+                backfill_slice.rows += inserted
+            backfill_slice.save(using=self.using)
+
+        with self.lock:
+            self.status.rows += inserted
+            self.status.scanned += scanned
+            if last_object_id is None:
+                self.status.completed_slices += 1
+            if self.progress is not None:
+                self.progress(self.status)
+
+    def _throttle(self) -> None:
+        if self.max_rows_per_second is not None:
+            with self.lock:
+                scanned = self.status.scanned
+            ahead = scanned / self.max_rows_per_second - (time.monotonic() - self.start)
+            if ahead > 0:
+                time.sleep(ahead)
+        if self.max_replication_lag is not None:
+            while _replication_lag(self.using) > self.max_replication_lag:
+                time.sleep(1)
+
+    def run(self, slices: "queue.SimpleQueue[BackfillProgress]") -> None:
+        """
+        Backfill slices from the queue until it's empty
+        """
+
+        while not self.stop.is_set():
+            try:
+                backfill_slice = slices.get_nowait()
+            except queue.Empty:
+                return
+            while backfill_slice.completed_at is None and not self.stop.is_set():
+                self._chunk(backfill_slice)
+                if backfill_slice.completed_at is None:
+                    self._throttle()
+
+
+def _get_slices(
+    tracked_model: type[models.Model],
+    *,
+    version_table: str,
+    using: str,
+    workers: int,
+    restart: bool,
+) -> list[BackfillProgress]:
+    """
+    Get the slices of an earlier run, or split the primary keys into a
+    slice per worker
+    """
+
+    existing = BackfillProgress.objects.using(using).filter(version_table=version_table)
+    if restart:
+        existing.delete()
+    elif slices := list(existing.order_by("slice_start")):
+        return slices
+
+    bounds = tracked_model._default_manager.using(using).aggregate(
+        low=Min("pk"), high=Max("pk")
+    )
+    ranges: list[tuple[int, int | None]] = [(MIN_OBJECT_ID, None)]
+    if bounds["low"] is not None:
+        ranges = [
+            (low - 1, high)
+            for low, high in _split_range(bounds["low"], bounds["high"], workers)
+        ]
+        # Objects created since are covered by the last slice
+        ranges[0] = (MIN_OBJECT_ID, ranges[0][1])
+        ranges[-1] = (ranges[-1][0], None)
+
+    return [
+        BackfillProgress.objects.using(using).create(
+            version_table=version_table, slice_start=start, slice_end=end
+        )
+        for start, end in ranges
+    ]
+
+
+def backfill_versions(
+    tracked_model: type[models.Model],
+    *,
+    using: str = DEFAULT_DB_ALIAS,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = 1,
+    max_rows_per_second: float | None = None,
+    max_replication_lag: float | None = None,
+    restart: bool = False,
+    verify: bool = False,
+    progress: Callable[[BackfillStatus], None] | None = None,
+) -> BackfillStatus:
+    """
+    Add version info for the existing objects of a tracked model, walking
+    the primary key in chunks of chunk_size objects. Each chunk is committed
+    along with the progress, so a backfill that is interrupted continues
+    from the last chunk when run again. Use restart to start over.
+
+    With several workers the primary keys are split into a slice per worker
+    on the first run, and the slices are backfilled in parallel over
+    separate connections. A resumed backfill keeps the slices it started
+    with. The progress callback is called after each chunk, from the
+    worker's thread.
+
+    Between chunks, the backfill waits to stay below max_rows_per_second
+    over all workers, and while the replication lag of any standby is above
+    max_replication_lag seconds.
+
+    With verify, the objects still without version info are counted at the
+    end, which reads the whole table.
+
+    The tracking triggers must already be in place, so objects created
+    while the backfill runs are tracked by them. The model may be a
+    historical model from a migration. This must not run in a transaction.
+    """
+
+    connection = connections[using]
+    if connection.in_atomic_block:
+        raise RuntimeError("A chunked backfill can't run inside a transaction")
+    if chunk_size < 1:
+        raise ValueError("The chunk size must be at least 1")
+    if workers < 1:
+        raise ValueError("The number of workers must be at least 1")
+
+    version_model = tracked_model._meta.get_field("version_info").related_model
+    assert isinstance(version_model, type)
+    version_table = version_model._meta.db_table
+    context = {
+        "tracked_table": tracked_model._meta.db_table,
+        "version_table": version_table,
+        "pk_column": tracked_model._meta.pk.column,
+    }
+
+    slices = _get_slices(
+        tracked_model,
+        version_table=version_table,
+        using=using,
+        workers=workers,
+        restart=restart,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(ESTIMATED_ROWS_SQL, [context["tracked_table"]])
+        (estimated_total,) = cursor.fetchone()
+
+    backfill = _Backfill(
+        sql=BACKFILL_CHUNK_SQL.format(
+            **context,
+            copy_columns="".join(
+                f", {column}" for column in _copied_columns(version_model)
+            ),
+        ),
+        using=using,
+        chunk_size=chunk_size,
+        max_rows_per_second=max_rows_per_second,
+        max_replication_lag=max_replication_lag,
+        status=BackfillStatus(
+            rows=sum(backfill_slice.rows for backfill_slice in slices),
+            scanned=0,
+            # Postgres says -1 before the table has been analyzed
+            estimated_total=max(estimated_total, 0),
+            slices=len(slices),
+            completed_slices=sum(
+                backfill_slice.completed_at is not None for backfill_slice in slices
+            ),
+        ),
+        progress=progress,
+    )
+
+    pending: queue.SimpleQueue[BackfillProgress] = queue.SimpleQueue()
+    for backfill_slice in slices:
+        if backfill_slice.completed_at is None:
+            pending.put(backfill_slice)
+
+    if workers == 1:
+        backfill.run(pending)
+    else:
+
+        def run() -> None:
+            try:
+                backfill.run(pending)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="tracked-model-backfill"
+        ) as executor:
+            futures = [executor.submit(run) for _ in range(workers)]
+            try:
+                # Any worker failing stops the others, not just the first
+                done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+                for future in done:
+                    future.result()
+            except BaseException:
+                # Have the other workers stop after their current chunk
+                backfill.stop.set()
+                raise
+
+    if verify:
+        with connection.cursor() as cursor:
+            cursor.execute(MISSING_VERSIONS_SQL.format(**context))
+            (backfill.status.missing,) = cursor.fetchone()
+
+    return backfill.status
@@ -0,0 +1,93 @@
+import pickle
+from typing import Any, Callable, Sequence
+
+# How many objects to measure when estimating the size of a batch
+SIZE_SAMPLE = 20
+
+
+def _pickled_size(obj: Any) -> int:
+    return len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class AdaptiveLimit:
+    """
+    A batch size that adapts to how long batches take to fetch, and
+    optionally how large they are. Pass it as the limit to
+    get_changed_objects, and keep it around between calls:
+
+        limit = AdaptiveLimit(target_seconds=0.2)
+        while True:
+            changes, cursor = get_changed_objects(
+                cursor=cursor, limit=limit, queryset=qs
+            )
+
+    The limit is doubled, up to max_limit, while batches come back full and
+    within budget, so catching up doesn't waste round trips. When a batch
+    takes longer than target_seconds, or is larger than max_bytes, the limit
+    is scaled down to what would have fit, down to min_limit.
+
+    The time and size per row are smoothed over batches, so a single slow
+    query doesn't collapse the limit.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial: int = 100,
+        min_limit: int = 10,
+        max_limit: int = 10_000,
+        target_seconds: float = 0.5,
+        max_bytes: int | None = None,
+        sizeof: Callable[[Any], int] = _pickled_size,
+        smoothing: float = 0.5,
+    ) -> None:
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("Need 1 <= min_limit <= max_limit")
+        if not 0 < smoothing <= 1:
+            raise ValueError("Smoothing must be in (0, 1]")
+
+        self.limit = max(min_limit, min(initial, max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_seconds = target_seconds
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.smoothing = smoothing
+
+        self.seconds_per_row: float | None = None
+        self.bytes_per_row: float | None = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(limit={self.limit})"
+
+    def _smooth(self, previous: float | None, value: float) -> float:
+        if previous is None:
+            return value
+        return previous + self.smoothing * (value - previous)
+
+    def observe(self, objects: Sequence[Any], *, limit: int, seconds: float) -> None:
+        """
+        Update the limit after fetching objects with the given limit, which
+        took the given number of seconds.
+        """
+
+        count = len(objects)
+        if not count:
+            return
+
+        self.seconds_per_row = self._smooth(self.seconds_per_row, seconds / count)
+        next_limit = limit * 2 if count >= limit else limit
+
+        if self.seconds_per_row > 0:
+            next_limit = min(
+                next_limit, int(self.target_seconds / self.seconds_per_row)
+            )
+
+        if self.max_bytes is not None:
+            sample = objects[:SIZE_SAMPLE]
+            size = sum(self.sizeof(obj) for obj in sample) / len(sample)
+            self.bytes_per_row = self._smooth(self.bytes_per_row, size)
+            if self.bytes_per_row > 0:
+                next_limit = min(next_limit, int(self.max_bytes / self.bytes_per_row))
+
+        self.limit = max(self.min_limit, min(next_limit, self.max_limit))
@@ -0,0 +1,153 @@
+"""
+Start a new consumer from a copy of the current state of a table, rather
+than by replaying every change in the version table. The table is read by
+several workers in parallel, all from the same exported snapshot, and the
+cursor to continue from is built from that snapshot.
+"""
+
+import queue
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Callable, TypeVar
+
+from django.db import connections, models, transaction
+from django.db.models import Max, Min
+
+from .cursor import Cursor
+from .utils import _get_repeatable_read_snapshot
+
+if TYPE_CHECKING:
+    from django.db.models.query import _QuerySet
+
+T = TypeVar("T")
+M = TypeVar("M", bound=models.Model)
+
+# How many ranges of primary keys each worker gets on average. Smaller
+# ranges even out the work when the keys aren't evenly spread.
+RANGES_PER_WORKER = 4
+
+
+def _split_range(low: int, high: int, parts: int) -> list[tuple[int, int]]:
+    """
+    Split the inclusive range low..high into at most parts ranges
+    """
+
+    size = max(1, -(-(high - low + 1) // parts))
+    return [
+        (start, min(start + size - 1, high)) for start in range(low, high + 1, size)
+    ]
+
+
+def _dump_ranges(
+    queryset: "_QuerySet[M, T]",
+    *,
+    snapshot_id: str,
+    ranges: "queue.SimpleQueue[tuple[int, int]]",
+    chunk_size: int,
+    handle: Callable[[list[T]], None],
+) -> None:
+    """
+    Read ranges of primary keys from the queue until it's empty, each in a
+    transaction importing the snapshot
+    """
+
+    try:
+        while True:
+            try:
+                low, high = ranges.get_nowait()
+            except queue.Empty:
+                return
+
+            with transaction.atomic(using=queryset.db, durable=True):
+                connection = connections[queryset.db]
+                # Utility statements can't take parameters, so this one is
+                # bound on the client
+                set_snapshot = connection.ops.compose_sql(  # type: ignore[attr-defined]
+                    "SET TRANSACTION SNAPSHOT %s", [snapshot_id]
+                )
+                with connection.cursor() as cursor:
+                    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                    cursor.execute(set_snapshot)
+
+                qs = queryset.filter(pk__gte=low, pk__lte=high).order_by("pk")
+                chunk = []
+                for obj in qs.iterator(chunk_size=chunk_size):
+                    chunk.append(obj)
+                    if len(chunk) >= chunk_size:
+                        handle(chunk)
+                        chunk = []
+                if chunk:
+                    handle(chunk)
+    finally:
+        connections.close_all()
+
+
+def bootstrap_changed_objects(
+    *,
+    queryset: "_QuerySet[M, T]",
+    handle: Callable[[list[T]], None],
+    workers: int = 4,
+    chunk_size: int = 10_000,
+) -> Cursor:
+    """
+    Hand every object in the queryset to handle, in chunks of chunk_size,
+    and return the cursor to stream the changes made since from:
+
+        def handle(objects):
+            index(objects)
+
+        cursor = bootstrap_changed_objects(queryset=qs, handle=handle)
+        changes, cursor = get_changed_objects(cursor=cursor, queryset=qs)
+
+    The objects are read by worker threads, each reading ranges of primary
+    keys, so handle must be thread safe. The workers read from a snapshot
+    exported from the transaction the cursor is built from, so every change
+    not in the copy comes after the cursor. The primary key must be an
+    integer.
+    """
+
+    if workers < 1:
+        raise ValueError("The number of workers must be at least 1")
+
+    with transaction.atomic(using=queryset.db, durable=True):
+        snapshot = _get_repeatable_read_snapshot(queryset.db)
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute("SELECT pg_export_snapshot()")
+            (snapshot_id,) = cursor.fetchone()
+
+        bounds = queryset.aggregate(low=Min("pk"), high=Max("pk"))
+        ranges: queue.SimpleQueue[tuple[int, int]] = queue.SimpleQueue()
+        if bounds["low"] is not None:
+            for pk_range in _split_range(
+                bounds["low"], bounds["high"], workers * RANGES_PER_WORKER
+            ):
+                ranges.put(pk_range)
+
+        # The snapshot can only be imported while this transaction is open
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="tracked-model-bootstrap"
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _dump_ranges,
+                    queryset,
+                    snapshot_id=snapshot_id,
+                    ranges=ranges,
+                    chunk_size=chunk_size,
+                    handle=handle,
+                )
+                for _ in range(min(workers, ranges.qsize()))
+            ]
+            try:
+                # Any worker failing stops the others, not just the first
+                done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+                for future in done:
+                    future.result()
+            except BaseException:
+                # Have the other workers stop after their current range
+                while not ranges.empty():
+                    ranges.get_nowait()
+                raise
+
+    return Cursor(xid_next=1, xip_list=[]).next_cursor(
+        snapshot=snapshot, last_modified_txid=None, last_object_id=None, has_more=False
+    )
@@ -0,0 +1,147 @@
+"""
+Fetch changes as columns of plain values rather than objects, for exports
+that don't need the ORM to build a model instance or dict for every row.
+"""
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, transaction
+from django.db.models.sql.compiler import SQLCompiler
+
+from .cursor import Cursor
+from .utils import (
+    _ChangePosition,
+    _compiled_changes_queryset,
+    _get_repeatable_read_snapshot,
+)
+
+if TYPE_CHECKING:
+    import pyarrow
+    from django.db.models.query import _QuerySet
+
+
+@dataclass(slots=True, kw_only=True)
+class ChangedColumns:
+    """
+    A batch of changes as a list of values per column, keyed by the names
+    values() would use. The id and last modified txid of each change are
+    kept apart from the queryset's columns, in the same order.
+    """
+
+    columns: dict[str, list[Any]] = field(default_factory=dict)
+    object_ids: list[int] = field(default_factory=list)
+    last_modified_txids: list[int] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.object_ids)
+
+    def to_arrow(self) -> "pyarrow.Table":
+        """
+        The columns as a pyarrow Table, which needs pyarrow installed. From
+        there they convert cheaply to NumPy arrays or a pandas DataFrame.
+        """
+
+        try:
+            import pyarrow
+        except ImportError as e:
+            raise ImportError("ChangedColumns.to_arrow needs pyarrow") from e
+
+        return pyarrow.table(self.columns)
+
+
+def _column_names(queryset: "_QuerySet[Any, Any]", compiler: SQLCompiler) -> list[str]:
+    """
+    The names of the columns selected by a compiled queryset, in order
+    """
+
+    query = compiler.query
+    if query.select_related:
+        raise ValueError("Changed columns can't be fetched with select_related")
+
+    if queryset._fields is not None:  # type: ignore[attr-defined]
+        fields = list(query.values_select)
+    else:
+        assert compiler.klass_info is not None
+        fields = [
+            compiler.select[i][0].target.attname
+            for i in compiler.klass_info["select_fields"]
+        ]
+    return [*query.extra_select, *fields, *query.annotation_select]
+
+
+def _fetch_columns(
+    queryset: "_QuerySet[Any, Any]",
+    *,
+    cursor: Cursor,
+    limit: int,
+    partition: tuple[int, int] | None,
+) -> ChangedColumns:
+    qs = _compiled_changes_queryset(
+        queryset, cursor=cursor, limit=limit, partition=partition
+    )
+    connection = connections[qs.db]
+    compiler = qs.query.get_compiler(qs.db)
+    try:
+        sql, params = compiler.as_sql()
+    except EmptyResultSet:
+        return ChangedColumns()
+
+    with connection.cursor() as conn:
+        conn.execute(sql, params)
+        rows = conn.fetchall()
+
+    names = _column_names(queryset, compiler)
+    columns = [list(column) for column in zip(*rows)] or [[] for _ in names]
+
+    # Converters are usually only needed for a few columns, e.g. JSON fields,
+    # so they're applied a column at a time
+    converters = compiler.get_converters([col for col, _, _ in compiler.select])
+    for i, (functions, expression) in converters.items():
+        for function in functions:
+            columns[i] = [
+                function(value, expression, connection) for value in columns[i]
+            ]
+
+    changes = dict(zip(names, columns))
+    return ChangedColumns(
+        object_ids=changes.pop("_object_id"),
+        last_modified_txids=changes.pop("_last_modified_txid"),
+        columns=changes,
+    )
+
+
+def get_changed_columns(
+    *,
+    cursor: Cursor | None,
+    limit: int = 100,
+    queryset: "_QuerySet[Any, Any]",
+    partition: tuple[int, int] | None = None,
+) -> tuple[ChangedColumns, Cursor]:
+    """
+    Get the changes after the cursor like get_changed_objects, but as
+    columns. The rows are read straight from the database cursor, so no
+    model instance, dict or tuple is built for each row. Values are
+    converted like the ORM would, e.g. for JSON fields.
+
+    The queryset decides which columns are included, e.g. with values() or
+    only(), and must not use select_related.
+    """
+
+    if cursor is None:
+        cursor = Cursor(xid_next=1, xip_list=[])
+
+    with transaction.atomic(using=queryset.db, durable=True):
+        snapshot = _get_repeatable_read_snapshot(queryset.db)
+        changes = _fetch_columns(
+            queryset, cursor=cursor, limit=limit, partition=partition
+        )
+
+    position = _ChangePosition(cursor)
+    for last_modified_txid, last_object_id in zip(
+        changes.last_modified_txids, changes.object_ids
+    ):
+        position.add(last_modified_txid, last_object_id)
+
+    return changes, position.next_cursor(snapshot=snapshot, limit=limit)
@@ -0,0 +1,192 @@
+"""
+Fetch the next batch of changes in a background thread while the current
+batch is being processed, so the database and the sink can work at the same
+time.
+"""
+
+import queue
+import threading
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, Generic, Iterator, NamedTuple, TypeVar
+
+from django.db import connections, models
+
+from .batching import AdaptiveLimit
+from .cursor import Cursor
+from .utils import get_changed_objects
+
+if TYPE_CHECKING:
+    from django.db.models.query import _QuerySet
+
+T = TypeVar("T")
+M = TypeVar("M", bound=models.Model)
+
+
+class Batch(NamedTuple, Generic[T]):
+    """
+    A batch of changed objects, and the cursor to continue from once the
+    objects have been processed.
+    """
+
+    objects: list[T]
+    cursor: Cursor
+
+
+class _Done:
+    pass
+
+
+class ChangePrefetcher(Generic[T]):
+    """
+    Iterate over batches of changes, while the next batches are fetched in a
+    background thread. At most depth batches are fetched ahead, after which
+    the thread waits for the batches to be consumed.
+
+    A batch's cursor must only be stored once the batch's objects have been
+    processed. The batches are yielded in order, so storing the cursor of the
+    last processed batch is always safe, while storing the cursor of a batch
+    that is still waiting in the queue would skip its changes on a restart.
+    """
+
+    def __init__(
+        self,
+        *,
+        cursor: Cursor | None,
+        limit: int | AdaptiveLimit,
+        queryset: "_QuerySet[Any, T]",
+        depth: int = 1,
+        poll_interval: float = 5.0,
+        stop_when_empty: bool = False,
+        partition: tuple[int, int] | None = None,
+    ) -> None:
+        if depth < 1:
+            raise ValueError("The queue depth must be at least 1")
+
+        self.cursor = cursor
+        self.limit = limit
+        self.queryset = queryset
+        self.poll_interval = poll_interval
+        self.stop_when_empty = stop_when_empty
+        self.partition = partition
+
+        self._queue: queue.Queue[Batch[T] | BaseException | _Done] = queue.Queue(
+            maxsize=depth
+        )
+        self._stop = threading.Event()
+        # Set once the end of the batches, or an error, has been consumed
+        self._finished = False
+        self._thread = threading.Thread(
+            target=self._run, name="tracked-model-prefetch", daemon=True
+        )
+
+    def _put(self, item: Batch[T] | BaseException | _Done) -> bool:
+        """
+        Wait for room in the queue, unless we're asked to stop
+        """
+
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            return True
+        return False
+
+    def _run(self) -> None:
+        cursor = self.cursor
+        try:
+            while not self._stop.is_set():
+                objects, cursor = get_changed_objects(
+                    cursor=cursor,
+                    limit=self.limit,
+                    queryset=self.queryset,
+                    partition=self.partition,
+                )
+                if objects:
+                    if not self._put(Batch(objects, cursor)):
+                        return
+                elif self.stop_when_empty:
+                    self._put(_Done())
+                    return
+                else:
+                    self._stop.wait(self.poll_interval)
+        except Exception as e:
+            self._put(e)
+        finally:
+            connections.close_all()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def close(self) -> None:
+        """
+        Stop fetching batches. Batches that have been fetched but not yet
+        consumed are discarded.
+        """
+
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def __enter__(self) -> "ChangePrefetcher[T]":
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def __iter__(self) -> Iterator[Batch[T]]:
+        # Otherwise nothing would ever fill the queue
+        if self._thread.ident is None or self._stop.is_set():
+            raise RuntimeError("The prefetcher isn't running, start it first")
+        if self._finished:
+            raise RuntimeError("The prefetcher has already finished")
+
+        while True:
+            item = self._queue.get()
+            if isinstance(item, (_Done, BaseException)):
+                self._finished = True
+            if isinstance(item, _Done):
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+
+def prefetch_changed_objects(
+    *,
+    cursor: Cursor | None,
+    limit: int | AdaptiveLimit = 100,
+    queryset: "_QuerySet[M, T]",
+    depth: int = 1,
+    poll_interval: float = 5.0,
+    stop_when_empty: bool = False,
+    partition: tuple[int, int] | None = None,
+) -> ChangePrefetcher[T]:
+    """
+    Consume changes in batches, fetching up to depth batches ahead in a
+    background thread. When there are no changes the thread waits
+    poll_interval seconds before trying again, or stops if stop_when_empty
+    is set:
+
+        with prefetch_changed_objects(cursor=cursor, queryset=qs) as batches:
+            for objects, cursor in batches:
+                send(objects)
+                # Only now is it safe to store the cursor
+                save_cursor(cursor)
+    """
+
+    return ChangePrefetcher(
+        cursor=cursor,
+        limit=limit,
+        queryset=queryset,
+        depth=depth,
+        poll_interval=poll_interval,
+        stop_when_empty=stop_when_empty,
+        partition=partition,
+    )
@@ -1,53 +1,263 @@
 import json
+import zlib
 from base64 import urlsafe_b64decode, urlsafe_b64encode
-from typing import Any, Callable, Self
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Self
 
-import pydantic
+if TYPE_CHECKING:
+    from pydantic import GetCoreSchemaHandler
+    from pydantic_core import CoreSchema
 
+# Cursors are serialized as a version byte followed by varints, with the
+# xip_list sorted and delta encoded. If the high bit of the version byte is
+# set the rest is zlib compressed. Older cursors are JSON, which always
+# starts with "{", so the two can't be confused.
+CURSOR_VERSION = 1
+COMPRESSED = 0x80
+# Don't bother compressing cursors smaller than this
+COMPRESS_MIN_SIZE = 64
+# Cursors come from clients, so don't inflate them past this, which leaves
+# room for thousands of transactions in progress
+MAX_CURSOR_SIZE = 1 << 16
+# Transaction IDs are bigints, which take at most 10 bytes as a varint
+MAX_XID = 2**63 - 1
+MAX_VARINT_SIZE = 10
 
-class Cursor(pydantic.BaseModel):
+
+def _write_varint(out: bytearray, value: int) -> None:
+    if value < 0:
+        raise ValueError("Can not encode negative numbers")
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    value = shift = 0
+    end = pos + MAX_VARINT_SIZE
+    while True:
+        if pos >= len(data):
+            raise ValueError("Truncated cursor")
+        if pos >= end:
+            raise ValueError("Invalid cursor")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def pack_cursor(cursor: "Cursor") -> bytes:
+    """
+    Pack a cursor into the binary format
+    """
+
+    out = bytearray()
+    _write_varint(out, cursor.xid_next)
+    # None is stored as 0, everything else shifted up by one
+    for value in (cursor.xid_at, cursor.xid_at_id):
+        _write_varint(out, 0 if value is None else value + 1)
+
+    xip_list = cursor.xip_list
+    _write_varint(out, len(xip_list))
+    previous = 0
+    for xip in xip_list:
+        _write_varint(out, xip - previous)
+        previous = xip
+
+    if len(out) >= COMPRESS_MIN_SIZE:
+        compressed = zlib.compress(out)
+        if len(compressed) < len(out):
+            return bytes([CURSOR_VERSION | COMPRESSED]) + compressed
+    return bytes([CURSOR_VERSION]) + out
+
+
+def _is_xid(value: object) -> bool:
+    # bool is a subclass of int, but true isn't a transaction ID
+    return type(value) is int and 0 <= value <= MAX_XID
+
+
+def unpack_cursor(blob: bytes) -> "Cursor":
+    """
+    Unpack a cursor from either the binary or the JSON format
+    """
+
+    if blob[:1] == b"{":
+        try:
+            return Cursor(**json.loads(blob))
+        except TypeError as e:
+            raise ValueError("Invalid cursor") from e
+    if not blob or blob[0] & ~COMPRESSED != CURSOR_VERSION:
+        raise ValueError("Unknown cursor format")
+
+    data = blob[1:]
+    if blob[0] & COMPRESSED:
+        decompressor = zlib.decompressobj()
+        try:
+            data = decompressor.decompress(data, MAX_CURSOR_SIZE)
+        except zlib.error as e:
+            raise ValueError("Invalid cursor") from e
+        if decompressor.unconsumed_tail:
+            raise ValueError("Cursor too large")
+        if not decompressor.eof or decompressor.unused_data:
+            raise ValueError("Invalid cursor")
+
+    xid_next, pos = _read_varint(data, 0)
+    xid_at, pos = _read_varint(data, pos)
+    xid_at_id, pos = _read_varint(data, pos)
+    count, pos = _read_varint(data, pos)
+    xip_list = []
+    previous = 0
+    for _ in range(count):
+        delta, pos = _read_varint(data, pos)
+        previous += delta
+        xip_list.append(previous)
+    if pos != len(data):
+        raise ValueError("Trailing data in cursor")
+
+    return Cursor(
+        xid_next=xid_next,
+        xid_at=xid_at - 1 if xid_at else None,
+        xid_at_id=xid_at_id - 1 if xid_at_id else None,
+        xip_list=xip_list,
+    )
+
+
+def _sorted_union(a: list[int], b: list[int]) -> list[int]:
+    """
+    Merge two sorted lists of txids. They are usually the same, or one of
+    them is empty, so those are worth short-circuiting.
+    """
+
+    if a == b or not b:
+        return a
+    if not a:
+        return b
+    # Sorting two sorted runs is a linear merge, and dict keeps the order
+    return list(dict.fromkeys(sorted(a + b)))
+
+
+@dataclass(slots=True, kw_only=True)
+class Cursor:
     """
     A cursor object that the client is expected to store and provide in the
     next request to get the next batch of changes.
+
+    Use serialize() and deserialize() to store it as a short url-safe string.
+    Cursors can also be used as fields of pydantic models, where they're
+    serialized the same way in JSON.
     """
 
     # Which transaction are we at
     xid_at: int | None = None
     # Which item within that transaction are we at
     xid_at_id: int | None = None
-    # Transactions in progress
+    # Transactions in progress, sorted
     xip_list: list[int]
     # Next transaction ID
     xid_next: int
 
-    @pydantic.model_serializer(mode="wrap", when_used="json")
-    def base64_encode(
-        self,
-        handler: Callable[[Self, pydantic.SerializationInfo], Any],
-        info: pydantic.SerializationInfo,
-    ) -> Any:
+    def __post_init__(self) -> None:
+        # Cursors come from clients, and those in the JSON format aren't
+        # checked on the way in, so make sure they can't break the query
+        if not (
+            _is_xid(self.xid_next)
+            and (self.xid_at is None or _is_xid(self.xid_at))
+            and (self.xid_at_id is None or _is_xid(self.xid_at_id))
+            and isinstance(self.xip_list, list)
+            and all(_is_xid(xid) for xid in self.xip_list)
+        ):
+            raise ValueError("Invalid cursor")
+        self.xip_list = sorted(self.xip_list)
+
+    def serialize(self) -> str:
         """
-        Serialize to a base64 blob when encoding to JSON.
+        Serialize to a url-safe base64 blob
         """
 
-        data = handler(self, info)
-        return urlsafe_b64encode(json.dumps(data).encode()).decode("ascii")
+        blob = urlsafe_b64encode(pack_cursor(self)).decode("ascii")
+        # The padding is only noise in a query string
+        return blob.rstrip("=")
 
-    @pydantic.model_validator(mode="wrap")
-    def base64_decode(
-        cls,
-        value: Any,
-        handler: Callable[[Any], Self],
-        info: pydantic.ValidationInfo,
-    ) -> Self:
+    @classmethod
+    def deserialize(cls, value: str) -> "Cursor":
+        """
+        Decode a cursor from serialize(). Cursors in the older base64 encoded
+        JSON format are accepted too.
+        """
+
+        if not isinstance(value, str):
+            raise ValueError("Expected a base64 encoded cursor")
+        try:
+            blob = urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        except ValueError as e:
+            raise ValueError("Invalid cursor") from e
+        return unpack_cursor(blob)
+
+    def in_progress(self, txid: int) -> bool:
+        """
+        Was the transaction in progress when the cursor was issued
         """
-        Decode from base64 when validating from JSON.
+
+        i = bisect_left(self.xip_list, txid)
+        return i < len(self.xip_list) and self.xip_list[i] == txid
+
+    def may_have_changes(self, snapshot: "Snapshot") -> bool:
         """
+        Could there be changes after the cursor that are visible in the
+        snapshot. If not, fetching changes would come back empty.
+        """
+
+        # We stopped in the middle of a transaction's changes
+        if self.xid_at is not None:
+            return True
+
+        # A transaction at or past xid_next has finished
+        if snapshot.xmax > self.xid_next:
+            return True
 
-        if info.mode == "json":
-            value = urlsafe_b64decode(value)
-            value = json.loads(value)
-        return handler(value)
+        # A transaction that was in progress has finished
+        return not set(snapshot.xip_list).issuperset(self.xip_list)
+
+    def model_dump_json(self) -> str:
+        """
+        The cursor as a JSON string, as when it was a pydantic model
+        """
+
+        return json.dumps(self.serialize())
+
+    @classmethod
+    def model_validate_json(cls, value: str | bytes) -> "Cursor":
+        """
+        Decode a cursor from model_dump_json()
+        """
+
+        return cls.deserialize(json.loads(value))
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, source: type[Any], handler: "GetCoreSchemaHandler"
+    ) -> "CoreSchema":
+        from pydantic_core import core_schema
+
+        from_str = core_schema.chain_schema(
+            [
+                core_schema.str_schema(),
+                core_schema.no_info_plain_validator_function(cls.deserialize),
+            ]
+        )
+        return core_schema.json_or_python_schema(
+            json_schema=from_str,
+            python_schema=core_schema.union_schema(
+                [core_schema.is_instance_schema(cls), from_str]
+            ),
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                cls.serialize, when_used="json"
+            ),
+        )
 
     def next_cursor(
         self,
@@ -71,7 +281,7 @@ class Cursor(pydantic.BaseModel):
             if last_modified_txid == xid_next:
                 xid_next += 1
 
-            xip_list = [xip for xip in snapshot.xip_list if xip < xid_next]
+            xip_list = snapshot.xip_list[: bisect_left(snapshot.xip_list, xid_next)]
 
             return self.__class__(xid_next=xid_next, xip_list=xip_list)
 
@@ -112,10 +322,10 @@ class Cursor(pydantic.BaseModel):
             # unless they're still in the snapshot, which get union-ed below.
             # Now-committed txids from xip_list are processed in order, and the
             # last one will become the new xid_at if we don't process all the changes.
-            xips_to_keep = [xip for xip in self.xip_list if xip > xid_at]
+            xips_to_keep = self.xip_list[bisect_right(self.xip_list, xid_at) :]
 
         # We obviously have to carry forward what's still in the snapshot:
-        xip_list = list(set(snapshot.xip_list) | set(xips_to_keep))
+        xip_list = _sorted_union(snapshot.xip_list, xips_to_keep)
 
         return self.__class__(
             xid_next=xid_next,
@@ -125,7 +335,8 @@ class Cursor(pydantic.BaseModel):
         )
 
 
-class Snapshot(pydantic.BaseModel):
+@dataclass(slots=True, kw_only=True)
+class Snapshot:
     """
     A snapshot of the currently active transactions
     """
@@ -134,8 +345,11 @@ class Snapshot(pydantic.BaseModel):
     xmin: int
     # ... while xmax is the highest
     xmax: int
-    # ... and "xip" is "transactions in progress"
+    # ... and "xip" is "transactions in progress", sorted
     xip_list: list[int]
 
     # In general, the modifications of a transaction is visible iff
     # xmin <= txid < xmax and txid not in xip_list
+
+    def __post_init__(self) -> None:
+        self.xip_list = sorted(self.xip_list)
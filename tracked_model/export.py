@@ -0,0 +1,136 @@
+"""
+Export changes in bulk with COPY, streaming the rows to a file as Postgres
+writes them, rather than turning each into a Python object.
+"""
+
+from typing import IO, TYPE_CHECKING, Any, Literal
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, transaction
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+from .cursor import Cursor
+from .expressions import ChangedObjectsSubquery
+from .utils import (
+    _ChangePosition,
+    _filter_changes,
+    _get_repeatable_read_snapshot,
+    _get_version_model,
+)
+
+if TYPE_CHECKING:
+    from django.db.models.query import _QuerySet
+
+COPY_FORMATS = ("csv", "text", "binary")
+
+
+def _copy_to(
+    queryset: "_QuerySet[Any, Any]",
+    sink: IO[bytes],
+    *,
+    format: str,
+    header: bool,
+) -> None:
+    connection = connections[queryset.db]
+    try:
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    except EmptyResultSet:
+        return
+
+    # COPY can't take parameters, so they're bound on the client
+    options = f"FORMAT {format}, HEADER" if header else f"FORMAT {format}"
+    query = connection.ops.compose_sql(sql, params)  # type: ignore[attr-defined]
+    copy_sql = f"COPY ({query}) TO STDOUT ({options})"
+
+    with connection.cursor() as cursor:
+        if is_psycopg3:
+            with cursor.cursor.copy(copy_sql) as copy:
+                for data in copy:
+                    sink.write(data)
+        else:
+            cursor.cursor.copy_expert(copy_sql, sink)
+
+
+class _BatchSubquery(ChangedObjectsSubquery):
+    columns = "priority, last_modified_txid, object_id"
+
+
+def _get_position(
+    queryset: "_QuerySet[Any, Any]",
+    *,
+    cursor: Cursor,
+    limit: int,
+    partition: tuple[int, int] | None,
+) -> _ChangePosition:
+    """
+    Work out the position of a batch of changes from the version table
+    alone, i.e. how many changes there are and which is the last one.
+    """
+
+    connection = connections[queryset.db]
+    query = _get_version_model(queryset.model)._default_manager.all().query
+    batch = _BatchSubquery(
+        model_cls=_get_version_model(queryset.model),
+        limit=limit,
+        cursor=cursor,
+        partition=partition,
+        queryset=queryset if queryset.query.has_filters() else None,
+    ).resolve_expression(query)
+    batch_sql, params = batch.as_sql(query.get_compiler(queryset.db), connection)
+
+    position = _ChangePosition(cursor)
+    with connection.cursor() as conn:
+        conn.execute(
+            f"""
+            SELECT count(*) OVER (), last_modified_txid, object_id
+            FROM ({batch_sql}) AS _batch
+            ORDER BY priority DESC, last_modified_txid DESC, object_id DESC
+            LIMIT 1
+            """,
+            params,
+        )
+        for count, last_modified_txid, last_object_id in conn.fetchall():
+            position.add(last_modified_txid, last_object_id)
+            position.count = count
+    return position
+
+
+def export_changes(
+    *,
+    cursor: Cursor | None,
+    limit: int = 100_000,
+    queryset: "_QuerySet[Any, Any]",
+    sink: IO[bytes],
+    format: Literal["csv", "text", "binary"] = "csv",
+    header: bool = False,
+    partition: tuple[int, int] | None = None,
+) -> tuple[int, Cursor]:
+    """
+    Write the changes after the cursor to sink with COPY ... TO STDOUT, in
+    the given COPY format, and return how many there were and the next
+    cursor. The sink is a binary file, and the data is written to it as it
+    arrives.
+
+    The columns are those selected by the queryset, e.g. with values(). The
+    next cursor is worked out in the same snapshot, from the version table.
+    """
+
+    if format not in COPY_FORMATS:
+        raise ValueError(f"Unknown COPY format {format!r}")
+
+    if cursor is None:
+        cursor = Cursor(xid_next=1, xip_list=[])
+
+    with transaction.atomic(using=queryset.db, durable=True):
+        snapshot = _get_repeatable_read_snapshot(queryset.db)
+        _copy_to(
+            _filter_changes(queryset, cursor=cursor, limit=limit, partition=partition),
+            sink,
+            format=format,
+            header=header,
+        )
+        position = _get_position(
+            queryset, cursor=cursor, limit=limit, partition=partition
+        )
+
+    return position.count, position.next_cursor(snapshot=snapshot, limit=limit)
@@ -3,14 +3,18 @@ from typing import TYPE_CHECKING, Any, Self, Sequence, cast
 from django.core.exceptions import EmptyResultSet
 from django.db import models
 from django.db.backends.base.base import BaseDatabaseWrapper
-from django.db.models import Value
-from django.db.models.expressions import BaseExpression, Col, Combinable
+from django.db.models import Exists, F, OuterRef, Q
+from django.db.models.expressions import BaseExpression, Col, Combinable, RawSQL
+from django.db.models.lookups import Lookup
 from django.db.models.sql import Query
 from django.db.models.sql.compiler import SQLCompiler
+from django.db.models.sql.where import AND
 
 from .cursor import Cursor
 
 if TYPE_CHECKING:
+    from django.db.models.query import _QuerySet
+
     from .models import ModelVersion
 
 
@@ -18,12 +22,125 @@ class AdjustedTxidCurrent(models.Func):
     function = "adjusted_txid_current"
 
 
+class PartitionKey(models.Func):
+    """
+    Hash an object id into one of a fixed number of partitions. The number of
+    partitions is part of the SQL, rather than a parameter, so queries can be
+    matched against an index on the same expression.
+    """
+
+    template = "mod(hashint8(%(expressions)s) & 2147483647, %(partitions)d)"
+    output_field = models.IntegerField()
+
+    def __init__(self, expression: Any, *, partitions: int) -> None:
+        if partitions < 1:
+            raise ValueError("The number of partitions must be at least 1")
+        super().__init__(expression, partitions=partitions)
+
+
+def _split_copied_filters(
+    queryset: "_QuerySet[Any, Any]", copy_fields: Sequence[str]
+) -> tuple[list[Q], bool]:
+    """
+    Find the filters of the queryset that are on fields copied to the version
+    model, so they can be applied to the version table directly. Only simple
+    lookups against values at the top level of the WHERE clause are picked.
+
+    Returns the filters, and whether they cover the whole WHERE clause.
+    """
+
+    where = queryset.query.where
+    if where.connector != AND or where.negated:
+        return [], False
+
+    filters = []
+    for child in where.children:
+        if (
+            isinstance(child, Lookup)
+            and isinstance(child.lhs, Col)
+            and child.lhs.alias == queryset.query.base_table
+            and child.lhs.target.name in copy_fields
+            and not hasattr(child.rhs, "resolve_expression")
+        ):
+            lookup = f"{child.lhs.target.name}__{child.lookup_name}"
+            filters.append(Q(**{lookup: child.rhs}))
+
+    return filters, len(filters) == len(where.children)
+
+
+class CursorSlot:
+    """
+    A placeholder for one of the values of a cursor in the params of a
+    compiled query, see cursor_params
+    """
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.name!r})"
+
+
+CURSOR_SLOTS = {
+    name: CursorSlot(name) for name in ("xid_at", "xid_at_id", "xip_list", "xid_next")
+}
+
+
+def cursor_params(cursor: Cursor) -> dict[str, Any]:
+    """
+    The values that fill in the CursorSlots of a compiled query
+    """
+
+    return {
+        "xid_at": cursor.xid_at,
+        "xid_at_id": cursor.xid_at_id,
+        "xip_list": list(cursor.xip_list),
+        "xid_next": cursor.xid_next,
+    }
+
+
+class CursorParam(BaseExpression):
+    """
+    A query parameter taken from the cursor. It's passed through as is, so a
+    CursorSlot ends up in the params of the compiled query.
+    """
+
+    def __init__(self, value: Any, output_field: "models.Field[Any, Any]") -> None:
+        super().__init__(output_field=output_field)
+        self.value = value
+
+    def as_sql(
+        self, compiler: SQLCompiler, connection: BaseDatabaseWrapper
+    ) -> tuple[str, tuple[Any, ...]]:
+        return "%s", (self.value,)
+
+
+class AnyOf(Lookup):
+    """
+    Compare against any element of an array, so a list of any length is a
+    single parameter and the SQL stays the same.
+    """
+
+    lookup_name = "any_of"
+
+    def as_sql(
+        self, compiler: SQLCompiler, connection: BaseDatabaseWrapper
+    ) -> tuple[str, tuple[Any, ...]]:
+        lhs_sql, lhs_params = self.process_lhs(compiler, connection)
+        rhs_sql, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs_sql} = ANY({rhs_sql})", (*lhs_params, *rhs_params)
+
+
 class ChangedObjectsSubquery(BaseExpression, Combinable):
     template = """\
-        SELECT object_id FROM ({queries}) as _changes
+        SELECT {columns} FROM ({queries}) as _changes
         ORDER BY priority, last_modified_txid, object_id \
         LIMIT %s \
     """
+    # Subclasses may select the priority and last_modified_txid as well
+    columns = "object_id"
     contains_aggregate = False
     empty_result_set_value = None
     subquery = True
@@ -31,49 +148,91 @@ class ChangedObjectsSubquery(BaseExpression, Combinable):
     def __init__(
         self,
         model_cls: type["ModelVersion"],
-        cursor: Cursor,
+        cursor: Cursor | None,
         limit: int,
+        partition: tuple[int, int] | None = None,
+        queryset: "_QuerySet[Any, Any] | None" = None,
+        include_deleted: bool = False,
     ) -> None:
+        """
+        If cursor is None, CursorSlots are left in the params in place of the
+        cursor's values, to be filled in with cursor_params.
+
+        Tombstones of deleted objects are only picked with include_deleted.
+        For a filtered queryset they're picked unless a filter on a copied
+        field rules them out, as there's no telling whether a deleted object
+        matched the other filters.
+        """
+
         super().__init__()
 
         self.limit = limit
 
         self.model_cls = model_cls
 
-        # First priority is remaining changes from the current transaction
-        if cursor.xid_at:
-            changes_1 = (
-                model_cls._default_manager.filter(
-                    last_modified_txid=cursor.xid_at,
-                    object_id__gt=cursor.xid_at_id,
-                )
+        versions = model_cls._default_manager.all()
+        if partition is not None:
+            index, partitions = partition
+            if not 0 <= index < partitions:
+                raise ValueError(f"Invalid partition {index} of {partitions}")
+            versions = versions.alias(
+                _partition=PartitionKey("object_id", partitions=partitions)
+            ).filter(_partition=index)
+
+        if model_cls.track_deletes and not include_deleted:
+            versions = versions.filter(Q(deleted=False))
+
+        # If the changes are for a filtered queryset, only pick changes to
+        # objects it includes. Otherwise the limit is applied before the
+        # filtering, and batches come back short. Filters on copied fields
+        # can use the version table's own index.
+        if queryset is not None:
+            copied, complete = _split_copied_filters(queryset, model_cls.copy_fields)
+            versions = versions.filter(*copied)
+            if not complete:
+                exists = Q(Exists(queryset.order_by().filter(pk=OuterRef("object_id"))))
+                if include_deleted:
+                    exists |= Q(deleted=True)
+                versions = versions.filter(exists)
+
+        # The SQL is the same for every cursor, so it can be compiled once and
+        # Postgres can reuse the plan. A branch with nothing to pick gets
+        # NULL or an empty array, and returns no rows.
+        params = CURSOR_SLOTS if cursor is None else cursor_params(cursor)
+        txid_field = models.BigIntegerField()
+
+        def branch(priority: int, *args: Any, **kwargs: Any) -> Query:
+            query = (
+                versions.filter(*args, **kwargs)
                 .order_by("last_modified_txid", "object_id")
-                .values("last_modified_txid", "object_id", priority=Value(1))
+                .values(
+                    "last_modified_txid",
+                    "object_id",
+                    priority=RawSQL(
+                        str(priority), (), output_field=models.IntegerField()
+                    ),
+                )
             )[:limit].query
-        else:
-            changes_1 = model_cls._default_manager.none().query
-        changes_1.subquery = True
+            query.subquery = True
+            return query
+
+        # First priority is remaining changes from the current transaction
+        changes_1 = branch(
+            1,
+            last_modified_txid=CursorParam(params["xid_at"], txid_field),
+            object_id__gt=CursorParam(params["xid_at_id"], models.IntegerField()),
+        )
 
         # Next any changes from the in-progress transactions
-        if cursor.xip_list:
-            changes_2 = (
-                model_cls._default_manager.filter(
-                    last_modified_txid__in=cursor.xip_list
-                )
-                .order_by("last_modified_txid", "object_id")
-                .values("last_modified_txid", "object_id", priority=Value(2))
-            )[:limit].query
-        else:
-            changes_2 = model_cls._default_manager.none().query
-        changes_2.subquery = True
+        changes_2 = branch(
+            2,
+            AnyOf(F("last_modified_txid"), CursorParam(params["xip_list"], txid_field)),
+        )
 
         # Finally changes from later transactions
-        changes_3 = (
-            model_cls._default_manager.filter(last_modified_txid__gte=cursor.xid_next)
-            .order_by("last_modified_txid", "object_id")
-            .values("last_modified_txid", "object_id", priority=Value(3))
-        )[:limit].query
-        changes_3.subquery = True
+        changes_3 = branch(
+            3, last_modified_txid__gte=CursorParam(params["xid_next"], txid_field)
+        )
 
         self.queries = [changes_1, changes_2, changes_3]
 
@@ -125,7 +284,7 @@ class ChangedObjectsSubquery(BaseExpression, Combinable):
 
         queries_sql = " UNION ALL ".join(queries)
 
-        sql = self.template.format(queries=queries_sql)
+        sql = self.template.format(columns=self.columns, queries=queries_sql)
         return sql, params + [self.limit]
 
     def get_group_by_cols(self) -> list[BaseExpression]:
@@ -0,0 +1,251 @@
+"""
+Serve many subscribers of the same stream of changes from memory. A single
+reader polls the database, and keeps the most recent batches around so
+subscribers holding a cursor the reader issued are answered without a query.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, Callable, Generic, NamedTuple, TypeVar
+
+from django.db import connections
+
+from .batching import SIZE_SAMPLE, _pickled_size
+from .cursor import Cursor
+from .utils import _cursor_position, get_changed_objects, may_have_changes
+
+if TYPE_CHECKING:
+    from django.db.models.query import _QuerySet
+
+T = TypeVar("T")
+
+# How many earlier positions of the latest cursor are remembered, see poll
+MAX_IDLE_POSITIONS = 100
+
+
+class _Batch(NamedTuple):
+    objects: list[Any]
+    cursor: Cursor
+    size: int
+
+
+class ChangeHub(Generic[T]):
+    """
+    Poll for changes in a background thread, keeping the recent batches in a
+    buffer of at most max_bytes, keyed by the cursor each batch follows.
+
+    Subscribers call get_changed_objects on the hub instead of the module
+    function. If their cursor is in the buffer they get the following
+    batches, as many as fit their limit, from memory. Subscribers that have
+    fallen behind the buffer, or ask for less than a whole batch, read from
+    the database as usual. Once such a subscriber has caught up it is handed
+    the hub's latest cursor, so its next call is served from memory again.
+    It may see a few changes twice when it rejoins, but never misses any.
+
+    The objects are shared between subscribers, and must not be modified.
+
+    If the hub hasn't polled successfully for max_age seconds, e.g. because
+    the database is unavailable, subscribers read from the database until it
+    recovers. The last error is kept in last_error.
+    """
+
+    def __init__(
+        self,
+        *,
+        queryset: "_QuerySet[Any, T]",
+        cursor: Cursor | None = None,
+        limit: int = 100,
+        poll_interval: float = 1.0,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_age: float | None = None,
+        sizeof: Callable[[Any], int] = _pickled_size,
+    ) -> None:
+        self.queryset = queryset
+        self.limit = limit
+        self.poll_interval = poll_interval
+        self.max_bytes = max_bytes
+        self.max_age = 10 * poll_interval if max_age is None else max_age
+        self.sizeof = sizeof
+        self.last_error: Exception | None = None
+
+        self._head = cursor or Cursor(xid_next=1, xip_list=[])
+        self._caught_up = False
+        self._polled_at: float | None = None
+        self._batches: OrderedDict[tuple[Any, ...], _Batch] = OrderedDict()
+        self._idle_positions: OrderedDict[tuple[Any, ...], tuple[Any, ...]] = (
+            OrderedDict()
+        )
+        self._bytes = 0
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="tracked-model-hub", daemon=True
+        )
+
+    @property
+    def buffered_bytes(self) -> int:
+        return self._bytes
+
+    def _estimate_size(self, objects: list[T]) -> int:
+        if not objects:
+            return 0
+        sample = objects[:SIZE_SAMPLE]
+        per_object = sum(self.sizeof(obj) for obj in sample) / len(sample)
+        return int(per_object * len(objects))
+
+    def poll(self) -> bool:
+        """
+        Fetch the next batch after the hub's latest cursor into the buffer,
+        evicting the oldest batches to stay within max_bytes. Returns whether
+        the batch was full, i.e. there may be more changes waiting.
+        """
+
+        head = self._head
+        if may_have_changes(cursor=head, using=self.queryset.db):
+            objects, cursor = get_changed_objects(
+                cursor=head, limit=self.limit, queryset=self.queryset
+            )
+        else:
+            objects, cursor = [], head
+        size = self._estimate_size(objects)
+
+        with self._lock:
+            # Empty batches don't need to be kept, as the latest cursor still
+            # gives the same changes as the one we just got
+            if objects:
+                self._batches[_cursor_position(head)] = _Batch(objects, cursor, size)
+                self._bytes += size
+                self._head = cursor
+                while self._bytes > self.max_bytes and self._batches:
+                    _, batch = self._batches.popitem(last=False)
+                    self._bytes -= batch.size
+            elif cursor != head:
+                # Moving past transactions that changed nothing keeps the
+                # probe from firing on every poll after them. Subscribers
+                # holding an earlier cursor have nothing new either, so its
+                # position is remembered as leading to the new one.
+                previous, position = _cursor_position(head), _cursor_position(cursor)
+                for idle, target in self._idle_positions.items():
+                    if target == previous:
+                        self._idle_positions[idle] = position
+                self._idle_positions[previous] = position
+                while len(self._idle_positions) > MAX_IDLE_POSITIONS:
+                    self._idle_positions.popitem(last=False)
+                self._head = cursor
+
+            self._caught_up = len(objects) < self.limit
+            self._polled_at = time.monotonic()
+
+        return not self._caught_up
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._polled_at is not None
+            and time.monotonic() - self._polled_at <= self.max_age
+        )
+
+    def _get_buffered(
+        self, cursor: Cursor, limit: int
+    ) -> tuple[list[T], Cursor] | None:
+        if not self._is_fresh():
+            return None
+
+        position = _cursor_position(cursor)
+        position = self._idle_positions.get(position, position)
+        if position == _cursor_position(self._head):
+            return [], self._head
+
+        # Consecutive batches can be joined, as long as they fit
+        objects: list[T] = []
+        next_cursor = cursor
+        while (batch := self._batches.get(position)) is not None:
+            if len(objects) + len(batch.objects) > limit:
+                break
+            objects += batch.objects
+            next_cursor = batch.cursor
+            position = _cursor_position(next_cursor)
+
+        return (objects, next_cursor) if objects else None
+
+    def get_buffered_changes(
+        self, *, cursor: Cursor | None, limit: int | None = None
+    ) -> tuple[list[T], Cursor] | None:
+        """
+        Get the changes after the cursor from memory, or None if they have to
+        be read from the database. This never runs a query, so it can be
+        called from async code.
+        """
+
+        with self._lock:
+            return self._get_buffered(
+                cursor or Cursor(xid_next=1, xip_list=[]),
+                self.limit if limit is None else limit,
+            )
+
+    def get_changed_objects(
+        self, *, cursor: Cursor | None, limit: int | None = None
+    ) -> tuple[list[T], Cursor]:
+        """
+        Get the changes after the cursor, like the module level
+        get_changed_objects for the hub's queryset. The limit defaults to
+        the hub's.
+        """
+
+        cursor = cursor or Cursor(xid_next=1, xip_list=[])
+        if limit is None:
+            limit = self.limit
+
+        with self._lock:
+            if (buffered := self._get_buffered(cursor, limit)) is not None:
+                return buffered
+            rejoin = self._head if self._is_fresh() and self._caught_up else None
+
+        objects, next_cursor = get_changed_objects(
+            cursor=cursor, limit=limit, queryset=self.queryset
+        )
+
+        # The subscriber has now seen every change in a snapshot taken after
+        # the one the hub's latest cursor was issued from, so it can continue
+        # from there.
+        if rejoin is not None and len(objects) < limit:
+            next_cursor = rejoin
+
+        return objects, next_cursor
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.is_set():
+                try:
+                    more = self.poll()
+                except Exception as e:
+                    self.last_error = e
+                    more = False
+                else:
+                    self.last_error = None
+                if not more:
+                    self._stop.wait(self.poll_interval)
+        finally:
+            connections.close_all()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def __enter__(self) -> "ChangeHub[T]":
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
@@ -0,0 +1,91 @@
+import time
+from typing import Any
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import DEFAULT_DB_ALIAS
+
+from ...backfill import DEFAULT_CHUNK_SIZE, BackfillStatus, backfill_versions
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill the version table of a tracked model in chunks, resuming "
+        "where an earlier run stopped."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("model", help="The tracked model, as app_label.Model")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Backfill this many slices of the table in parallel",
+        )
+        parser.add_argument(
+            "--max-rows-per-second",
+            type=float,
+            help="Wait between chunks to stay below this many rows per second",
+        )
+        parser.add_argument(
+            "--max-replication-lag",
+            type=float,
+            help="Wait while any standby is more than this many seconds behind",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Start over, rather than from where an earlier run stopped",
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Count the objects still without version info at the end",
+        )
+        parser.add_argument(
+            "--report-interval",
+            type=float,
+            default=10.0,
+            help="Seconds between progress reports",
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        try:
+            model = apps.get_model(options["model"])
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e)) from e
+
+        reported_at = time.monotonic()
+
+        def report(status: BackfillStatus) -> None:
+            nonlocal reported_at
+            if time.monotonic() - reported_at < options["report_interval"]:
+                return
+            reported_at = time.monotonic()
+            self.stdout.write(
+                f"Scanned {status.scanned} of about {status.estimated_total} "
+                f"objects, {status.completed_slices} of {status.slices} slices "
+                f"done, {status.rows} backfilled"
+            )
+
+        status = backfill_versions(
+            model,
+            using=options["database"],
+            chunk_size=options["chunk_size"],
+            workers=options["workers"],
+            max_rows_per_second=options["max_rows_per_second"],
+            max_replication_lag=options["max_replication_lag"],
+            restart=options["restart"],
+            verify=options["verify"],
+            progress=report,
+        )
+        self.stdout.write(f"Backfilled {status.rows} objects of {options['model']}")
+
+        if status.missing:
+            raise CommandError(
+                f"{status.missing} objects are still missing version info"
+            )
+        if status.missing is not None:
+            self.stdout.write("Every object has version info")
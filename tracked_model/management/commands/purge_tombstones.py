@@ -0,0 +1,44 @@
+from datetime import timedelta
+from typing import Any
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import DEFAULT_DB_ALIAS
+
+from ...tombstones import DEFAULT_BATCH_SIZE, purge_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the tombstones left by objects of a tracked model that were "
+        "deleted more than some days ago."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("model", help="The tracked model, as app_label.Model")
+        parser.add_argument(
+            "--older-than-days",
+            type=float,
+            required=True,
+            help="Keep the tombstones of objects deleted more recently",
+        )
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        try:
+            model = apps.get_model(options["model"])
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e)) from e
+
+        try:
+            purged = purge_tombstones(
+                model,
+                older_than=timedelta(days=options["older_than_days"]),
+                using=options["database"],
+                batch_size=options["batch_size"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e)) from e
+
+        self.stdout.write(f"Purged {purged} tombstones of {options['model']}")
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-17 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracked_model", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BackfillProgress",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version_table", models.CharField(max_length=255, unique=True)),
+                ("last_object_id", models.BigIntegerField(null=True)),
+                ("rows", models.BigIntegerField(default=0)),
+                ("completed_at", models.DateTimeField(null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
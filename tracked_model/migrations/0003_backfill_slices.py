@@ -0,0 +1,35 @@
+# Generated by Django 5.0.14 on 2026-10-17 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracked_model", "0002_backfillprogress"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="backfillprogress",
+            name="slice_end",
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="backfillprogress",
+            name="slice_start",
+            field=models.BigIntegerField(default=-9223372036854775808),
+        ),
+        migrations.AlterField(
+            model_name="backfillprogress",
+            name="version_table",
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AddConstraint(
+            model_name="backfillprogress",
+            constraint=models.UniqueConstraint(
+                fields=("version_table", "slice_start"),
+                name="tracked_model_backfill_slice",
+            ),
+        ),
+    ]
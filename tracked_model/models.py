@@ -16,8 +16,39 @@ class ModelVersion(models.Model):
     last_modified_txid = models.BigIntegerField(db_default=AdjustedTxidCurrent())  # type: ignore[call-arg]
     last_modified_at = models.DateTimeField(db_default=Now())  # type: ignore[call-arg]
 
+    # Names of fields copied from the tracked model, see tracked()
+    copy_fields: tuple[str, ...] = ()
+    # Whether deleted objects leave a tombstone, see tracked()
+    track_deletes: bool = False
+
     class Meta:
         abstract = True
         indexes = [
             models.Index(fields=["last_modified_txid", "object_id"]),
         ]
+
+
+class BackfillProgress(models.Model):
+    """
+    How far a chunked backfill of a slice of a version table has got, so it
+    can be resumed, see backfill_versions
+    """
+
+    version_table = models.CharField(max_length=255)
+    # The slice covers the objects with slice_start < id <= slice_end, where
+    # the last slice has no end
+    slice_start = models.BigIntegerField(default=-(2**63))
+    slice_end = models.BigIntegerField(null=True)
+    # The last object in the slice that has been backfilled
+    last_object_id = models.BigIntegerField(null=True)
+    rows = models.BigIntegerField(default=0)
+    completed_at = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["version_table", "slice_start"],
+                name="tracked_model_backfill_slice",
+            ),
+        ]
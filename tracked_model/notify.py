@@ -0,0 +1,95 @@
+"""
+Wait for changes using LISTEN/NOTIFY, rather than polling on an interval.
+This needs the version tracking to be added with notify=True.
+"""
+
+import select
+from typing import TYPE_CHECKING, TypeVar
+
+from django.db import connections, models
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+from .cursor import Cursor
+from .utils import _get_version_model, get_changed_objects
+
+if TYPE_CHECKING:
+    from django.db.models.query import _QuerySet
+
+T = TypeVar("T")
+M = TypeVar("M", bound=models.Model)
+
+
+def get_channel(model: type[models.Model]) -> str:
+    """
+    Get the name of the channel notifications are sent on for a tracked model
+    """
+
+    return _get_version_model(model)._meta.db_table
+
+
+def _listen(connection: BaseDatabaseWrapper, channel: str) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(f"LISTEN {connection.ops.quote_name(channel)}")
+
+
+def _wait_for_notify(connection: BaseDatabaseWrapper, timeout: float) -> bool:
+    """
+    Wait for a notification on any of the channels we're listening to, and
+    return whether we got one. Any notifications already received are
+    consumed, so they won't wake us up again.
+    """
+
+    conn = connection.connection
+
+    if is_psycopg3:
+        notified = False
+        for _ in conn.notifies(timeout=timeout, stop_after=1):
+            notified = True
+        # stop_after only takes what arrived with the first one
+        for _ in conn.notifies(timeout=0):
+            pass
+        return notified
+
+    # Notifications may have been picked up while running other queries
+    if not conn.notifies:
+        if select.select([conn], [], [], timeout) == ([], [], []):
+            return False
+        conn.poll()
+
+    notified = bool(conn.notifies)
+    conn.notifies.clear()
+    return notified
+
+
+def wait_for_changed_objects(
+    *,
+    cursor: Cursor | None,
+    limit: int = 100,
+    queryset: "_QuerySet[M, T]",
+    timeout: float = 5.0,
+) -> tuple[list[T], Cursor]:
+    """
+    Like get_changed_objects, but if there are no changes we wait up to
+    timeout seconds to be notified about new changes before returning:
+
+        changes, cursor = get_changed_objects(cursor=None, queryset=qs)
+        while True:
+            if changes:
+                print(changes)
+            changes, cursor = wait_for_changed_objects(cursor=cursor, queryset=qs)
+
+    The connection keeps listening for notifications until it's closed.
+    """
+
+    connection = connections[queryset.db]
+
+    # Start listening before looking for changes, so we can't miss a
+    # transaction that commits after our snapshot was taken
+    _listen(connection, get_channel(queryset.model))
+
+    objects, cursor = get_changed_objects(cursor=cursor, limit=limit, queryset=queryset)
+    if objects or not _wait_for_notify(connection, timeout):
+        return objects, cursor
+
+    return get_changed_objects(cursor=cursor, limit=limit, queryset=queryset)
@@ -1,10 +1,13 @@
 from .backfill import BackfillModelVersion
+from .copies import AddCopiedField, RemoveCopiedField
 from .helpers import CreateAdjustedTxidCurrentFunction, CreateTxidOffsetFunction
 from .tiggers import AddVersionTracking
 
 __all__ = [
+    "AddCopiedField",
     "AddVersionTracking",
     "BackfillModelVersion",
     "CreateAdjustedTxidCurrentFunction",
     "CreateTxidOffsetFunction",
+    "RemoveCopiedField",
 ]
@@ -2,19 +2,53 @@ from django.db.backends.base.schema import BaseDatabaseSchemaEditor
 from django.db.migrations.operations.base import Operation
 from django.db.migrations.state import ProjectState
 
+from .tiggers import _copied_columns
+
 BACKFILL_QUERY_SQL = """\
-INSERT INTO {version_table} (object_id)
-SELECT id FROM {tracked_table}
+INSERT INTO {version_table} (object_id{copy_columns})
+SELECT id{copy_columns} FROM {tracked_table}
 ON CONFLICT (object_id) DO NOTHING;
 """
 
 
 class BackfillModelVersion(Operation):
-    reduces_to_sql = True
+    """
+    Add version info for the existing objects of a tracked model.
+
+    By default this is a single statement. With chunk_size or workers set,
+    the table is backfilled in chunks that are each committed, by several
+    workers in parallel, see backfill_versions. That needs a migration with
+    atomic = False that depends on tracked_model's 0003_backfill_slices.
+    With verify, the migration fails if any object is left without version
+    info.
+    """
+
     reversible = True
 
-    def __init__(self, tracked_model: str) -> None:
+    def __init__(
+        self,
+        tracked_model: str,
+        *,
+        chunk_size: int | None = None,
+        workers: int = 1,
+        max_rows_per_second: float | None = None,
+        max_replication_lag: float | None = None,
+        verify: bool = False,
+    ) -> None:
         self.tracked_model = tracked_model
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.max_rows_per_second = max_rows_per_second
+        self.max_replication_lag = max_replication_lag
+        self.verify = verify
+
+    @property
+    def chunked(self) -> bool:
+        return self.chunk_size is not None or self.workers > 1
+
+    @property
+    def reduces_to_sql(self) -> bool:  # type: ignore[override]
+        return not self.chunked
 
     def state_forwards(self, app_label: str, state: ProjectState) -> None:
         pass
@@ -28,13 +62,42 @@ class BackfillModelVersion(Operation):
     ) -> None:
 
         tracked_model = from_state.apps.get_model(app_label, self.tracked_model)
+
+        if self.chunked:
+            # Imported here, as it needs the models to be loaded
+            from ..backfill import DEFAULT_CHUNK_SIZE, backfill_versions
+
+            status = backfill_versions(
+                tracked_model,
+                using=schema_editor.connection.alias,
+                workers=self.workers,
+                max_rows_per_second=self.max_rows_per_second,
+                max_replication_lag=self.max_replication_lag,
+                verify=self.verify,
+                chunk_size=self.chunk_size or DEFAULT_CHUNK_SIZE,
+            )
+            if status.missing:
+                raise RuntimeError(
+                    f"{status.missing} objects of {self.tracked_model} are "
+                    "still missing version info after the backfill"
+                )
+            return
+
         field = tracked_model._meta.get_field("version_info")
         version_model = field.related_model
 
         tracked_table = tracked_model._meta.db_table
         version_table = version_model._meta.db_table
 
-        context = {"tracked_table": tracked_table, "version_table": version_table}
+        copy_columns = "".join(
+            f", {column}" for column in _copied_columns(version_model)
+        )
+
+        context = {
+            "tracked_table": tracked_table,
+            "version_table": version_table,
+            "copy_columns": copy_columns,
+        }
         sql = BACKFILL_QUERY_SQL.format(**context)
 
         schema_editor.execute(sql)
@@ -0,0 +1,151 @@
+from typing import Any, Sequence
+
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.migrations import AddField, RemoveField
+from django.db.migrations.state import ProjectState
+
+from .tiggers import _state_trigger_sql
+
+BACKFILL_COPY_SQL = """\
+UPDATE {version_table} SET {column} = {tracked_table}.{column}
+FROM {tracked_table}
+WHERE {version_table}.object_id = {tracked_table}.id;
+"""
+
+
+def _replace_triggers(
+    app_label: str,
+    schema_editor: BaseDatabaseSchemaEditor,
+    state: ProjectState,
+    *,
+    tracked_model: str,
+    version_model: str,
+    backfill: str | None = None,
+) -> None:
+    """
+    Replace the version tracking triggers with ones copying the fields of
+    the version model in the given state, and optionally fill in a copied
+    field for existing objects.
+    """
+
+    tracked = state.apps.get_model(app_label, tracked_model)
+    version = state.apps.get_model(app_label, version_model)
+
+    tracked_table = tracked._meta.db_table
+    version_table = version._meta.db_table
+
+    queries = _state_trigger_sql(tracked, version)
+    if backfill is not None:
+        column = version._meta.get_field(backfill).column
+        queries.append(
+            BACKFILL_COPY_SQL.format(
+                version_table=version_table, tracked_table=tracked_table, column=column
+            )
+        )
+
+    for query in queries:
+        schema_editor.execute(query)
+
+
+class AddCopiedField(AddField):
+    """
+    Add a field copied from the tracked model to its version model, see
+    copy_fields of @tracked. Use this instead of the AddField makemigrations
+    generates for the version model. The triggers are updated to keep the
+    field in sync, and it's filled in for existing objects.
+    """
+
+    def __init__(self, tracked_model: str, *args: Any, **kwargs: Any) -> None:
+        self.tracked_model = tracked_model
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self) -> tuple[str, Sequence[Any], dict[str, Any]]:
+        name, args, kwargs = super().deconstruct()
+        return name, args, {"tracked_model": self.tracked_model, **kwargs}
+
+    def database_forwards(
+        self,
+        app_label: str,
+        schema_editor: BaseDatabaseSchemaEditor,
+        from_state: ProjectState,
+        to_state: ProjectState,
+    ) -> None:
+        super().database_forwards(app_label, schema_editor, from_state, to_state)
+        _replace_triggers(
+            app_label,
+            schema_editor,
+            to_state,
+            tracked_model=self.tracked_model,
+            version_model=self.model_name,
+            backfill=self.name,
+        )
+
+    def database_backwards(
+        self,
+        app_label: str,
+        schema_editor: BaseDatabaseSchemaEditor,
+        from_state: ProjectState,
+        to_state: ProjectState,
+    ) -> None:
+        _replace_triggers(
+            app_label,
+            schema_editor,
+            to_state,
+            tracked_model=self.tracked_model,
+            version_model=self.model_name,
+        )
+        super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+    def describe(self) -> str:
+        return f"Add field {self.name} copied from {self.tracked_model}"
+
+
+class RemoveCopiedField(RemoveField):
+    """
+    Remove a field copied from the tracked model from its version model, after
+    updating the triggers to no longer copy it.
+    """
+
+    def __init__(self, tracked_model: str, *args: Any, **kwargs: Any) -> None:
+        self.tracked_model = tracked_model
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self) -> tuple[str, Sequence[Any], dict[str, Any]]:
+        name, args, kwargs = super().deconstruct()
+        return name, args, {"tracked_model": self.tracked_model, **kwargs}
+
+    def database_forwards(
+        self,
+        app_label: str,
+        schema_editor: BaseDatabaseSchemaEditor,
+        from_state: ProjectState,
+        to_state: ProjectState,
+    ) -> None:
+        _replace_triggers(
+            app_label,
+            schema_editor,
+            to_state,
+            tracked_model=self.tracked_model,
+            version_model=self.model_name,
+        )
+        super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(
+        self,
+        app_label: str,
+        schema_editor: BaseDatabaseSchemaEditor,
+        from_state: ProjectState,
+        to_state: ProjectState,
+    ) -> None:
+        super().database_backwards(app_label, schema_editor, from_state, to_state)
+        _replace_triggers(
+            app_label,
+            schema_editor,
+            to_state,
+            tracked_model=self.tracked_model,
+            version_model=self.model_name,
+            backfill=self.name,
+        )
+
+    def describe(self) -> str:
+        return f"Remove field {self.name} copied from {self.tracked_model}"
@@ -1,12 +1,28 @@
+from typing import Any, Sequence, cast
+
+from django.db import models
 from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.backends.utils import truncate_name
 from django.db.migrations.operations.base import Operation
 from django.db.migrations.state import ProjectState
 
+# Postgres cuts longer identifiers short
+MAX_NAME_LENGTH = 63
+
+# Fields of ModelVersion, anything else on a version model is a copy
+VERSION_FIELDS = {
+    "object",
+    "version",
+    "last_modified_txid",
+    "last_modified_at",
+    "deleted",
+}
+
 CREATE_INSERT_TRIGGER_FUNCTION_SQL = """\
 CREATE OR REPLACE FUNCTION insert_{version_table}() RETURNS TRIGGER AS $$
 BEGIN
-    INSERT INTO {version_table} (object_id, last_modified_txid)
-    SELECT id, txid_current() FROM inserted;
+    INSERT INTO {version_table} (object_id, last_modified_txid{copy_columns})
+    SELECT id, txid_current(){copy_columns} FROM inserted{revive};
     RETURN NULL;
 END; $$
 LANGUAGE plpgsql;
@@ -20,14 +36,122 @@ BEGIN
         last_modified_txid = txid_current(),
         last_modified_at = now()
     FROM
-        updated
+        updated{join_previous}
     WHERE {version_table}.object_id = updated.id
+      AND last_modified_txid != txid_current(){changed};{update_copies}
+    RETURN NULL;
+END; $$
+LANGUAGE plpgsql;
+"""
+
+# With deletes tracked, an object inserted with the id of a deleted one
+# replaces its tombstone
+REVIVE_TOMBSTONE_SQL = """
+    ON CONFLICT (object_id) DO UPDATE SET
+        version = {version_table}.version + 1,
+        last_modified_txid = EXCLUDED.last_modified_txid,
+        last_modified_at = now(),
+        deleted = false{revive_copies}"""
+
+# Deleted objects leave their version info behind as a tombstone
+CREATE_DELETE_TRIGGER_FUNCTION_SQL = """\
+CREATE OR REPLACE FUNCTION delete_{version_table}() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE {version_table} SET
+        version = CASE
+            WHEN last_modified_txid = txid_current() THEN version
+            ELSE version + 1
+        END,
+        last_modified_txid = txid_current(),
+        last_modified_at = now(),
+        deleted = true
+    FROM
+        removed
+    WHERE {version_table}.object_id = removed.id;
+    RETURN NULL;
+END; $$
+LANGUAGE plpgsql;
+"""
+
+# In deferred mode, statements only collect the ids of the objects they
+# change into a temporary table, created on first use in each session. The
+# first statement in a transaction also inserts into a second temporary
+# table, whose deferred constraint trigger bumps the versions of all the
+# collected objects at once when the transaction commits.
+CREATE_DEFERRED_UPDATE_TRIGGER_FUNCTION_SQL = """\
+CREATE OR REPLACE FUNCTION update_{version_table}() RETURNS TRIGGER AS $$
+BEGIN
+    IF to_regclass('pg_temp.{changed_table}') IS NULL THEN
+        CREATE TEMPORARY TABLE {changed_table} (
+            object_id bigint PRIMARY KEY
+        );
+        CREATE TEMPORARY TABLE {pending_table} (
+            pending boolean PRIMARY KEY
+        );
+        CREATE CONSTRAINT TRIGGER apply_version_info
+            AFTER INSERT ON pg_temp.{pending_table}
+            DEFERRABLE INITIALLY DEFERRED
+            FOR EACH ROW
+            EXECUTE PROCEDURE {apply_function}();
+    END IF;
+
+    INSERT INTO pg_temp.{changed_table} (object_id)
+    SELECT updated.id
+    FROM
+        updated{join_previous}
+    WHERE true{changed}
+    ON CONFLICT DO NOTHING;
+
+    INSERT INTO pg_temp.{pending_table} VALUES (true)
+    ON CONFLICT DO NOTHING;{update_copies}
+    RETURN NULL;
+END; $$
+LANGUAGE plpgsql;
+"""
+
+# The collected ids are cleared here rather than at commit, so statements
+# after SET CONSTRAINTS ... IMMEDIATE are collected again
+CREATE_APPLY_TRIGGER_FUNCTION_SQL = """\
+CREATE OR REPLACE FUNCTION {apply_function}() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE {version_table} SET
+        version = version + 1,
+        last_modified_txid = txid_current(),
+        last_modified_at = now()
+    FROM
+        pg_temp.{changed_table} AS changed
+    WHERE {version_table}.object_id = changed.object_id
       AND last_modified_txid != txid_current();
+
+    DELETE FROM pg_temp.{changed_table};
+    DELETE FROM pg_temp.{pending_table};
     RETURN NULL;
 END; $$
 LANGUAGE plpgsql;
 """
 
+# Copied columns are kept up to date separately, as they may change again
+# later in a transaction that has already bumped the version
+UPDATE_COPIES_SQL = """
+    UPDATE {version_table} SET ({columns}) = ROW({updated_columns})
+    FROM
+        updated
+    WHERE {version_table}.object_id = updated.id
+      AND ({version_columns}) IS DISTINCT FROM ({updated_columns});"""
+
+# With watched columns, or only_if_changed, the rows before the update are
+# compared with those after, so updates that leave them as they were don't
+# bump the version
+JOIN_PREVIOUS_SQL = """
+    JOIN
+        previous ON previous.id = updated.id"""
+
+CHANGED_COLUMNS_SQL = """
+      AND ({previous_columns}) IS DISTINCT FROM ({updated_columns})"""
+
+CHANGED_ROW_SQL = """
+      AND previous IS DISTINCT FROM updated"""
+
 CREATE_INSERT_TRIGGER_SQL = """\
 CREATE OR REPLACE TRIGGER insert_version_info
     AFTER INSERT ON {tracked_table}
@@ -39,11 +163,37 @@ CREATE OR REPLACE TRIGGER insert_version_info
 CREATE_UPDATE_TRIGGER_SQL = """\
 CREATE OR REPLACE TRIGGER update_version_info
     AFTER UPDATE ON {tracked_table}
-    REFERENCING OLD TABLE AS updated
+    REFERENCING {previous}NEW TABLE AS updated
     FOR EACH STATEMENT
     EXECUTE PROCEDURE update_{version_table}();
 """
 
+CREATE_DELETE_TRIGGER_SQL = """\
+CREATE OR REPLACE TRIGGER delete_version_info
+    AFTER DELETE ON {tracked_table}
+    REFERENCING OLD TABLE AS removed
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE delete_{version_table}();
+"""
+
+# Notifications with the same channel and payload are only delivered once per
+# transaction, so this wakes up listeners once per committed transaction
+CREATE_NOTIFY_TRIGGER_FUNCTION_SQL = """\
+CREATE OR REPLACE FUNCTION notify_{version_table}() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('{version_table}', '');
+    RETURN NULL;
+END; $$
+LANGUAGE plpgsql;
+"""
+
+CREATE_NOTIFY_TRIGGER_SQL = """\
+CREATE OR REPLACE TRIGGER notify_version_info
+    AFTER INSERT OR UPDATE ON {version_table}
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE notify_{version_table}();
+"""
+
 DROP_INSERT_TRIGGER_FUNCTION_SQL = """\
 DROP FUNCTION IF EXISTS update_{version_table}();
 """
@@ -52,6 +202,20 @@ DROP_UPDATE_TRIGGER_FUNCTION_SQL = """\
 DROP FUNCTION IF EXISTS update_{version_table}();
 """
 
+DROP_DELETE_TRIGGER_FUNCTION_SQL = """\
+DROP FUNCTION IF EXISTS delete_{version_table}();
+"""
+
+# Sessions that collected changes have constraint triggers on their own
+# temporary tables calling this function, which are dropped along with it
+DROP_APPLY_TRIGGER_FUNCTION_SQL = """\
+DROP FUNCTION IF EXISTS {apply_function}() CASCADE;
+"""
+
+DROP_NOTIFY_TRIGGER_FUNCTION_SQL = """\
+DROP FUNCTION IF EXISTS notify_{version_table}();
+"""
+
 DROP_INSERT_TRIGGER_SQL = """\
 DROP TRIGGER IF EXISTS insert_version_info ON {tracked_table};
 """
@@ -60,29 +224,240 @@ DROP_UPDATE_TRIGGER_SQL = """\
 DROP TRIGGER IF EXISTS update_version_info ON {tracked_table};
 """
 
+DROP_DELETE_TRIGGER_SQL = """\
+DROP TRIGGER IF EXISTS delete_version_info ON {tracked_table};
+"""
 
-def _add_trigger_sql(tracked_table: str, version_table: str) -> list[str]:
+DROP_NOTIFY_TRIGGER_SQL = """\
+DROP TRIGGER IF EXISTS notify_version_info ON {version_table};
+"""
 
-    context = {"version_table": version_table, "tracked_table": tracked_table}
 
-    # TODO: Parametrize pk column name
+def _copied_columns(version_model: type[models.Model]) -> list[str]:
+    """
+    Get the columns of the version model that are copied from the tracked
+    model, i.e. everything that isn't part of ModelVersion.
+    """
+
     return [
-        CREATE_INSERT_TRIGGER_FUNCTION_SQL.format(**context),
-        CREATE_UPDATE_TRIGGER_FUNCTION_SQL.format(**context),
+        cast(str, field.column)
+        for field in version_model._meta.concrete_fields
+        if field.name not in VERSION_FIELDS
+    ]
+
+
+def _update_copies_sql(version_table: str, copy_columns: Sequence[str]) -> str:
+    if not copy_columns:
+        return ""
+
+    return UPDATE_COPIES_SQL.format(
+        version_table=version_table,
+        columns=", ".join(copy_columns),
+        version_columns=", ".join(f"{version_table}.{c}" for c in copy_columns),
+        updated_columns=", ".join(f"updated.{c}" for c in copy_columns),
+    )
+
+
+def _watched_columns(tracked_model: type[models.Model]) -> list[str] | None:
+    """
+    Get the columns whose changes bump the version, as set by
+    AddVersionTracking in the model's state. None means any update does, and
+    an empty list means any update that changes the row does.
+    """
+
+    meta = tracked_model._meta
+    fields = getattr(meta, "track_version_watched_fields", None)
+    if fields:
+        return [
+            cast(str, cast("models.Field[Any, Any]", meta.get_field(name)).column)
+            for name in fields
+        ]
+    if getattr(meta, "track_version_only_if_changed", False):
+        return []
+    return None
+
+
+def _tracks_deletes(
+    tracked_model: type[models.Model], version_model: type[models.Model]
+) -> bool:
+    """
+    Whether deletes are tracked, as set by AddVersionTracking in the model's
+    state. The version model must have somewhere to mark tombstones.
+    """
+
+    if not getattr(tracked_model._meta, "track_version_deletes", False):
+        return False
+    if not any(f.name == "deleted" for f in version_model._meta.concrete_fields):
+        raise ValueError(
+            f"{version_model.__name__} has no deleted field to track deletes, "
+            "see tracked(track_deletes=True)"
+        )
+    return True
+
+
+def _changed_sql(watched_columns: Sequence[str] | None) -> str:
+    if watched_columns is None:
+        return ""
+    if not watched_columns:
+        return CHANGED_ROW_SQL
+
+    return CHANGED_COLUMNS_SQL.format(
+        previous_columns=", ".join(f"previous.{c}" for c in watched_columns),
+        updated_columns=", ".join(f"updated.{c}" for c in watched_columns),
+    )
+
+
+def _deferred_names(version_table: str) -> dict[str, str]:
+    """
+    Get the names of the temporary tables and function of deferred mode.
+    Long names are shortened with a hash, so they stay distinct.
+    """
+
+    return {
+        name: truncate_name(f"{prefix}{version_table}{suffix}", MAX_NAME_LENGTH)
+        for name, prefix, suffix in [
+            ("changed_table", "", "_changed"),
+            ("pending_table", "", "_pending"),
+            ("apply_function", "apply_", ""),
+        ]
+    }
+
+
+def _add_trigger_sql(
+    tracked_table: str,
+    version_table: str,
+    *,
+    notify: bool = False,
+    copy_columns: Sequence[str] = (),
+    watched_columns: Sequence[str] | None = None,
+    deferred: bool = False,
+    track_deletes: bool = False,
+) -> list[str]:
+    """
+    Get the queries adding the tracking triggers. With watched_columns, only
+    updates changing one of them bump the version, and with an empty list
+    only updates changing any column do. With deferred, versions are bumped
+    once per transaction when it commits. With track_deletes, deletes leave
+    tombstones, and the version table must have a deleted column.
+    """
+
+    if watched_columns:
+        # An object whose copied fields change moves between the streams
+        # filtered on them, which must see it
+        watched_columns = [
+            *watched_columns,
+            *(column for column in copy_columns if column not in watched_columns),
+        ]
+
+    compare = watched_columns is not None
+    context = {
+        "version_table": version_table,
+        "tracked_table": tracked_table,
+        "copy_columns": "".join(f", {column}" for column in copy_columns),
+        "update_copies": _update_copies_sql(version_table, copy_columns),
+        "previous": "OLD TABLE AS previous " if compare else "",
+        "join_previous": JOIN_PREVIOUS_SQL if compare else "",
+        "changed": _changed_sql(watched_columns),
+        "revive": "",
+        **_deferred_names(version_table),
+    }
+    if track_deletes:
+        context["revive"] = REVIVE_TOMBSTONE_SQL.format(
+            version_table=version_table,
+            revive_copies="".join(
+                f",\n        {column} = EXCLUDED.{column}" for column in copy_columns
+            ),
+        )
+
+    # TODO: Parametrize pk column name
+    if deferred:
+        queries = [
+            CREATE_INSERT_TRIGGER_FUNCTION_SQL.format(**context),
+            CREATE_APPLY_TRIGGER_FUNCTION_SQL.format(**context),
+            CREATE_DEFERRED_UPDATE_TRIGGER_FUNCTION_SQL.format(**context),
+        ]
+    else:
+        queries = [
+            CREATE_INSERT_TRIGGER_FUNCTION_SQL.format(**context),
+            CREATE_UPDATE_TRIGGER_FUNCTION_SQL.format(**context),
+        ]
+    queries += [
         CREATE_INSERT_TRIGGER_SQL.format(**context),
         CREATE_UPDATE_TRIGGER_SQL.format(**context),
     ]
 
+    if track_deletes:
+        queries += [
+            CREATE_DELETE_TRIGGER_FUNCTION_SQL.format(**context),
+            CREATE_DELETE_TRIGGER_SQL.format(**context),
+        ]
+    else:
+        queries += [
+            DROP_DELETE_TRIGGER_SQL.format(**context),
+            DROP_DELETE_TRIGGER_FUNCTION_SQL.format(**context),
+        ]
+
+    if notify:
+        queries += [
+            CREATE_NOTIFY_TRIGGER_FUNCTION_SQL.format(**context),
+            CREATE_NOTIFY_TRIGGER_SQL.format(**context),
+        ]
+
+    return queries
+
+
+def _state_trigger_sql(
+    tracked_model: type[models.Model], version_model: type[models.Model]
+) -> list[str]:
+    """
+    Get the queries adding the tracking triggers with the options set by
+    AddVersionTracking in the state the models are from
+    """
 
-def _drop_trigger_sql(tracked_table: str, version_table: str) -> list[str]:
+    return _add_trigger_sql(
+        tracked_model._meta.db_table,
+        version_model._meta.db_table,
+        notify=getattr(tracked_model._meta, "track_version_notify", False),
+        copy_columns=_copied_columns(version_model),
+        watched_columns=_watched_columns(tracked_model),
+        deferred=getattr(tracked_model._meta, "track_version_deferred", False),
+        track_deletes=_tracks_deletes(tracked_model, version_model),
+    )
 
-    context = {"version_table": version_table, "tracked_table": tracked_table}
 
-    return [
+def _drop_trigger_sql(
+    tracked_table: str, version_table: str, *, notify: bool = False
+) -> list[str]:
+
+    context = {
+        "version_table": version_table,
+        "tracked_table": tracked_table,
+        **_deferred_names(version_table),
+    }
+
+    queries = [
         DROP_INSERT_TRIGGER_SQL.format(**context),
         DROP_UPDATE_TRIGGER_SQL.format(**context),
+        DROP_DELETE_TRIGGER_SQL.format(**context),
         DROP_INSERT_TRIGGER_FUNCTION_SQL.format(**context),
         DROP_UPDATE_TRIGGER_FUNCTION_SQL.format(**context),
+        DROP_DELETE_TRIGGER_FUNCTION_SQL.format(**context),
+        DROP_APPLY_TRIGGER_FUNCTION_SQL.format(**context),
+    ]
+
+    if notify:
+        queries += _drop_notify_sql(version_table)
+
+    return queries
+
+
+def _drop_notify_sql(version_table: str) -> list[str]:
+
+    context = {"version_table": version_table}
+
+    return [
+        DROP_NOTIFY_TRIGGER_SQL.format(**context),
+        DROP_NOTIFY_TRIGGER_FUNCTION_SQL.format(**context),
     ]
 
 
@@ -90,18 +465,70 @@ class AddVersionTracking(Operation):
     """
     This operation adds a trigger that updates the version model associated
     with the specified model class.
+
+    With notify=True a notification is also sent on a channel named after the
+    version table whenever a transaction changes it, which can be used to
+    wait for changes instead of polling.
+
+    By default every update bumps the version, even one that leaves the row
+    as it was, e.g. save() without update_fields. With watched_fields only
+    updates changing one of those fields, or a copied field, do, and with
+    only_if_changed=True only updates changing any column do. The rows
+    before and after the
+    update are compared with IS DISTINCT FROM, so with only_if_changed every
+    column must have an equality operator, which json doesn't. To change
+    the watched fields, or before renaming or removing one, add the
+    operation again with the new ones.
+
+    With deferred=True, updates only note which objects they change, and
+    their versions are bumped once when the transaction commits, which
+    saves work in transactions running many updates. The changes are noted
+    in temporary tables, so this doesn't work with two-phase commit, and
+    versions aren't bumped in transactions that never commit, like those of
+    TestCase.
+
+    With track_deletes=True, deleting an object marks its version info as a
+    tombstone and bumps its version, rather than deleting it. The version
+    model must be made with tracked(track_deletes=True).
     """
 
     reduces_to_sql = True
     reversible = True
 
-    def __init__(self, tracked_model: str, version_model: str) -> None:
+    def __init__(
+        self,
+        tracked_model: str,
+        version_model: str,
+        notify: bool = False,
+        watched_fields: Sequence[str] | None = None,
+        only_if_changed: bool = False,
+        deferred: bool = False,
+        track_deletes: bool = False,
+    ) -> None:
         self.tracked_model = tracked_model
         self.version_model = version_model
+        self.notify = notify
+        self.watched_fields = watched_fields
+        self.only_if_changed = only_if_changed
+        self.deferred = deferred
+        self.track_deletes = track_deletes
 
     def state_forwards(self, app_label: str, state: ProjectState) -> None:
+        # Kept in the state so that other operations replacing the triggers,
+        # like AddCopiedField, keep the same options
         state.alter_model_options(
-            app_label, self.tracked_model.lower(), {"track_version": True}
+            app_label,
+            self.tracked_model.lower(),
+            {
+                "track_version": True,
+                "track_version_notify": self.notify,
+                "track_version_watched_fields": (
+                    tuple(self.watched_fields) if self.watched_fields else None
+                ),
+                "track_version_only_if_changed": self.only_if_changed,
+                "track_version_deferred": self.deferred,
+                "track_version_deletes": self.track_deletes,
+            },
         )
 
     def database_forwards(
@@ -111,16 +538,7 @@ class AddVersionTracking(Operation):
         from_state: ProjectState,
         to_state: ProjectState,
     ) -> None:
-
-        tracked_model = from_state.apps.get_model(app_label, self.tracked_model)
-        version_model = from_state.apps.get_model(app_label, self.version_model)
-
-        tracked_table = tracked_model._meta.db_table
-        version_table = version_model._meta.db_table
-
-        queries = _add_trigger_sql(tracked_table, version_table)
-
-        for query in queries:
+        for query in self._trigger_sql(app_label, from_state, to_state):
             schema_editor.execute(query)
 
     def database_backwards(
@@ -130,17 +548,38 @@ class AddVersionTracking(Operation):
         from_state: ProjectState,
         to_state: ProjectState,
     ) -> None:
-        tracked_model = from_state.apps.get_model(app_label, self.tracked_model)
-        version_model = from_state.apps.get_model(app_label, self.version_model)
-
-        tracked_table = tracked_model._meta.db_table
-        version_table = version_model._meta.db_table
-
-        queries = _drop_trigger_sql(tracked_table, version_table)
-
-        for query in queries:
+        for query in self._trigger_sql(app_label, from_state, to_state):
             schema_editor.execute(query)
 
+    def _trigger_sql(
+        self, app_label: str, old_state: ProjectState, new_state: ProjectState
+    ) -> list[str]:
+        """
+        Get the queries replacing the triggers of the old state with those of
+        the new one, which has no tracking when reverting the first operation
+        """
+
+        old_tracked = old_state.apps.get_model(app_label, self.tracked_model)
+        tracked_model = new_state.apps.get_model(app_label, self.tracked_model)
+        old_notify = getattr(old_tracked._meta, "track_version_notify", False)
+
+        if not getattr(tracked_model._meta, "track_version", False):
+            old_version = old_state.apps.get_model(app_label, self.version_model)
+            return _drop_trigger_sql(
+                old_tracked._meta.db_table,
+                old_version._meta.db_table,
+                notify=old_notify,
+            )
+
+        version_model = new_state.apps.get_model(app_label, self.version_model)
+        queries = _state_trigger_sql(tracked_model, version_model)
+        if old_notify and not getattr(
+            tracked_model._meta, "track_version_notify", False
+        ):
+            queries += _drop_notify_sql(version_model._meta.db_table)
+
+        return queries
+
     def describe(self) -> str:
         return f"Add version tracking trigger to {self.tracked_model}"
 
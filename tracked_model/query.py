@@ -0,0 +1,347 @@
+import itertools
+import re
+from abc import ABC, abstractmethod
+from typing import Any, Iterator, Sequence
+from weakref import WeakKeyDictionary
+
+from django.db import connections
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.backends.utils import CursorWrapper, names_digest
+from django.db.models.expressions import BaseExpression, OrderBy, Ref
+from django.db.models.sql import Query
+from django.db.models.sql.compiler import SQLCompiler, cursor_iter
+from django.db.models.sql.constants import CURSOR, GET_ITERATOR_CHUNK_SIZE, MULTI
+
+from .cursor import Snapshot
+
+SNAPSHOT_SQL = """\
+SELECT
+    (SELECT COALESCE(ARRAY_AGG(txid), ARRAY[]::bigint[]) FROM
+        (SELECT txid_offset() + txid_snapshot_xip(txid_current_snapshot())) AS _(txid)
+    ) AS xip_list,
+    (SELECT txid_offset() + txid_snapshot_xmin(txid_current_snapshot())) AS xmin,
+    (SELECT txid_offset() + txid_snapshot_xmax(txid_current_snapshot())) AS xmax
+"""
+
+# The snapshot is joined onto the query, so that we get exactly one row back
+# even if there are no changes. A single statement always sees one snapshot,
+# so the rows are guaranteed to be consistent with the snapshot we return.
+SNAPSHOT_QUERY_SQL = """\
+WITH _snapshot AS ({snapshot_sql})
+SELECT _snapshot.xip_list, _snapshot.xmin, _snapshot.xmax, _changes.*
+FROM _snapshot LEFT JOIN ({query_sql}) AS _changes ON true
+"""
+
+SNAPSHOT_COLUMNS = 3
+
+# The changes for each group of cursors are picked in the _groups CTE, and
+# joined back onto the queryset. An object can be in the batch of several
+# groups, in which case it's returned once for each. The ordering of a
+# subquery isn't kept by the query around it, so the queryset selects what
+# it's ordered by as well, and that's repeated within each group.
+CURSORS_QUERY_SQL = """\
+WITH _groups AS ({groups_sql})
+SELECT _groups._group, _changes.*
+FROM _groups JOIN ({query_sql}) AS _changes
+    ON _changes._object_id = _groups._object_id
+ORDER BY {order_by_sql}
+"""
+
+CURSORS_ORDER_COLUMN = "_order_{}"
+
+CURSORS_GROUPS_SQL = "SELECT _object_id FROM _groups"
+
+PREPARED_STATEMENT_PREFIX = "tracked_model_"
+
+# The statements prepared on each connection, by the DB-API connection so a
+# reconnect starts over
+_prepared_statements: "WeakKeyDictionary[Any, set[str]]" = WeakKeyDictionary()
+
+
+def get_snapshot(cursor: CursorWrapper) -> Snapshot:
+    """
+    Get the snapshot of the current transaction
+    """
+
+    cursor.execute(SNAPSHOT_SQL)
+    xip_list, xmin, xmax = cursor.fetchone()
+    return Snapshot(xip_list=xip_list, xmin=xmin, xmax=xmax)
+
+
+class PrefixedQuery(Query, ABC):
+    """
+    A query whose SQL is wrapped so that some extra columns come before the
+    queryset's own columns. The compiler pops them off each row and hands
+    them to take_prefix before the rows are turned into objects.
+
+    Subclasses must implement wrap_sql and take_prefix.
+
+    If rows is set, those are used instead of executing the query. This lets
+    the SQL be executed elsewhere, e.g. over an async connection, while the
+    rows are still turned into objects by the queryset.
+    """
+
+    prefix_columns = 0
+    rows: list[Sequence[Any]] | None = None
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        # These queries are made by swapping the class of a queryset's query,
+        # which skips the check ABC makes on instantiation
+        missing = sorted(
+            name
+            for name in PrefixedQuery.__abstractmethods__
+            if getattr(getattr(cls, name), "__isabstractmethod__", False)
+        )
+        if missing:
+            raise TypeError(f"{cls.__name__} must implement {', '.join(missing)}")
+
+    @abstractmethod
+    def wrap_sql(self, sql: str) -> str: ...
+
+    def wrap_params(self, params: tuple[Any, ...]) -> tuple[Any, ...]:
+        return params
+
+    @abstractmethod
+    def take_prefix(self, prefix: Sequence[Any]) -> None: ...
+
+    def get_compiler(
+        self,
+        using: str | None = None,
+        connection: BaseDatabaseWrapper | None = None,
+        elide_empty: bool = True,
+    ) -> "PrefixedSQLCompiler":
+        if using is None and connection is None:
+            raise ValueError("Need either using or connection")
+        if using:
+            connection = connections[using]
+        assert connection is not None
+        return PrefixedSQLCompiler(self, connection, using, elide_empty)
+
+
+class SnapshotQuery(PrefixedQuery):
+    """
+    A query that fetches the current snapshot in the same statement as the
+    rows. After the query has been evaluated the snapshot is available as
+    the snapshot attribute.
+    """
+
+    prefix_columns = SNAPSHOT_COLUMNS
+    snapshot: Snapshot | None = None
+
+    def wrap_sql(self, sql: str) -> str:
+        return SNAPSHOT_QUERY_SQL.format(snapshot_sql=SNAPSHOT_SQL, query_sql=sql)
+
+    def take_prefix(self, prefix: Sequence[Any]) -> None:
+        if self.snapshot is None:
+            xip_list, xmin, xmax = prefix
+            self.snapshot = Snapshot(xip_list=xip_list, xmin=xmin, xmax=xmax)
+
+
+class CursorsQuery(PrefixedQuery):
+    """
+    A query that fetches the changes for several groups of cursors at once.
+    The groups query must select the _group and _object_id of the changes
+    in each group, and the query itself must be filtered to those objects
+    with CURSORS_GROUPS_SQL. The group of each row is collected in row_groups.
+    """
+
+    prefix_columns = 1
+    groups_sql: str = ""
+    groups_params: tuple[Any, ...] = ()
+    row_groups: list[int]
+    # Set by the compiler, from the queryset's ordering
+    order_by_sql: Sequence[str] = ()
+
+    def get_compiler(
+        self,
+        using: str | None = None,
+        connection: BaseDatabaseWrapper | None = None,
+        elide_empty: bool = True,
+    ) -> "CursorsSQLCompiler":
+        compiler = super().get_compiler(using, connection, elide_empty)
+        return CursorsSQLCompiler(self, compiler.connection, using, elide_empty)
+
+    def wrap_sql(self, sql: str) -> str:
+        return CURSORS_QUERY_SQL.format(
+            groups_sql=self.groups_sql,
+            query_sql=sql,
+            order_by_sql=", ".join(["_groups._group", *self.order_by_sql]),
+        )
+
+    def wrap_params(self, params: tuple[Any, ...]) -> tuple[Any, ...]:
+        return (*self.groups_params, *params)
+
+    def take_prefix(self, prefix: Sequence[Any]) -> None:
+        self.row_groups.append(prefix[0])
+
+
+class PrefixedSQLCompiler(SQLCompiler):
+    query: PrefixedQuery
+
+    def as_sql(
+        self, with_limits: bool = True, with_col_aliases: bool = False
+    ) -> tuple[str, tuple[Any, ...]]:
+        sql, params = super().as_sql(
+            with_limits=with_limits, with_col_aliases=with_col_aliases
+        )
+        return self.query.wrap_sql(sql), self.query.wrap_params(params)
+
+    def execute_sql(  # type: ignore[override]
+        self,
+        result_type: str | None = MULTI,
+        chunked_fetch: bool = False,
+        chunk_size: int = GET_ITERATOR_CHUNK_SIZE,
+    ) -> Iterator[list[Sequence[Any]]]:
+        if result_type != MULTI:
+            raise NotImplementedError("Prefixed queries can only fetch rows")
+
+        if self.query.rows is not None:
+            self.pre_sql_setup()
+            return self.split_prefix(iter([self.query.rows]))
+
+        cursor = super().execute_sql(
+            CURSOR, chunked_fetch=chunked_fetch, chunk_size=chunk_size
+        )
+        if cursor is None:
+            return iter([])
+
+        # We trim the rows ourselves, as the prefix columns come first
+        chunks = cursor_iter(
+            cursor, self.connection.features.empty_fetchmany_value, None, chunk_size
+        )
+        if not chunked_fetch or not self.connection.features.can_use_chunked_reads:
+            chunks = iter(list(chunks))
+
+        return self.split_prefix(chunks)
+
+    def split_prefix(
+        self, chunks: Iterator[list[Sequence[Any]]]
+    ) -> Iterator[list[Sequence[Any]]]:
+        """
+        Pop the prefix columns off the rows, and drop rows without any data,
+        like the row we get back from an outer join when there are no changes.
+        """
+
+        assert self.col_count is not None
+        start = self.query.prefix_columns
+        end = start + self.col_count
+        take_prefix = self.query.take_prefix
+        for rows in chunks:
+            data = []
+            for row in rows:
+                take_prefix(row[:start])
+                if any(value is not None for value in row[start:]):
+                    data.append(row[start:end])
+            yield data
+
+
+class CursorsSQLCompiler(PrefixedSQLCompiler):
+    query: CursorsQuery
+
+    def setup_query(self, with_col_aliases: bool = False) -> None:
+        super().setup_query(with_col_aliases=with_col_aliases)
+
+        # Select what the rows are ordered by after the queryset's own
+        # columns, which are all that col_count covers, so the rows can be
+        # ordered the same way around the query
+        order_by_sql = []
+        for i, (order_by, _) in enumerate(self.get_order_by()):
+            assert isinstance(order_by, OrderBy)
+            expr = order_by.expression
+            if isinstance(expr, Ref):
+                # Aliases of the select list can't be used within it
+                (expr,) = expr.get_source_expressions()
+            assert isinstance(expr, BaseExpression)
+            alias = CURSORS_ORDER_COLUMN.format(i)
+            sql, params = expr.select_format(self, *self.compile(expr))
+            self.select.append((expr, (sql, params), alias))
+
+            direction = "DESC" if order_by.descending else "ASC"
+            if order_by.nulls_first:
+                direction += " NULLS FIRST"
+            elif order_by.nulls_last:
+                direction += " NULLS LAST"
+            order_by_sql.append(f"_changes.{alias} {direction}")
+
+        self.query.order_by_sql = order_by_sql
+
+
+def _numbered_placeholders(sql: str) -> str:
+    counter = itertools.count(1)
+    return re.sub(
+        r"%[%s]", lambda m: "%" if m.group() == "%%" else f"${next(counter)}", sql
+    )
+
+
+def prepare_statement(
+    connection: BaseDatabaseWrapper, sql: str, params: Sequence[Any]
+) -> str:
+    """
+    Prepare the SQL as a named statement on the connection, unless it already
+    is, and return the SQL executing it with the params, which takes no
+    parameters itself. Postgres then plans the statement once for the
+    session, rather than on every execution.
+    """
+
+    name = PREPARED_STATEMENT_PREFIX + names_digest(sql, length=16)
+
+    connection.ensure_connection()
+    prepared = _prepared_statements.setdefault(connection.connection, set())
+    if name not in prepared:
+        with connection.cursor() as cursor:
+            cursor.execute(f"PREPARE {name} AS {_numbered_placeholders(sql)}")
+        prepared.add(name)
+
+    if not params:
+        return f"EXECUTE {name}"
+    # EXECUTE is a utility statement, which can't take parameters, so with
+    # server side binding they must be bound on the client. The result is
+    # run with no parameters left, but with its percent signs escaped all
+    # the same.
+    sql = connection.ops.compose_sql(  # type: ignore[attr-defined]
+        f"EXECUTE {name}({', '.join(['%s'] * len(params))})", params
+    )
+    return sql.replace("%", "%%")
+
+
+class CompiledQuery(Query):
+    """
+    A query that runs SQL compiled earlier, e.g. for another queryset of the
+    same shape. The query itself is only used to turn the rows into objects,
+    so it must select the same columns as the SQL. With prepare set, the SQL
+    is run as a prepared statement.
+    """
+
+    compiled_sql: str = ""
+    compiled_params: tuple[Any, ...] = ()
+    prepare: bool = False
+
+    def get_compiler(
+        self,
+        using: str | None = None,
+        connection: BaseDatabaseWrapper | None = None,
+        elide_empty: bool = True,
+    ) -> "CompiledSQLCompiler":
+        if using is None and connection is None:
+            raise ValueError("Need either using or connection")
+        if using:
+            connection = connections[using]
+        assert connection is not None
+        return CompiledSQLCompiler(self, connection, using, elide_empty)
+
+
+class CompiledSQLCompiler(SQLCompiler):
+    query: CompiledQuery
+
+    def as_sql(
+        self, with_limits: bool = True, with_col_aliases: bool = False
+    ) -> tuple[str, tuple[Any, ...]]:
+        # This works out the columns, which we still need to read the rows
+        self.pre_sql_setup(with_col_aliases=with_col_aliases)
+
+        sql, params = self.query.compiled_sql, self.query.compiled_params
+        if self.query.prepare:
+            sql = prepare_statement(self.connection, sql, params)
+            params = ()
+        return sql, params
@@ -0,0 +1,64 @@
+"""
+Deletes of models tracked with tracked(track_deletes=True) leave their
+version info behind as a tombstone, so they're streamed like any other
+change. Tombstones are kept until they're purged, which should be once every
+consumer has had time to see them.
+"""
+
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.utils import timezone
+
+DEFAULT_BATCH_SIZE = 10_000
+
+
+@dataclass(frozen=True, slots=True)
+class DeletedObject:
+    """
+    Stands in for a deleted object in the changes returned by
+    get_changed_objects(include_deleted=True)
+    """
+
+    pk: int
+
+
+def purge_tombstones(
+    tracked_model: type[models.Model],
+    *,
+    older_than: timedelta,
+    using: str = DEFAULT_DB_ALIAS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """
+    Delete the tombstones of objects deleted more than older_than ago, in
+    batches of batch_size that are each committed, and return how many were
+    deleted. A consumer whose cursor is older than that misses the deletes
+    whose tombstones were purged, so keep them for longer than any consumer
+    may fall behind.
+    """
+
+    if batch_size < 1:
+        raise ValueError("The batch size must be at least 1")
+
+    version_model = tracked_model._meta.get_field("version_info").related_model
+    assert isinstance(version_model, type)
+    if not getattr(version_model, "track_deletes", False):
+        raise ValueError(f"{tracked_model.__name__} doesn't track deletes")
+
+    # Filtered again outside the subquery, in case an object is inserted
+    # with the id of a deleted one meanwhile
+    tombstones = version_model._default_manager.using(using).filter(
+        deleted=True, last_modified_at__lt=timezone.now() - older_than
+    )
+
+    purged = 0
+    while True:
+        with transaction.atomic(using=using):
+            deleted, _ = tombstones.filter(
+                pk__in=tombstones.values("pk")[:batch_size]
+            ).delete()
+        purged += deleted
+        if deleted < batch_size:
+            return purged
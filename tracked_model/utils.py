@@ -1,47 +1,191 @@
-from typing import TYPE_CHECKING, Any, Callable, TypeVar, cast, overload
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Generic,
+    Hashable,
+    Iterator,
+    Literal,
+    Mapping,
+    Sequence,
+    TypeVar,
+    cast,
+    overload,
+)
 
-from django.db import connections, models, transaction
-from django.db.models import F
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.backends.utils import names_digest
+from django.db.models import F, Q, Value
+from django.db.models.expressions import RawSQL
 
+from .batching import AdaptiveLimit
 from .cursor import Cursor, Snapshot
-from .expressions import ChangedObjectsSubquery
+from .expressions import ChangedObjectsSubquery, CursorSlot, PartitionKey, cursor_params
+from .query import (
+    CURSORS_GROUPS_SQL,
+    CompiledQuery,
+    CursorsQuery,
+    SnapshotQuery,
+    get_snapshot,
+)
+from .tombstones import DeletedObject
 
 if TYPE_CHECKING:
     from django.db.models.query import _QuerySet
 
     from .models import ModelVersion
 
+K = TypeVar("K")
 T = TypeVar("T")
 M = TypeVar("M", bound=models.Model)
 
+# How many compiled change queries to keep, see _compile_changes
+COMPILED_CACHE_SIZE = 256
+
+_compiled_changes: OrderedDict[Hashable, tuple[str, tuple[Any, ...]]] = OrderedDict()
+_compiled_changes_lock = threading.Lock()
+
+
+def _copy_field(field: Any) -> "models.Field[Any, Any]":
+    """
+    Make a field for the version model holding a copy of the given field.
+    Copies are nullable and unconstrained, so the triggers can keep them up
+    to date in any order.
+    """
+
+    if field.many_to_one or field.one_to_one:
+        return models.ForeignKey(
+            to=field.remote_field.model,
+            to_field=field.remote_field.field_name,
+            on_delete=models.DO_NOTHING,
+            db_constraint=False,
+            db_index=False,
+            related_name="+",
+            null=True,
+        )
+
+    if field.is_relation or not field.concrete:
+        raise ValueError(f"Can not copy {field.name} to the version model")
+
+    _, _, args, kwargs = field.deconstruct()
+    for key in ("primary_key", "unique", "db_index", "default", "db_default"):
+        kwargs.pop(key, None)
+    kwargs["null"] = True
+    return cast("models.Field[Any, Any]", field.__class__(*args, **kwargs))
+
 
 @overload
-def tracked(model_cls: None = ...) -> Callable[[type[M]], type[M]]: ...
+def tracked(
+    model_cls: None = ...,
+    *,
+    partitions: int | None = ...,
+    copy_fields: Sequence[str] = ...,
+    track_deletes: bool = ...,
+) -> Callable[[type[M]], type[M]]: ...
 
 
 @overload
-def tracked(model_cls: type[M]) -> type[M]: ...
+def tracked(
+    model_cls: type[M],
+    *,
+    partitions: int | None = ...,
+    copy_fields: Sequence[str] = ...,
+    track_deletes: bool = ...,
+) -> type[M]: ...
+
+
+def tracked(
+    model_cls: type[M] | None = None,
+    *,
+    partitions: int | None = None,
+    copy_fields: Sequence[str] = (),
+    track_deletes: bool = False,
+) -> Callable[[type[M]], type[M]] | type[M]:
+    """
+    Add a version model to track changes to the decorated model.
 
+    If you want to consume changes with several workers, set partitions to the
+    number of workers. This adds an index for get_changed_objects(...,
+    partition=(k, partitions)), so each worker's queries can use the index.
 
-def tracked(model_cls: type[M] | None = None) -> Callable[[type[M]], type[M]] | type[M]:
+    Fields listed in copy_fields, e.g. a tenant, are copied to the version
+    model by the triggers, with an index on (*copy_fields, last_modified_txid,
+    object_id). Filters on those fields are then applied to the version table
+    directly, so polling the changes for one tenant only reads that tenant's
+    changes.
+
+    With track_deletes, the version info of an object outlives it, as a
+    tombstone with a deleted flag, so deletes can be streamed as well, see
+    get_changed_objects(include_deleted=True). The version model then has no
+    foreign key constraint to the tracked model. Tombstones are kept until
+    they're purged, see tracked_model.tombstones.purge_tombstones.
+    """
 
     def decorator(model_cls: type[M]) -> type[M]:
 
         from .models import ModelVersion
 
         model_name = f"{model_cls.__name__}Version"
+        app_label = model_cls._meta.app_label
         fk_field: Any = models.OneToOneField(
             to=model_cls,
             related_name="version_info",
-            on_delete=models.CASCADE,
+            on_delete=models.DO_NOTHING if track_deletes else models.CASCADE,
+            db_constraint=not track_deletes,
             primary_key=True,
         )
 
-        version_model = type(
-            model_name,
-            (ModelVersion,),
-            {"object": fk_field, "__module__": model_cls.__module__},
-        )
+        attrs: dict[str, Any] = {
+            "object": fk_field,
+            "copy_fields": tuple(copy_fields),
+            "track_deletes": track_deletes,
+            "__module__": model_cls.__module__,
+        }
+        indexes = []
+        if track_deletes:
+            attrs["deleted"] = models.BooleanField(db_default=False)
+            # Tombstones are few, and only looked up by age when purging
+            digest = names_digest(app_label, model_name, "deleted", length=6)
+            indexes.append(
+                models.Index(
+                    fields=["last_modified_at"],
+                    condition=Q(deleted=True),
+                    name=f"{model_name.lower()[:14]}_{digest}_tomb",
+                )
+            )
+        if partitions is not None:
+            digest = names_digest(app_label, model_name, str(partitions), length=6)
+            indexes.append(
+                models.Index(
+                    PartitionKey("object_id", partitions=partitions),
+                    "last_modified_txid",
+                    "object_id",
+                    name=f"{model_name.lower()[:14]}_{digest}_part",
+                )
+            )
+        if copy_fields:
+            for name in copy_fields:
+                attrs[name] = _copy_field(model_cls._meta.get_field(name))
+            digest = names_digest(app_label, model_name, *copy_fields, length=6)
+            indexes.append(
+                models.Index(
+                    fields=[*copy_fields, "last_modified_txid", "object_id"],
+                    name=f"{model_name.lower()[:14]}_{digest}_copy",
+                )
+            )
+        if indexes:
+            attrs["Meta"] = type(
+                "Meta",
+                (ModelVersion.Meta,),
+                {"indexes": [*ModelVersion.Meta.indexes, *indexes]},
+            )
+
+        version_model = type(model_name, (ModelVersion,), attrs)
         model_cls.Version = version_model  # type: ignore[attr-defined]
 
         return model_cls
@@ -52,73 +196,722 @@ def tracked(model_cls: type[M] | None = None) -> Callable[[type[M]], type[M]] |
     return decorator(model_cls)
 
 
-_SNAPSHOT_SQL = """\
-SELECT
-    (SELECT COALESCE(ARRAY_AGG(txid), ARRAY[]::bigint[]) FROM
-        (SELECT txid_offset() + txid_snapshot_xip(txid_current_snapshot())) AS _(txid)
-    ) AS xip_list,
-    (SELECT txid_offset() + txid_snapshot_xmin(txid_current_snapshot())) AS xmin,
-    (SELECT txid_offset() + txid_snapshot_xmax(txid_current_snapshot())) AS xmax
-"""
+def _get_version_model(model: type[models.Model]) -> type["ModelVersion"]:
+    field = model._meta.get_field("version_info")
+    assert isinstance(field, models.OneToOneRel)
+    return cast("type[ModelVersion]", field.related_model)
 
 
-@transaction.atomic(durable=True)
+def _cursor_position(cursor: Cursor) -> tuple[Any, ...]:
+    """
+    A hashable key for the position of a cursor in the stream of changes
+    """
+
+    return (cursor.xid_at, cursor.xid_at_id, cursor.xid_next, tuple(cursor.xip_list))
+
+
+def _changed_objects_subquery(
+    queryset: "_QuerySet[M, T]",
+    *,
+    cursor: Cursor | None,
+    limit: int,
+    partition: tuple[int, int] | None = None,
+    include_deleted: bool = False,
+) -> ChangedObjectsSubquery:
+    return ChangedObjectsSubquery(
+        model_cls=_get_version_model(queryset.model),
+        limit=limit,
+        cursor=cursor,
+        partition=partition,
+        queryset=queryset if queryset.query.has_filters() else None,
+        include_deleted=include_deleted,
+    )
+
+
+def _annotate_changes(queryset: "_QuerySet[M, T]") -> "_QuerySet[M, T]":
+    """
+    Annotate the queryset with the info we need to issue the next cursor
+    """
+
+    qs = queryset.annotate(
+        _object_id=F("pk"),
+        _last_modified_txid=F("version_info__last_modified_txid"),
+    )
+    return cast("_QuerySet[M, T]", qs)
+
+
+def _filter_changes(
+    queryset: "_QuerySet[M, T]",
+    *,
+    cursor: Cursor | None,
+    limit: int,
+    partition: tuple[int, int] | None = None,
+    include_deleted: bool = False,
+) -> "_QuerySet[M, T]":
+    """
+    Filter the queryset to the next batch of changes after the cursor
+    """
+
+    return queryset.filter(
+        pk__in=_changed_objects_subquery(
+            queryset,
+            cursor=cursor,
+            limit=limit,
+            partition=partition,
+            include_deleted=include_deleted,
+        )
+    )
+
+
+def _changes_queryset(
+    queryset: "_QuerySet[M, T]",
+    *,
+    cursor: Cursor | None,
+    limit: int,
+    partition: tuple[int, int] | None = None,
+    include_deleted: bool = False,
+) -> "_QuerySet[M, T]":
+    """
+    Filter the queryset to the next batch of changes after the cursor, and
+    annotate it with the info we need to issue the next cursor.
+    """
+
+    return _annotate_changes(
+        _filter_changes(
+            queryset,
+            cursor=cursor,
+            limit=limit,
+            partition=partition,
+            include_deleted=include_deleted,
+        )
+    )
+
+
+def _compile_changes(
+    queryset: "_QuerySet[M, T]",
+    *,
+    limit: int,
+    partition: tuple[int, int] | None = None,
+    include_deleted: bool = False,
+) -> tuple[str, tuple[Any, ...]] | None:
+    """
+    Get the SQL and params of _changes_queryset, with CursorSlots in place of
+    the cursor's values. It's compiled once for each shape of queryset, which
+    is known from the SQL and params of the queryset itself, as that is far
+    cheaper to compile than the changes query.
+
+    Returns None if the queryset can't be cached.
+    """
+
+    try:
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    except EmptyResultSet:
+        return None
+
+    key = (
+        queryset.model,
+        queryset.db,
+        sql,
+        tuple(params),
+        limit,
+        partition,
+        include_deleted,
+    )
+    try:
+        hash(key)
+    except TypeError:
+        return None
+
+    with _compiled_changes_lock:
+        if (compiled := _compiled_changes.get(key)) is not None:
+            _compiled_changes.move_to_end(key)
+            return compiled
+
+    qs = _changes_queryset(
+        queryset,
+        cursor=None,
+        limit=limit,
+        partition=partition,
+        include_deleted=include_deleted,
+    )
+    try:
+        compiled = cast(
+            tuple[str, tuple[Any, ...]], qs.query.get_compiler(queryset.db).as_sql()
+        )
+    except EmptyResultSet:
+        return None
+
+    with _compiled_changes_lock:
+        _compiled_changes[key] = compiled
+        while len(_compiled_changes) > COMPILED_CACHE_SIZE:
+            _compiled_changes.popitem(last=False)
+
+    return compiled
+
+
+def _compiled_changes_queryset(
+    queryset: "_QuerySet[M, T]",
+    *,
+    cursor: Cursor,
+    limit: int,
+    partition: tuple[int, int] | None = None,
+    include_deleted: bool = False,
+) -> "_QuerySet[M, T]":
+    """
+    Like _changes_queryset, but running SQL compiled for an earlier queryset
+    of the same shape. With the TRACKED_MODEL_PREPARED_STATEMENTS setting it
+    runs as a prepared statement.
+    """
+
+    compiled = _compile_changes(
+        queryset, limit=limit, partition=partition, include_deleted=include_deleted
+    )
+    if compiled is None:
+        return _changes_queryset(
+            queryset,
+            cursor=cursor,
+            limit=limit,
+            partition=partition,
+            include_deleted=include_deleted,
+        )
+
+    sql, params = compiled
+    values = cursor_params(cursor)
+
+    qs = _annotate_changes(queryset).all()
+    qs.query.__class__ = CompiledQuery
+    query = cast(CompiledQuery, qs.query)
+    query.compiled_sql = sql
+    query.compiled_params = tuple(
+        values[param.name] if isinstance(param, CursorSlot) else param
+        for param in params
+    )
+    query.prepare = getattr(settings, "TRACKED_MODEL_PREPARED_STATEMENTS", False)
+    return qs
+
+
+def _snapshot_queryset(
+    queryset: "_QuerySet[M, T]",
+    *,
+    cursor: Cursor,
+    limit: int,
+    partition: tuple[int, int] | None = None,
+) -> "_QuerySet[M, T]":
+    """
+    Like _changes_queryset, but the snapshot is fetched in the same query
+    """
+
+    qs = _changes_queryset(
+        queryset, cursor=cursor, limit=limit, partition=partition
+    ).all()
+    qs.query.__class__ = SnapshotQuery
+    return qs
+
+
+def _pop_change_info(obj: T) -> tuple[T, int, int]:
+    """
+    Remove the annotations added by _changes_queryset from an object, and
+    return it along with the last modified txid and object id.
+    """
+
+    if hasattr(obj, "__dict__"):
+        last_object_id = obj.__dict__.pop("_object_id")
+        last_modified_txid = obj.__dict__.pop("_last_modified_txid")
+    elif isinstance(obj, dict):
+        last_modified_txid = obj.pop("_last_modified_txid")
+        last_object_id = obj.pop("_object_id")
+    elif isinstance(obj, tuple):
+        *row, last_object_id, last_modified_txid = obj
+        obj = cast(T, tuple(row))
+    else:
+        raise ValueError(f"Unexpected type returned from queryset: {type(obj)}")
+
+    return obj, last_modified_txid, last_object_id
+
+
+class _ChangePosition:
+    """
+    Keep track of the last change seen in a batch.
+
+    The order of the objects is decided by the queryset, which does not have
+    to match the order the changes were picked in. So rather than trusting the
+    last object we get, we compute the position of each change the same way
+    ChangedObjectsSubquery orders them.
+    """
+
+    def __init__(self, cursor: Cursor) -> None:
+        self.cursor = cursor
+        self.count = 0
+        self.last: tuple[int, int, int] | None = None
+
+    def _priority(self, last_modified_txid: int) -> int:
+        if last_modified_txid == self.cursor.xid_at:
+            return 1
+        if self.cursor.in_progress(last_modified_txid):
+            return 2
+        return 3
+
+    def add(self, last_modified_txid: int, last_object_id: int) -> None:
+        self.count += 1
+        position = (
+            self._priority(last_modified_txid),
+            last_modified_txid,
+            last_object_id,
+        )
+        if self.last is None or position > self.last:
+            self.last = position
+
+    def next_cursor(self, *, snapshot: Snapshot, limit: int) -> Cursor:
+        last_modified_txid, last_object_id = None, None
+        if self.last is not None:
+            _, last_modified_txid, last_object_id = self.last
+
+        return self.cursor.next_cursor(
+            snapshot=snapshot,
+            last_modified_txid=last_modified_txid,
+            last_object_id=last_object_id,
+            has_more=self.count >= limit,
+        )
+
+
+@overload
 def get_changed_objects(
-    *, cursor: Cursor | None, limit: int = 100, queryset: "_QuerySet[M, T]"
-) -> tuple[list[T], Cursor]:
+    *,
+    cursor: Cursor | None,
+    limit: int | AdaptiveLimit = ...,
+    queryset: "_QuerySet[M, T]",
+    single_query: bool = ...,
+    partition: tuple[int, int] | None = ...,
+    include_deleted: Literal[False] = ...,
+) -> tuple[list[T], Cursor]: ...
+
+
+@overload
+def get_changed_objects(
+    *,
+    cursor: Cursor | None,
+    limit: int | AdaptiveLimit = ...,
+    queryset: "_QuerySet[M, T]",
+    single_query: bool = ...,
+    partition: tuple[int, int] | None = ...,
+    include_deleted: Literal[True],
+) -> tuple[list[T | DeletedObject], Cursor]: ...
+
+
+def get_changed_objects(
+    *,
+    cursor: Cursor | None,
+    limit: int | AdaptiveLimit = 100,
+    queryset: "_QuerySet[M, T]",
+    single_query: bool = False,
+    partition: tuple[int, int] | None = None,
+    include_deleted: bool = False,
+) -> tuple[list[Any], Cursor]:
     """
     Get changed objects. If a cursor is provided only updates since that
     cursor was issued will be included, otherwise we'll start from the
     beginning and issue a new cursor.
+
+    By default this runs in its own repeatable read transaction, fetching the
+    snapshot and the changes in separate queries. With single_query=True the
+    snapshot is fetched in the same statement as the changes instead, which
+    needs a single round trip to the database and no explicit transaction.
+
+    With partition=(k, n) only objects that hash into partition k of n are
+    included. Each partition has its own cursor, so n workers can consume
+    the changes in parallel while keeping the order of changes per object.
+
+    The limit may be an AdaptiveLimit, which is updated after each call
+    based on how long the batch took to fetch.
+
+    For a model tracked with track_deletes, include_deleted=True also returns
+    a DeletedObject for each object deleted since the cursor, after the
+    objects from the queryset. This takes another query, and can't be
+    combined with single_query.
     """
 
     if cursor is None:
         cursor = Cursor(xid_next=1, xip_list=[])
 
-    model = queryset.model
-    field = model._meta.get_field("version_info")
-    assert isinstance(field, models.OneToOneRel)
-    version_model = cast("type[ModelVersion]", field.related_model)
+    if include_deleted:
+        if not _get_version_model(queryset.model).track_deletes:
+            raise ValueError(f"{queryset.model.__name__} doesn't track deletes")
+        if single_query:
+            raise ValueError("Deleted objects can't be fetched in a single query")
 
-    connection = connections[queryset.db]
+    if isinstance(limit, AdaptiveLimit):
+        adaptive, limit = limit, limit.limit
+        start = time.monotonic()
+        objects, next_cursor = get_changed_objects(
+            cursor=cursor,
+            limit=limit,
+            queryset=queryset,
+            single_query=single_query,
+            partition=partition,
+            include_deleted=include_deleted,  # type: ignore[call-overload]
+        )
+        adaptive.observe(objects, limit=limit, seconds=time.monotonic() - start)
+        return objects, next_cursor
+
+    if single_query:
+        return _get_changed_objects_single_query(
+            cursor=cursor, limit=limit, queryset=queryset, partition=partition
+        )
+
+    return _get_changed_objects(
+        cursor=cursor,
+        limit=limit,
+        queryset=queryset,
+        partition=partition,
+        include_deleted=include_deleted,
+    )
+
+
+def may_have_changes(*, cursor: Cursor | None, using: str = DEFAULT_DB_ALIAS) -> bool:
+    """
+    Check whether there may be changes after the cursor, from the current
+    snapshot alone. This is a single cheap query, so an idle poller can
+    skip get_changed_objects when it returns False:
+
+        if may_have_changes(cursor=cursor):
+            changes, cursor = get_changed_objects(cursor=cursor, queryset=qs)
+
+    It's conservative, as any transaction finishing makes it return True,
+    whether or not it changed anything tracked.
+    """
+
+    if cursor is None:
+        return True
+
+    with connections[using].cursor() as conn:
+        snapshot = get_snapshot(conn)
+    return cursor.may_have_changes(snapshot)
+
+
+def _get_repeatable_read_snapshot(using: str) -> Snapshot:
+    """
+    Switch the current transaction to repeatable read, and get its snapshot.
+    This must be the first thing that happens in the transaction.
+    """
+
+    connection = connections[using]
     with connection.cursor() as conn:
-        # TODO: Avoid using a separate query for this
         conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
-        conn.execute(_SNAPSHOT_SQL)
-        xip_list, xmin, xmax = conn.fetchone()
-        snapshot = Snapshot(xip_list=xip_list, xmin=xmin, xmax=xmax)
+        return get_snapshot(conn)
 
-    qs = queryset.filter(
-        pk__in=ChangedObjectsSubquery(
-            model_cls=version_model, limit=limit, cursor=cursor
-        )
-    ).annotate(
-        _object_id=F("pk"),
-        _last_modified_txid=F("version_info__last_modified_txid"),
+
+@transaction.atomic(durable=True)
+def _get_changed_objects(
+    *,
+    cursor: Cursor,
+    limit: int,
+    queryset: "_QuerySet[M, T]",
+    partition: tuple[int, int] | None,
+    include_deleted: bool,
+) -> tuple[list[Any], Cursor]:
+
+    snapshot = _get_repeatable_read_snapshot(queryset.db)
+    return _fetch_changes(
+        queryset,
+        cursor=cursor,
+        limit=limit,
+        snapshot=snapshot,
+        partition=partition,
+        include_deleted=include_deleted,
     )
 
-    last_modified_txid, last_object_id = None, None
-    objects = []
+
+def _tombstones(
+    queryset: "_QuerySet[M, T]",
+    *,
+    cursor: Cursor,
+    limit: int,
+    partition: tuple[int, int] | None,
+) -> "_QuerySet[Any, tuple[int, int]]":
+    """
+    The tombstones among the next batch of changes after the cursor, as
+    (object id, last modified txid)
+    """
+
+    versions = _get_version_model(queryset.model)._default_manager.using(queryset.db)
+    return versions.filter(
+        Q(deleted=True),
+        object_id__in=_changed_objects_subquery(
+            queryset,
+            cursor=cursor,
+            limit=limit,
+            partition=partition,
+            include_deleted=True,
+        ),
+    ).values_list("object_id", "last_modified_txid")
+
+
+def _fetch_changes(
+    queryset: "_QuerySet[M, T]",
+    *,
+    cursor: Cursor,
+    limit: int,
+    snapshot: Snapshot,
+    partition: tuple[int, int] | None = None,
+    include_deleted: bool = False,
+) -> tuple[list[Any], Cursor]:
+    """
+    Fetch the changes after the cursor, in a transaction with the given
+    snapshot.
+    """
+
+    qs = _compiled_changes_queryset(
+        queryset,
+        cursor=cursor,
+        limit=limit,
+        partition=partition,
+        include_deleted=include_deleted,
+    )
+
+    position = _ChangePosition(cursor)
+    objects: list[Any] = []
     for obj in qs:
-        if hasattr(obj, "__dict__"):
-            last_object_id = obj.__dict__.pop("_object_id")
-            last_modified_txid = obj.__dict__.pop("_last_modified_txid")
-        elif isinstance(obj, dict):
-            last_modified_txid = obj.pop("_last_modified_txid")
-            last_object_id = obj.pop("_object_id")
-        elif isinstance(obj, tuple):
-            *row, last_object_id, last_modified_txid = obj
-            obj = cast(T, tuple(row))
-        else:
-            raise ValueError(f"Unexpected type returned from queryset: {type(obj)}")
+        obj, last_modified_txid, last_object_id = _pop_change_info(obj)
+        position.add(last_modified_txid, last_object_id)
+        objects.append(obj)
+
+    if include_deleted:
+        tombstones = _tombstones(
+            queryset, cursor=cursor, limit=limit, partition=partition
+        )
+        for object_id, last_modified_txid in tombstones:
+            position.add(last_modified_txid, object_id)
+            objects.append(DeletedObject(pk=object_id))
+
+    return objects, position.next_cursor(snapshot=snapshot, limit=limit)
+
 
+def get_many_changed_objects(
+    *,
+    querysets: Mapping[K, "_QuerySet[Any, Any]"],
+    cursors: Mapping[K, Cursor | None],
+    limit: int = 100,
+) -> dict[K, tuple[list[Any], Cursor]]:
+    """
+    Get changed objects for several querysets, e.g. for different models,
+    in a single transaction. All the changes are read from the same snapshot,
+    so they give a consistent view across the querysets. Both the querysets
+    and the cursors are keyed by a name of your choosing, and a cursor may be
+    missing or None to start from the beginning:
+
+        changes = get_many_changed_objects(
+            querysets={"books": Book.objects.all(), "authors": Author.objects.all()},
+            cursors={"books": books_cursor, "authors": authors_cursor},
+        )
+        books, books_cursor = changes["books"]
+    """
+
+    if not querysets:
+        return {}
+
+    databases = {queryset.db for queryset in querysets.values()}
+    if len(databases) > 1:
+        raise ValueError("All querysets must use the same database")
+    (using,) = databases
+
+    with transaction.atomic(using=using, durable=True):
+        snapshot = _get_repeatable_read_snapshot(using)
+
+        return {
+            key: _fetch_changes(
+                queryset,
+                cursor=cursors.get(key) or Cursor(xid_next=1, xip_list=[]),
+                limit=limit,
+                snapshot=snapshot,
+            )
+            for key, queryset in querysets.items()
+        }
+
+
+def get_changed_objects_for_cursors(
+    *,
+    cursors: Mapping[K, Cursor | None],
+    limit: int = 100,
+    queryset: "_QuerySet[M, T]",
+    partition: tuple[int, int] | None = None,
+) -> dict[K, tuple[list[T], Cursor]]:
+    """
+    Get changed objects for many cursors on the same queryset, e.g. one for
+    each subscriber of a change feed, with one snapshot and one query.
+    Cursors are keyed by a name of your choosing, and may be None to start
+    from the beginning. Subscribers that are caught up tend to share a cursor,
+    and cursors at the same position only have their changes picked once:
+
+        changes = get_changed_objects_for_cursors(
+            cursors={"alice": alice_cursor, "bob": bob_cursor}, queryset=qs
+        )
+        objects, alice_cursor = changes["alice"]
+    """
+
+    if not cursors:
+        return {}
+
+    # Group the cursors by position
+    groups: dict[tuple[Any, ...], int] = {}
+    group_cursors: list[Cursor] = []
+    key_groups: dict[K, int] = {}
+    for key, cursor in cursors.items():
+        cursor = cursor or Cursor(xid_next=1, xip_list=[])
+        position = _cursor_position(cursor)
+        if position not in groups:
+            groups[position] = len(group_cursors)
+            group_cursors.append(cursor)
+        key_groups[key] = groups[position]
+
+    versions = _get_version_model(queryset.model)._default_manager.all()
+    group_querysets = [
+        versions.filter(
+            object_id__in=_changed_objects_subquery(
+                queryset, cursor=cursor, limit=limit, partition=partition
+            )
+        ).values(_group=Value(group), _object_id=F("object_id"))
+        for group, cursor in enumerate(group_cursors)
+    ]
+    groups_qs = group_querysets[0].union(*group_querysets[1:], all=True)
+    groups_sql, groups_params = groups_qs.query.get_compiler(queryset.db).as_sql()
+
+    qs = _annotate_changes(queryset.filter(pk__in=RawSQL(CURSORS_GROUPS_SQL, ())))
+    qs.query.__class__ = CursorsQuery
+    query = cast(CursorsQuery, qs.query)
+    query.groups_sql = groups_sql
+    query.groups_params = tuple(groups_params)
+    query.row_groups = []
+
+    positions = [_ChangePosition(cursor) for cursor in group_cursors]
+    group_objects: list[list[T]] = [[] for _ in group_cursors]
+
+    with transaction.atomic(using=queryset.db, durable=True):
+        snapshot = _get_repeatable_read_snapshot(queryset.db)
+
+        for i, obj in enumerate(qs):
+            group = query.row_groups[i]
+            obj, last_modified_txid, last_object_id = _pop_change_info(obj)
+            positions[group].add(last_modified_txid, last_object_id)
+            group_objects[group].append(obj)
+
+    results = [
+        (objects, position.next_cursor(snapshot=snapshot, limit=limit))
+        for objects, position in zip(group_objects, positions)
+    ]
+    return {key: results[group] for key, group in key_groups.items()}
+
+
+def _get_changed_objects_single_query(
+    *,
+    cursor: Cursor,
+    limit: int,
+    queryset: "_QuerySet[M, T]",
+    partition: tuple[int, int] | None,
+) -> tuple[list[T], Cursor]:
+
+    connection = connections[queryset.db]
+    if connection.in_atomic_block:
+        # Mirror the durable transaction used when fetching in several
+        # queries, as changes made by an outer transaction would be visible
+        # but not yet committed.
+        raise RuntimeError("Changes can not be fetched within an atomic block.")
+
+    qs = _snapshot_queryset(queryset, cursor=cursor, limit=limit, partition=partition)
+    query = cast(SnapshotQuery, qs.query)
+
+    position = _ChangePosition(cursor)
+    objects = []
+    for obj in qs:
+        obj, last_modified_txid, last_object_id = _pop_change_info(obj)
+        position.add(last_modified_txid, last_object_id)
         objects.append(obj)
 
-    next_cursor = cursor.next_cursor(
-        snapshot=snapshot,
-        last_modified_txid=last_modified_txid,
-        last_object_id=last_object_id,
-        has_more=len(objects) >= limit,
-    )
+    snapshot = query.snapshot
+    if snapshot is None:
+        # The query was known to be empty, so it was never executed. Any
+        # snapshot will do, as there were no rows to be consistent with.
+        with connection.cursor() as conn:
+            snapshot = get_snapshot(conn)
+
+    return objects, position.next_cursor(snapshot=snapshot, limit=limit)
+
+
+class ChangedObjectsIterator(Generic[T]):
+    """
+    Iterate over changed objects without loading the whole batch into memory.
+    The objects are read in chunks from a server-side cursor, and the next
+    cursor is available once all the objects have been consumed.
+    """
+
+    def __init__(
+        self,
+        *,
+        cursor: Cursor | None,
+        limit: int,
+        queryset: "_QuerySet[Any, T]",
+        chunk_size: int,
+        partition: tuple[int, int] | None = None,
+    ) -> None:
+        self.cursor = cursor or Cursor(xid_next=1, xip_list=[])
+        self.limit = limit
+        self.queryset = queryset
+        self.chunk_size = chunk_size
+        self.partition = partition
+        self._next_cursor: Cursor | None = None
 
-    return objects, next_cursor
+    @property
+    def next_cursor(self) -> Cursor:
+        if self._next_cursor is None:
+            raise RuntimeError("The changes must be consumed before the next cursor")
+        return self._next_cursor
+
+    def __iter__(self) -> Iterator[T]:
+        if self._next_cursor is not None:
+            raise RuntimeError("The changes can only be consumed once")
+
+        with transaction.atomic(using=self.queryset.db, durable=True):
+            snapshot = _get_repeatable_read_snapshot(self.queryset.db)
+
+            qs = _changes_queryset(
+                self.queryset,
+                cursor=self.cursor,
+                limit=self.limit,
+                partition=self.partition,
+            )
+
+            position = _ChangePosition(self.cursor)
+            for obj in qs.iterator(chunk_size=self.chunk_size):
+                obj, last_modified_txid, last_object_id = _pop_change_info(obj)
+                position.add(last_modified_txid, last_object_id)
+                yield obj
+
+        self._next_cursor = position.next_cursor(snapshot=snapshot, limit=self.limit)
+
+
+def iter_changed_objects(
+    *,
+    cursor: Cursor | None,
+    limit: int = 100,
+    queryset: "_QuerySet[M, T]",
+    chunk_size: int = 2000,
+    partition: tuple[int, int] | None = None,
+) -> ChangedObjectsIterator[T]:
+    """
+    Like get_changed_objects, but the objects are streamed from the database
+    in chunks of chunk_size, which keeps memory usage flat for large limits.
+    The transaction is held open until the iterator is exhausted, and the
+    next cursor is available as next_cursor after that:
+
+        changes = iter_changed_objects(cursor=cursor, limit=50_000, queryset=qs)
+        for obj in changes:
+            ...
+        cursor = changes.next_cursor
+    """
+
+    return ChangedObjectsIterator(
+        cursor=cursor,
+        limit=limit,
+        queryset=queryset,
+        chunk_size=chunk_size,
+        partition=partition,
+    )
@@ -0,0 +1,251 @@
+"""
+A view serving a stream of changes over HTTP, either as long-polled JSON or
+as a stream of batches using server-sent events or newline delimited JSON.
+"""
+
+import asyncio
+import json
+from typing import TYPE_CHECKING, Any, AsyncIterator
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseBadRequest,
+    StreamingHttpResponse,
+)
+from django.http.response import HttpResponseBase
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views import View
+
+from .cursor import Cursor
+from .hub import ChangeHub
+from .notify import get_channel
+from .utils import get_changed_objects, may_have_changes
+
+if TYPE_CHECKING:
+    from django.db.models.query import _QuerySet
+
+SSE = "sse"
+NDJSON = "ndjson"
+
+STREAM_CONTENT_TYPES = {
+    SSE: "text/event-stream",
+    NDJSON: "application/x-ndjson",
+}
+
+
+class ChangesView(View):
+    """
+    Serve the changes to a queryset. Clients pass the cursor they got last
+    time as ?cursor=..., and optionally a ?limit=...
+
+    By default the response is immediate. With ?wait=... the request is
+    held open for up to that many seconds, at most timeout, until there are
+    changes. If nothing changes the response has the cursor the client sent
+    and an ETag, so repeating the request with If-None-Match gets a 304.
+
+    With ?stream=sse or ?stream=ndjson, or an Accept header asking for
+    either, batches are streamed as they become visible for up to
+    stream_timeout seconds, after which the client reconnects with the last
+    cursor it got. An empty batch is sent every keepalive_interval seconds,
+    so the connection isn't idle and the client has a recent cursor. For
+    server-sent events the cursor is the event id, so EventSource resumes
+    from it by itself.
+
+    The queryset should return something JSON serializable, e.g. by using
+    .values(), or serialize_objects must be overridden. If hub is set, the
+    hub's queryset is used and clients that are caught up are served from
+    its memory without holding up a thread.
+
+    Without a hub, waiting requests check for changes every poll_interval.
+    If the tracking was added with notify=True, set notify so they're woken
+    up by a notification instead, over a connection of their own, which
+    needs psycopg 3.
+    """
+
+    http_method_names = ["get"]
+
+    queryset: "_QuerySet[Any, Any] | None" = None
+    hub: ChangeHub[Any] | None = None
+    limit = 100
+    max_limit = 1000
+    timeout = 30.0
+    poll_interval = 1.0
+    notify = False
+    stream_timeout = 300.0
+    keepalive_interval = 15.0
+
+    def get_hub(self) -> ChangeHub[Any] | None:
+        return self.hub
+
+    def get_queryset(self) -> "_QuerySet[Any, Any]":
+        if self.queryset is None:
+            hub = self.get_hub()
+            if hub is None:
+                raise ImproperlyConfigured(
+                    f"{self.__class__.__name__} needs a queryset or a hub"
+                )
+            return hub.queryset
+        return self.queryset.all()
+
+    def serialize_objects(self, objects: list[Any]) -> list[Any]:
+        return objects
+
+    async def fetch_changes(
+        self, cursor: Cursor | None, limit: int
+    ) -> tuple[list[Any], Cursor]:
+        hub = self.get_hub()
+        if hub is None:
+            return await sync_to_async(get_changed_objects)(
+                cursor=cursor, limit=limit, queryset=self.get_queryset()
+            )
+
+        buffered = hub.get_buffered_changes(cursor=cursor, limit=limit)
+        if buffered is not None:
+            return buffered
+        return await sync_to_async(hub.get_changed_objects)(cursor=cursor, limit=limit)
+
+    async def fetch_changes_if_any(
+        self, cursor: Cursor | None, limit: int
+    ) -> tuple[list[Any], Cursor]:
+        """
+        Like fetch_changes, but without a hub the snapshot probe is asked
+        first, so that nothing changing costs a single cheap query. Looking
+        in the hub's memory is cheaper than the probe.
+        """
+
+        if (
+            cursor is not None
+            and self.get_hub() is None
+            and not await sync_to_async(may_have_changes)(
+                cursor=cursor, using=self.get_queryset().db
+            )
+        ):
+            return [], cursor
+        return await self.fetch_changes(cursor, limit)
+
+    async def wait_for_changes(
+        self, cursor: Cursor | None, limit: int, timeout: float
+    ) -> tuple[list[Any], Cursor]:
+        """
+        Fetch the changes after the cursor, checking again every
+        poll_interval, or when notified, until there are some or the timeout
+        has passed.
+        """
+
+        if timeout > 0 and self.notify and self.get_hub() is None:
+            return await self._wait_for_notify(cursor, limit, timeout)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        objects, cursor = await self.fetch_changes_if_any(cursor, limit)
+        while not objects and (remaining := deadline - loop.time()) > 0:
+            await asyncio.sleep(min(self.poll_interval, remaining))
+            objects, cursor = await self.fetch_changes_if_any(cursor, limit)
+
+        return objects, cursor
+
+    async def _wait_for_notify(
+        self, cursor: Cursor | None, limit: int, timeout: float
+    ) -> tuple[list[Any], Cursor]:
+        from .aio import alisten, await_notify
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        queryset = self.get_queryset()
+        # Listen before looking for changes, so we can't miss a transaction
+        # that commits after our snapshot was taken
+        async with alisten(get_channel(queryset.model), using=queryset.db) as conn:
+            objects, cursor = await self.fetch_changes_if_any(cursor, limit)
+            while not objects and (remaining := deadline - loop.time()) > 0:
+                if not await await_notify(conn, remaining):
+                    break
+                objects, cursor = await self.fetch_changes_if_any(cursor, limit)
+
+        return objects, cursor
+
+    def _stream_format(self, request: HttpRequest) -> str | None:
+        if stream := request.GET.get("stream"):
+            return stream
+
+        accept = request.headers.get("Accept", "")
+        for name, content_type in STREAM_CONTENT_TYPES.items():
+            if content_type in accept:
+                return name
+        return None
+
+    def _encode(self, objects: list[Any], cursor: Cursor) -> str:
+        return json.dumps(
+            {"changes": self.serialize_objects(objects), "cursor": cursor.serialize()},
+            cls=DjangoJSONEncoder,
+        )
+
+    async def _stream(
+        self, stream: str, cursor: Cursor | None, limit: int
+    ) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.stream_timeout
+
+        while (remaining := deadline - loop.time()) > 0:
+            objects, cursor = await self.wait_for_changes(
+                cursor, limit, timeout=min(self.keepalive_interval, remaining)
+            )
+            data = self._encode(objects, cursor)
+            if stream == SSE:
+                yield f"id: {cursor.serialize()}\nevent: changes\ndata: {data}\n\n"
+            else:
+                yield data + "\n"
+
+    async def get(self, request: HttpRequest) -> HttpResponseBase:
+        stream = self._stream_format(request)
+        if stream is not None and stream not in STREAM_CONTENT_TYPES:
+            return HttpResponseBadRequest("Unknown stream format")
+
+        cursor = None
+        serialized_cursor = request.GET.get("cursor")
+        if stream == SSE:
+            serialized_cursor = (
+                request.headers.get("Last-Event-ID") or serialized_cursor
+            )
+        try:
+            if serialized_cursor:
+                cursor = Cursor.deserialize(serialized_cursor)
+            limit = min(int(request.GET.get("limit", str(self.limit))), self.max_limit)
+            wait = min(float(request.GET.get("wait", "0")), self.timeout)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+        if limit < 1:
+            return HttpResponseBadRequest("The limit must be at least 1")
+
+        if stream is not None:
+            streaming = StreamingHttpResponse(
+                self._stream(stream, cursor, limit),
+                content_type=STREAM_CONTENT_TYPES[stream],
+            )
+            streaming.headers["Cache-Control"] = "no-cache"
+            # Don't let nginx hold back the batches
+            streaming.headers["X-Accel-Buffering"] = "no"
+            return streaming
+
+        objects, next_cursor = await self.wait_for_changes(cursor, limit, wait)
+        response = HttpResponse(
+            self._encode(objects, next_cursor), content_type="application/json"
+        )
+
+        # Polling again with the same cursor gives the same empty response
+        # until something changes
+        if not objects and next_cursor == cursor:
+            etag = quote_etag(next_cursor.serialize())
+            response.headers["ETag"] = etag
+            return (
+                get_conditional_response(request, etag=etag, response=response)
+                or response
+            )
+
+        return response